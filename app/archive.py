@@ -0,0 +1,229 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+from app.metrics import metrics
+from app.storage.base import SERVER_TIMESTAMP, ChatArchived, Storage
+from app.storage.transcript import compress, decompress
+
+# Fields a stub keeps so the chat still lists and authorizes without its blob
+STUB_FIELDS = ("user_id", "bot_id", "bot_prompt")
+
+# Restores tried before giving up on a chat that keeps changing under them
+RESTORE_ATTEMPTS = 5
+
+
+class ObjectStore(ABC):
+    """Blob storage for archived chats."""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Store a blob under the key, replacing any previous one."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the blob or None if it does not exist."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete the blob if it exists."""
+
+
+class LocalObjectStore(ObjectStore):
+    """Blobs as files under a root directory."""
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"Object key escapes the store: {key}")
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial blob
+        partial = path.with_name(path.name + ".partial")
+        partial.write_bytes(data)
+        os.replace(partial, path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+
+class GCSObjectStore(ObjectStore):
+    """Blobs in a Google Cloud Storage bucket, shared by all replicas.
+
+    Needs the ``google-cloud-storage`` package, imported on first use.
+    """
+
+    def __init__(self, bucket: str):
+        self.bucket_name = bucket
+        self.bucket = None
+
+    def _blob(self, key: str):
+        if self.bucket is None:
+            from google.cloud import storage
+            self.bucket = storage.Client().bucket(self.bucket_name)
+        return self.bucket.blob(key)
+
+    def put(self, key: str, data: bytes) -> None:
+        self._blob(key).upload_from_string(data, content_type="application/octet-stream")
+
+    def get(self, key: str) -> Optional[bytes]:
+        from google.api_core.exceptions import NotFound
+        try:
+            return self._blob(key).download_as_bytes()
+        except NotFound:
+            return None
+
+    def delete(self, key: str) -> None:
+        from google.api_core.exceptions import NotFound
+        try:
+            self._blob(key).delete()
+        except NotFound:
+            pass
+
+
+def create_object_store() -> ObjectStore:
+    if settings.archive_backend == "gcs":
+        if not settings.archive_bucket:
+            raise ValueError("ARCHIVE_BUCKET must be set for the gcs archive backend")
+        return GCSObjectStore(settings.archive_bucket)
+    return LocalObjectStore(settings.archive_path)
+
+
+def check_shared_store() -> None:
+    """Refuse to archive into storage other replicas cannot read.
+
+    A chat archived on one replica is restored by whichever replica serves
+    it next, and pod-local disk does not survive a restart.
+    """
+    if settings.archive_backend == "local" and not settings.archive_path_shared:
+        raise RuntimeError(
+            "Archiving needs a shared object store: set ARCHIVE_BACKEND=gcs, "
+            "or ARCHIVE_PATH_SHARED=true if ARCHIVE_PATH is mounted by every replica"
+        )
+
+
+object_store = create_object_store()
+
+
+def archive_key(chat_id: str) -> str:
+    return f"chats/{chat_id}"
+
+
+def archive_chat(storage: Storage, store: ObjectStore, chat_data: dict) -> bool:
+    """Move an idle chat into the object store and leave a stub document.
+
+    The stub is only written if the chat saw no activity since it was read;
+    otherwise the blob is dropped and the chat stays as it is.
+    """
+    chat_id = chat_data.pop("id")
+    key = archive_key(chat_id)
+    store.put(key, compress(chat_data, settings.transcript_codec))
+    stub = {field: chat_data[field] for field in STUB_FIELDS if field in chat_data}
+    stub.update({"archived": True, "archive_key": key, "archived_at": SERVER_TIMESTAMP})
+    if not storage.chats.replace_unless_active(chat_id, stub, chat_data["last_active"]):
+        store.delete(key)
+        return False
+    metrics.increment("archive.archived")
+    return True
+
+
+def archive_idle_chats(storage: Storage, store: ObjectStore, idle_for: float, limit: int) -> int:
+    """Archive up to ``limit`` chats idle for ``idle_for`` seconds. Returns how many."""
+    before = datetime.now(UTC) - timedelta(seconds=idle_for)
+    archived = 0
+    for chat_data in storage.chats.list_idle(before, limit):
+        try:
+            archived += archive_chat(storage, store, chat_data)
+        except Exception as e:
+            print(f"Error archiving chat {chat_data.get('id')}: {e}")
+    return archived
+
+
+def restore_chat(storage: Storage, store: ObjectStore, chat_id: str, stub: dict) -> Optional[dict]:
+    """Bring an archived chat back into storage and return it.
+
+    Messages that reached the stub itself, e.g. written before appends
+    refused stubs, are kept after the archived ones. Returns None if the
+    stub changed meanwhile, e.g. because another request restored the chat
+    first; the caller should read the chat again.
+    """
+    data = store.get(stub["archive_key"])
+    if data is None:
+        current = storage.chats.get(chat_id)
+        if current is not None and current.get("archived"):
+            raise RuntimeError(f"Archived chat {chat_id} is missing from the object store")
+        return None
+    chat_data = decompress(data)
+    chat_data["messages"] = chat_data.get("messages", []) + stub.get("messages", [])
+    # Count the restore as activity so the chat is not archived again right away
+    chat_data["last_active"] = datetime.now(UTC)
+    if not storage.chats.replace_unless_active(chat_id, chat_data, stub.get("last_active")):
+        return None
+    store.delete(stub["archive_key"])
+    metrics.increment("archive.restored")
+    return chat_data
+
+
+async def unarchive(storage: Storage, chat_id: str, chat_data: dict) -> Optional[dict]:
+    """Return the full chat for a chat document read from storage.
+
+    Chats are returned as they are unless they are archived stubs, which are
+    restored first. Returns None if the chat was deleted meanwhile.
+    """
+    for _ in range(RESTORE_ATTEMPTS):
+        if chat_data is None or not chat_data.get("archived"):
+            return chat_data
+        restored = await asyncio.to_thread(restore_chat, storage, object_store, chat_id, chat_data)
+        chat_data = restored if restored is not None else await asyncio.to_thread(storage.chats.get, chat_id)
+    if chat_data is not None and chat_data.get("archived"):
+        raise RuntimeError(f"Archived chat {chat_id} kept changing while being restored")
+    return chat_data
+
+
+async def append_restoring(storage: Storage, chat_id: str, *messages: dict) -> None:
+    """Append messages, restoring the chat first if it was archived meanwhile."""
+    try:
+        await asyncio.to_thread(storage.messages.append, chat_id, *messages)
+    except ChatArchived:
+        stub = await asyncio.to_thread(storage.chats.get, chat_id)
+        await unarchive(storage, chat_id, stub)
+        await asyncio.to_thread(storage.messages.append, chat_id, *messages)
+
+
+async def run_archiver(storage: Storage) -> None:
+    """Run forever, archiving idle chats in batches."""
+    while True:
+        try:
+            count = await asyncio.to_thread(
+                archive_idle_chats, storage, object_store, settings.archive_after, settings.archive_batch_size
+            )
+            if count:
+                print(f"Archived {count} idle chats")
+        except Exception as e:
+            print(f"Error archiving idle chats: {e}")
+        await asyncio.sleep(settings.archive_interval)
+
+
+if __name__ == "__main__":
+    from app.dependencies import get_storage, get_firestore
+
+    check_shared_store()
+    storage = get_storage(get_firestore())
+    idle_for = settings.archive_after if settings.archive_after is not None else 30 * 86400
+    count = archive_idle_chats(storage, object_store, idle_for, settings.archive_batch_size)
+    print(f"Archived {count} idle chats")
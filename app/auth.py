@@ -1,45 +1,45 @@
 import jwt
 import json
 from pydantic import BaseModel
-import requests
-from fastapi import APIRouter, HTTPException, Request, Response
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from app.config import settings
-from google.cloud import firestore
+from app.coalescing import get_user
+from app.dependencies import get_http_client, get_storage
+from app.http_client import get_with_retries, google_auth_request
+from app.storage.base import SERVER_TIMESTAMP, Storage
+from app.tokens import REFRESH, create_session, decode_token
 
 router = APIRouter()
-db = firestore.Client()
-users_collection = db.collection("users")
 
-def verify_google_token(token: str):
+def verify_google_token(token: str, storage: Storage):
     try:
-        payload = id_token.verify_oauth2_token(token, google_requests.Request(), settings.google_client_id)
+        payload = id_token.verify_oauth2_token(token, google_auth_request, settings.google_client_id)
         email = payload["email"]
         name = payload.get("name")
         sub = payload["sub"]
 
         # Check if user exists in Firestore
-        user_ref = users_collection.document(email)
-        user_data = user_ref.get()
+        user_data = storage.users.get(email)
 
-        if not user_data.exists:
+        if user_data is None:
             # Create new user if they don't exist
-            user_ref.set({
+            storage.users.set(email, {
                 "email": email,
                 "name": name,
                 "google_sub": sub,
-                "created_at": firestore.SERVER_TIMESTAMP,
-                "last_login": firestore.SERVER_TIMESTAMP,
+                "created_at": SERVER_TIMESTAMP,
+                "last_login": SERVER_TIMESTAMP,
             })
         else:
             # Update last login for existing user
-            user_ref.update({
-                "last_login": firestore.SERVER_TIMESTAMP,
+            storage.users.update(email, {
+                "last_login": SERVER_TIMESTAMP,
             })
 
-        # Return the Google token directly
-        return {"token": token}
+        # Exchange the Google token for our own session tokens
+        return create_session(email)
     except Exception as e:
         print(f"Error in verify_google_token: {e}")
         raise HTTPException(status_code=401, detail="Invalid Google token")
@@ -47,17 +47,31 @@ def verify_google_token(token: str):
 class TokenPayload(BaseModel):
     access_token: str
 
+class RefreshPayload(BaseModel):
+    refresh_token: str
+
 @router.post("/login/google")
-async def login_google(token: TokenPayload):
+async def login_google(token: TokenPayload, storage: Storage = Depends(get_storage)):
     try:
         if not token.access_token:
             raise Exception("No access token found in payload")
-        return verify_google_token(token.access_token)
+        return verify_google_token(token.access_token, storage)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid Google token")
 
+@router.post("/refresh")
+async def refresh_session(token: RefreshPayload, storage: Storage = Depends(get_storage)):
+    try:
+        payload = decode_token(token.refresh_token, REFRESH)
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    # A deleted account's refresh tokens must not keep issuing access tokens
+    if await get_user(storage, payload["sub"]) is None:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return create_session(payload["sub"])
+
 @router.get("/login/callback")
-async def oauth_callback(request: Request):
+async def oauth_callback(request: Request, http: httpx.AsyncClient = Depends(get_http_client)):
     code = request.query_params.get("code")
     provider = request.query_params.get("provider")
     
@@ -76,8 +90,12 @@ async def oauth_callback(request: Request):
     else:
         raise HTTPException(status_code=400, detail="Invalid provider")
     
-    response = requests.post(token_url, data=data)
-    token_data = response.json()
+    try:
+        response = await http.post(token_url, data=data)
+        token_data = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Error in oauth_callback token exchange: {e}")
+        raise HTTPException(status_code=502, detail="Failed to reach identity provider")
     
     if "access_token" not in token_data:
         raise HTTPException(status_code=400, detail="Failed to retrieve access token")
@@ -88,7 +106,11 @@ async def oauth_callback(request: Request):
         user_info_url = "https://appleid.apple.com/auth/keys"  # Apple doesn't provide an easy user info endpoint
     
     headers = {"Authorization": f"Bearer {token_data['access_token']}"}
-    user_info = requests.get(user_info_url, headers=headers).json()
+    try:
+        user_info = (await get_with_retries(http, user_info_url, headers=headers)).json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Error in oauth_callback user info lookup: {e}")
+        raise HTTPException(status_code=502, detail="Failed to reach identity provider")
     
     return {
         "email": user_info.get("email"),
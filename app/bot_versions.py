@@ -0,0 +1,26 @@
+from typing import Optional
+from app.chat_cache import chat_cache
+from app.storage.base import Storage
+
+# Bot fields that shape replies; changing any of them creates a new version
+GENERATION_FIELDS = ("prompt", "model", "light_model", "fallback_model", "cache_responses")
+
+
+def bot_snapshot(bot_data: dict) -> dict:
+    """The versioned part of a bot, pinned on chats so turns need not read the bot."""
+    return {"version": bot_data.get("version", 1), **{field: bot_data.get(field) for field in GENERATION_FIELDS}}
+
+
+def is_new_version(bot_data: dict, update_data: dict) -> bool:
+    return any(field in update_data and update_data[field] != bot_data.get(field) for field in GENERATION_FIELDS)
+
+
+async def pinned_bot(storage: Storage, chat_data: dict) -> Optional[dict]:
+    """The bot version a chat is pinned to.
+
+    Chats started before versioning have no snapshot and follow the bot's
+    current version.
+    """
+    if "bot_snapshot" in chat_data:
+        return chat_data["bot_snapshot"]
+    return await chat_cache.get_bot(storage, chat_data["bot_id"])
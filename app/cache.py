@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, UTC
+from typing import TYPE_CHECKING, Optional
+from cachetools import TTLCache
+from app.config import settings
+from app.metrics import metrics
+
+if TYPE_CHECKING:
+    from google.cloud import firestore
+
+
+class CacheBackend(ABC):
+    """Key/value store for cached model responses."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value or None on a miss."""
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """Store a value under the key."""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            return self.entries.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        with self.lock:
+            self.entries[key] = value
+
+
+class FirestoreCacheBackend(CacheBackend):
+    """Cache shared by all replicas, stored in a Firestore collection.
+
+    Expired entries are ignored on read; a Firestore TTL policy on
+    ``expires_at`` removes them from the collection.
+    """
+
+    def __init__(self, ttl: int, collection: str = "response_cache", db: Optional["firestore.Client"] = None):
+        self.ttl = ttl
+        self.collection_name = collection
+        self.db = db
+
+    def _collection(self):
+        if self.db is None:
+            from app.dependencies import get_firestore
+            self.db = get_firestore()
+        return self.db.collection(self.collection_name)
+
+    def get(self, key: str) -> Optional[str]:
+        snapshot = self._collection().document(key).get()
+        if not snapshot.exists:
+            return None
+        entry = snapshot.to_dict()
+        if entry["expires_at"] <= datetime.now(UTC):
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value: str) -> None:
+        self._collection().document(key).set({
+            "value": value,
+            "expires_at": datetime.now(UTC) + timedelta(seconds=self.ttl),
+        })
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a message so trivially different turns share a cache entry."""
+    return " ".join(text.split()).casefold()
+
+
+class ResponseCache:
+    """Caches model replies keyed on model, system prompt and chat history."""
+
+    def __init__(self, backend: CacheBackend, max_messages: int):
+        self.backend = backend
+        self.max_messages = max_messages
+
+    def cacheable(self, history: list[dict]) -> bool:
+        return 0 < len(history) <= self.max_messages
+
+    @staticmethod
+    def key(model: str, system_prompt: str, history: list[dict]) -> str:
+        prompt_hash = hashlib.sha256(system_prompt.encode()).hexdigest()
+        normalized = [[msg["role"], normalize_text(msg["content"])] for msg in history]
+        payload = json.dumps([model, prompt_hash, normalized], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, model: str, system_prompt: str, history: list[dict]) -> Optional[str]:
+        value = self.backend.get(self.key(model, system_prompt, history))
+        metrics.increment("response_cache.hits" if value is not None else "response_cache.misses")
+        return value
+
+    def set(self, model: str, system_prompt: str, history: list[dict], value: str) -> None:
+        self.backend.set(self.key(model, system_prompt, history), value)
+
+
+def create_response_cache() -> ResponseCache:
+    """Build the response cache for the configured backend."""
+    if settings.response_cache_backend == "firestore":
+        backend = FirestoreCacheBackend(ttl=settings.response_cache_ttl)
+    else:
+        backend = MemoryCacheBackend(maxsize=settings.response_cache_size, ttl=settings.response_cache_ttl)
+    return ResponseCache(backend, max_messages=settings.response_cache_max_messages)
+
+
+response_cache = create_response_cache()
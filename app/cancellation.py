@@ -0,0 +1,37 @@
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import HTTPException, Request
+from app.metrics import metrics
+
+T = TypeVar("T")
+
+class ClientDisconnected(Exception):
+    """The client went away before the work finished."""
+
+async def run_cancellable(request: Request, work: Awaitable[T], timeout: float, poll_interval: float = 0.1) -> T:
+    """Run work until it finishes, the client disconnects or the deadline passes.
+
+    The work is cancelled in the last two cases. A disconnect raises
+    ClientDisconnected and a missed deadline raises a 504.
+    """
+    task = asyncio.ensure_future(work)
+
+    async def watch_disconnect():
+        while not await request.is_disconnected():
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        done, _ = await asyncio.wait({task, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+
+    if task in done:
+        return task.result()
+    if watcher in done:
+        metrics.increment("generation.cancelled.disconnect")
+        raise ClientDisconnected()
+    metrics.increment("generation.cancelled.timeout")
+    raise HTTPException(status_code=504, detail="Model response timed out")
@@ -0,0 +1,82 @@
+import asyncio
+import copy
+from typing import Any, Optional
+from cachetools import TTLCache
+from app.archive import append_restoring
+from app.coalescing import get_bot
+from app.config import settings
+from app.metrics import metrics
+from app.storage.base import Storage, Versioned
+
+
+class ChatCache:
+    """Recently active chats and their bots, kept between turns.
+
+    Each chat is stored with the version it had in storage. Appends are
+    written through with that version as a precondition, so a chat changed
+    by another replica or connection is noticed on the next write: the
+    messages are still appended, and the entry is dropped so the next turn
+    reads the chat again. Bots are kept for a short TTL, as turns only need
+    their prompt and model settings.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, bot_ttl: float):
+        self.chats = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.bots = TTLCache(maxsize=maxsize, ttl=bot_ttl)
+
+    async def load(self, storage: Storage, chat_id: str) -> Optional[Versioned]:
+        """Return a copy of the chat with its version, reading it on a miss.
+
+        Archived stubs are returned as read and not cached.
+        """
+        entry = self.chats.get(chat_id)
+        if entry is not None:
+            metrics.increment("chat_cache.hits")
+            return copy.deepcopy(entry)
+        metrics.increment("chat_cache.misses")
+        entry = await asyncio.to_thread(storage.chats.get_versioned, chat_id)
+        if entry is not None and not entry.data.get("archived"):
+            self.chats[chat_id] = copy.deepcopy(entry)
+        return entry
+
+    async def append(self, storage: Storage, chat_id: str, version: Any, *messages: dict) -> Any:
+        """Append messages and return the chat's new version.
+
+        Returns None if the chat changed since ``version`` was read, or if
+        ``version`` is already None; later appends then skip the check. A chat
+        archived meanwhile is restored before the messages are appended.
+        """
+        if version is not None:
+            new_version = await asyncio.to_thread(storage.messages.append_if_unchanged, chat_id, version, *messages)
+            if new_version is not None:
+                entry = self.chats.get(chat_id)
+                if entry is not None and entry.version == version:
+                    entry.data.setdefault("messages", []).extend(copy.deepcopy(messages))
+                    self.chats[chat_id] = Versioned(entry.data, new_version)
+                return new_version
+            metrics.increment("chat_cache.stale")
+        self.forget(chat_id)
+        await append_restoring(storage, chat_id, *messages)
+        return None
+
+    def forget(self, chat_id: str) -> None:
+        self.chats.pop(chat_id, None)
+
+    async def get_bot(self, storage: Storage, bot_id: str) -> Optional[dict]:
+        bot_data = self.bots.get(bot_id)
+        if bot_data is None:
+            bot_data = await get_bot(storage, bot_id)
+            if bot_data is None:
+                return None
+            self.bots[bot_id] = bot_data
+        return copy.deepcopy(bot_data)
+
+    def forget_bot(self, bot_id: str) -> None:
+        self.bots.pop(bot_id, None)
+
+
+chat_cache = ChatCache(
+    maxsize=settings.chat_cache_size,
+    ttl=settings.chat_cache_ttl,
+    bot_ttl=settings.bot_cache_ttl,
+)
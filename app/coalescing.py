@@ -0,0 +1,64 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from app.metrics import metrics
+from app.storage.base import Storage
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one in-flight call.
+
+    The first caller runs the function; callers arriving while it runs wait
+    for it and get their own deep copy of the result, or the same exception.
+    Nothing is cached once the call finishes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: dict[Hashable, asyncio.Future] = {}
+        self.waiting: dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self.calls:
+            future = self.calls[key]
+            metrics.increment(f"single_flight.{self.name}.coalesced")
+            self.waiting[key] += 1
+            try:
+                return copy.deepcopy(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leading call was cancelled, so run it ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self.calls[key] = future
+        self.waiting[key] = 0
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody is waiting
+            raise
+        finally:
+            del self.calls[key]
+            waiters = self.waiting.pop(key)
+        future.set_result(result)
+        # Waiters copy from the future, so the caller must not mutate it in place
+        return copy.deepcopy(result) if waiters else result
+
+
+bot_reads = SingleFlight("bot_reads")
+user_reads = SingleFlight("user_reads")
+
+
+async def get_bot(storage: Storage, bot_id: str) -> Optional[dict]:
+    """Read a bot off the event loop, sharing the read with concurrent callers."""
+    return await bot_reads.do(bot_id, lambda: asyncio.to_thread(storage.bots.get, bot_id))
+
+
+async def get_user(storage: Storage, email: str) -> Optional[dict]:
+    """Read a user off the event loop, sharing the read with concurrent callers."""
+    return await user_reads.do(email, lambda: asyncio.to_thread(storage.users.get, email))
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
+from typing import Optional
 
 class Settings(BaseSettings):
     model_config = ConfigDict(env_file=".env", extra="ignore")
@@ -9,5 +10,71 @@ class Settings(BaseSettings):
     gemini_api_key: str
     secret_key: str
     algorithm: str = "HS256"
+    access_token_ttl: int = 900
+    refresh_token_ttl: int = 2592000
+    accept_google_tokens: bool = True
+    response_cache_backend: str = "memory"
+    response_cache_size: int = 1024
+    response_cache_ttl: int = 3600
+    response_cache_max_messages: int = 2
+    greeting_pool_size: int = 3
+    idempotency_backend: str = "memory"
+    idempotency_ttl: int = 86400
+    idempotency_max_keys: int = 10000
+    generation_timeout: float = 30.0
+    http_timeout: float = 10.0
+    http_connect_timeout: float = 5.0
+    http_retries: int = 2
+    http_backoff: float = 0.2
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    warm_up: bool = True
+    warm_up_timeout: float = 10.0
+    loop_lag_interval: float = 0.5
+    loop_lag_threshold: float = 0.2
+    max_expensive_in_flight: int = 32
+    overload_readiness_after: float = 10.0
+    shed_retry_after: int = 5
+    rate_limit_backend: str = "memory"
+    rate_limits: dict[str, str] = {"send_message": "20/minute", "create_bot": "10/hour"}
+    default_model: str = "gemini-2.0-flash"
+    fallback_model: Optional[str] = "gemini-2.0-flash-lite"
+    # Models bot authors may choose, besides the default and fallback models
+    bot_models: list[str] = ["gemini-2.0-flash", "gemini-2.0-flash-lite", "gemini-2.5-flash"]
+    simple_turn_max_chars: int = 60
+    gemini_fallback_timeout: float = 8.0
+    gemini_call_timeout: float = 15.0
+    gemini_max_retries: int = 2
+    gemini_backoff_base: float = 0.5
+    gemini_backoff_max: float = 4.0
+    gemini_hedge_after: Optional[float] = None
+    gemini_breaker_failures: int = 5
+    gemini_breaker_recovery: float = 30.0
+    transcript_format: str = "messages"
+    transcript_codec: str = "zlib"
+    transcript_chunk_size: int = 50
+    archive_backend: str = "local"
+    archive_bucket: Optional[str] = None
+    archive_path: str = "archive"
+    # Set when ARCHIVE_PATH is a volume every replica mounts
+    archive_path_shared: bool = False
+    archive_after: Optional[float] = None
+    archive_interval: float = 3600.0
+    archive_batch_size: int = 100
+    chat_cache_size: int = 1024
+    chat_cache_ttl: float = 600.0
+    bot_cache_ttl: float = 60.0
+    long_term_memory: bool = False
+    memory_window: int = 20
+    memory_top_k: int = 4
+    embedding_provider: str = "local"
+    embedding_model: str = "text-embedding-004"
+    embedding_dim: int = 256
+    bot_search_refresh: float = 300.0
+    purge_ops_per_second: int = 100
+    purge_job_ttl: float = 86400.0
+    # Messages a sync returns again, in seconds; longer than any turn takes
+    sync_overlap: float = 120.0
+    sync_wait: float = 25.0
 
 settings = Settings()
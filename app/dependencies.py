@@ -1,17 +1,47 @@
+import asyncio
+from functools import lru_cache
+from typing import TYPE_CHECKING
+import httpx
+import jwt
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-from google.cloud import firestore
 from app.config import settings
+from app.tokens import ACCESS, decode_token, is_session_token
+from app.storage.base import Storage
+from app.http_client import create_http_client, google_auth_request
+from app.coalescing import SingleFlight
+
+if TYPE_CHECKING:
+    from google.cloud import firestore
 
 security = HTTPBearer()
+token_verifications = SingleFlight("token_verifications")
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await verify_token(credentials.credentials)
+
+async def verify_token(token: str) -> dict:
+    """Resolve a bearer token to the current user without blocking the event loop."""
+    if is_session_token(token):
+        return authenticate_token(token)
+    # Google verification is slow, so share it between concurrent requests
+    return await token_verifications.do(token, lambda: asyncio.to_thread(authenticate_token, token))
+
+def authenticate_token(token: str) -> dict:
+    """Resolve a bearer token to the current user or raise a 401."""
+    # Our own session tokens only need a local HMAC check
+    try:
+        payload = decode_token(token, ACCESS)
+        return {"email": payload["sub"]}
+    except jwt.InvalidTokenError as e:
+        if is_session_token(token) or not settings.accept_google_tokens:
+            print(e)
+            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
     try:
-        token = credentials.credentials
         # Verify the Google OAuth token
-        payload = id_token.verify_oauth2_token(token, google_requests.Request(), settings.google_client_id)
+        payload = id_token.verify_oauth2_token(token, google_auth_request, settings.google_client_id)
         email = payload.get("email")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
@@ -20,6 +50,25 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         print(e)
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
-def get_firestore() -> firestore.Client:
-    """Get a Firestore client."""
-    return firestore.Client() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_firestore() -> "firestore.Client":
+    """Get the shared Firestore client, created on first use.
+
+    The Firestore library loads grpc, so it is imported here rather than at
+    startup.
+    """
+    from google.cloud import firestore
+    return firestore.Client()
+
+def get_storage(db=Depends(get_firestore)) -> Storage:
+    """Get the storage repositories backed by Firestore."""
+    from app.storage.firestore import FirestoreStorage
+    chunk_size = settings.transcript_chunk_size if settings.transcript_format == "compact" else None
+    return FirestoreStorage(db, chunk_size, settings.transcript_codec)
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Get the shared outbound HTTP client owned by the app lifespan."""
+    if getattr(request.app.state, "http_client", None) is None:
+        # Created on demand when the app runs without its lifespan
+        request.app.state.http_client = create_http_client()
+    return request.app.state.http_client
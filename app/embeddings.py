@@ -0,0 +1,82 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from app.config import settings
+
+WORD = re.compile(r"\w+")
+
+
+class EmbeddingProvider(ABC):
+    """Turns texts into unit-length vectors for retrieval."""
+
+    # Identifies the vector space, so indexes built by another provider are rebuilt
+    name: str
+    dim: int
+
+    @abstractmethod
+    async def embed(self, texts: list[str]):
+        """Return a float32 NumPy array with one row per text."""
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Deterministic local embeddings from hashed words and character trigrams.
+
+    Trigrams let inflected forms of a word ("kawa", "kawy", "kawę") land
+    close to each other. Needs no network, so it is used in tests.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> list[str]:
+        features = []
+        for word in WORD.findall(text.casefold()):
+            features.append(word)
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    async def embed(self, texts: list[str]):
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the Gemini API, under the model's resilience policy."""
+
+    def __init__(self, model: str, dim: int):
+        self.model = model
+        self.dim = dim
+        self.name = f"gemini-{model}-{dim}"
+
+    async def embed(self, texts: list[str]):
+        import numpy as np
+        from google.genai import types
+        from app.gemini import get_client, get_policy
+
+        response = await get_policy(self.model).call(lambda: get_client().aio.models.embed_content(
+            model=self.model,
+            contents=texts,
+            config=types.EmbedContentConfig(output_dimensionality=self.dim),
+        ))
+        vectors = np.array([embedding.values for embedding in response.embeddings], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+def create_embedding_provider() -> EmbeddingProvider:
+    if settings.embedding_provider == "gemini":
+        return GeminiEmbeddingProvider(settings.embedding_model, settings.embedding_dim)
+    return HashingEmbeddingProvider(settings.embedding_dim)
+
+
+embedding_provider = create_embedding_provider()
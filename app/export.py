@@ -0,0 +1,50 @@
+"""Study history exports as newline-delimited JSON.
+
+Each line is one chat, and the chat's ``id`` is the cursor: a download that
+breaks is resumed by requesting the export again with ``after`` set to the id
+of the last complete line. A final ``{"complete": true}`` line tells a whole
+export from a truncated one.
+"""
+import json
+from typing import Iterator, Optional
+from fastapi.encoders import jsonable_encoder
+from app.archive import ObjectStore
+from app.metrics import metrics
+from app.storage.base import Storage
+from app.storage.transcript import decompress
+
+# Chat fields a learner gets back; prompts and storage bookkeeping stay behind
+EXPORT_FIELDS = ("id", "bot_id", "last_active", "messages")
+
+
+def export_record(storage: Storage, store: ObjectStore, chat_data: dict) -> dict:
+    """The exported form of a chat, read from its archive if it has one.
+
+    Archived chats are read without restoring them, so an export does not
+    count as activity.
+    """
+    if chat_data.get("archived"):
+        data = store.get(chat_data["archive_key"])
+        if data is not None:
+            chat_data = {**decompress(data), "id": chat_data["id"]}
+        else:
+            # Restored since it was listed; the chat document has it all again
+            chat_data = {**(storage.chats.get(chat_data["id"]) or {}), "id": chat_data["id"]}
+    record = {field: chat_data.get(field) for field in EXPORT_FIELDS}
+    record["messages"] = record["messages"] or []
+    return record
+
+
+def export_lines(storage: Storage, store: ObjectStore, user_id: str, after: Optional[str] = None) -> Iterator[bytes]:
+    """Yield a user's chats as NDJSON lines, one chat at a time.
+
+    Nothing is read ahead of what the client has taken, so memory stays at
+    one storage page however long the history is.
+    """
+    exported = 0
+    for chat_data in storage.chats.export_for_user(user_id, after):
+        line = json.dumps(jsonable_encoder(export_record(storage, store, chat_data)), ensure_ascii=False)
+        exported += 1
+        yield (line + "\n").encode()
+    metrics.increment("export.chats", exported)
+    yield (json.dumps({"complete": True, "chats": exported}) + "\n").encode()
@@ -0,0 +1,118 @@
+import math
+from typing import AsyncIterator, NamedTuple, Optional
+from fastapi import HTTPException
+from app.config import settings
+from app.metrics import metrics
+from app.resilience import CircuitBreaker, CircuitOpenError, ResiliencePolicy, is_retryable
+
+_client = None
+_policies: dict[str, ResiliencePolicy] = {}
+
+class Reply(NamedTuple):
+    text: str
+    model: str
+
+def get_policy(model: str) -> ResiliencePolicy:
+    """Resilience policy for a model. Each model has its own circuit breaker."""
+    if model not in _policies:
+        _policies[model] = ResiliencePolicy(
+            f"gemini.{model}",
+            timeout=settings.gemini_call_timeout,
+            max_retries=settings.gemini_max_retries,
+            backoff_base=settings.gemini_backoff_base,
+            backoff_max=settings.gemini_backoff_max,
+            hedge_after=settings.gemini_hedge_after,
+            breaker=CircuitBreaker(f"gemini.{model}", settings.gemini_breaker_failures, settings.gemini_breaker_recovery),
+        )
+    return _policies[model]
+
+def get_client():
+    """Get the Gemini client, importing google-genai on first use."""
+    global _client
+    if _client is None:
+        from google import genai
+        _client = genai.Client(api_key=settings.gemini_api_key)
+    return _client
+
+def __getattr__(name: str):
+    # Keep `app.gemini.client` working without creating the client at import
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def generation_config(bot_prompt: str):
+    from google.genai import types
+    return types.GenerateContentConfig(response_mime_type="text/plain", system_instruction=bot_prompt)
+
+def format_history(chat_history: list[dict]) -> list:
+    """Format chat history for Gemini API."""
+    from google.genai import types
+    formatted_history = []
+    for msg in chat_history:
+        if msg["role"] == "user":
+            formatted_history.append(types.Content(parts=[types.Part(text=msg["content"])], role="user"))
+        else:
+            formatted_history.append(types.Content(parts=[types.Part(text=msg["content"])], role="model"))
+    return formatted_history
+
+async def call_gemini(models: list[str], call, hedge: bool = True):
+    """Call the first available model, falling back down the list on outages.
+
+    Models with a fallback after them get a single attempt under the shorter
+    GEMINI_FALLBACK_TIMEOUT, so a slow or overloaded model hands over quickly.
+    Returns the result and the model that served it; raises 503 when all fail.
+    """
+    retry_after = None
+    for index, model in enumerate(models):
+        policy = get_policy(model)
+        has_fallback = index < len(models) - 1
+        try:
+            result = await policy.call(
+                lambda: call(model),
+                hedge=hedge,
+                max_retries=0 if has_fallback else None,
+                timeout=settings.gemini_fallback_timeout if has_fallback else None,
+            )
+        except CircuitOpenError:
+            retry_after = policy.breaker.retry_after() if retry_after is None else min(retry_after, policy.breaker.retry_after())
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            print(f"Error in call_gemini with {model}: {e}")
+        else:
+            if index > 0:
+                metrics.increment("gemini.fallbacks")
+            metrics.increment(f"gemini.{model}.served")
+            return result, model
+
+    headers = {"Retry-After": str(math.ceil(retry_after))} if retry_after is not None else None
+    raise HTTPException(status_code=503, detail="Model temporarily unavailable", headers=headers)
+
+async def generate_reply(bot_prompt: str, chat_history: list[dict], models: Optional[list[str]] = None) -> Reply:
+    """Generate the model's reply to a chat history."""
+    contents = format_history(chat_history)
+    response, model = await call_gemini(models or [settings.default_model], lambda model: get_client().aio.models.generate_content(
+        model=model, 
+        config=generation_config(bot_prompt),
+        contents=contents
+    ))
+    
+    if response.text == "":
+        raise HTTPException(status_code=400, detail="No response from model.")
+    return Reply(response.text, model)
+
+async def stream_reply(bot_prompt: str, chat_history: list[dict], models: Optional[list[str]] = None) -> tuple[str, AsyncIterator[str]]:
+    """Open a streamed reply. Returns the serving model and the text chunks."""
+    contents = format_history(chat_history)
+    stream, model = await call_gemini(models or [settings.default_model], lambda model: get_client().aio.models.generate_content_stream(
+        model=model, 
+        config=generation_config(bot_prompt),
+        contents=contents
+    ), hedge=False)
+
+    async def chunks():
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+    return model, chunks()
@@ -0,0 +1,59 @@
+import asyncio
+import hashlib
+import random
+from typing import Optional
+from app.config import settings
+from app.gemini import generate_reply
+from app.routing import choose_models
+from app.storage.base import Storage
+
+GREETING_REQUEST = "Start the conversation with a short greeting for the learner."
+
+def prompt_hash(prompt: str) -> str:
+    """Identify the prompt a greeting pool was generated for."""
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+async def generate_greetings(bot_data: dict, count: int) -> list[str]:
+    """Ask the model for a pool of opening messages."""
+    request = [{"role": "user", "content": GREETING_REQUEST}]
+    models = choose_models(bot_data, [])
+    replies = await asyncio.gather(*(generate_reply(bot_data["prompt"], request, models) for _ in range(count)))
+    return [reply.text for reply in replies]
+
+async def refresh_greetings(bot_id: str, storage: Storage) -> None:
+    """Regenerate the greeting pool of a bot. Runs as a background task."""
+    try:
+        bot_data = storage.bots.get(bot_id)
+        if bot_data is None:
+            return
+        greetings = await generate_greetings(bot_data, settings.greeting_pool_size)
+
+        # Drop the pool if the prompt changed while it was being generated
+        current = storage.bots.get(bot_id)
+        if current is None or current["prompt"] != bot_data["prompt"]:
+            return
+        storage.bots.update(bot_id, {
+            "greetings": greetings,
+            "greetings_prompt_hash": prompt_hash(bot_data["prompt"]),
+        })
+    except Exception as e:
+        print(f"Error in refresh_greetings for bot {bot_id}: {e}")
+
+def pick_greeting(bot_data: dict) -> Optional[str]:
+    """Return a stored greeting that matches the bot's current prompt, if any."""
+    greetings = bot_data.get("greetings")
+    if not greetings or bot_data.get("greetings_prompt_hash") != prompt_hash(bot_data["prompt"]):
+        return None
+    return random.choice(greetings)
+
+async def backfill_greetings(storage: Storage) -> None:
+    """Generate pools for every bot that has none for its current prompt."""
+    for bot_data in storage.bots.list():
+        if pick_greeting(bot_data) is None:
+            await refresh_greetings(bot_data["id"], storage)
+
+if __name__ == "__main__":
+    from app.dependencies import get_firestore
+    from app.storage.firestore import FirestoreStorage
+
+    asyncio.run(backfill_greetings(FirestoreStorage(get_firestore())))
@@ -0,0 +1,39 @@
+import asyncio
+import random
+from typing import Optional
+import httpx
+from google.auth.transport import requests as google_requests
+from app.config import settings
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# google-auth only ships a synchronous transport, so token verification reuses
+# one pooled requests session instead of opening a new one per call
+google_auth_request = google_requests.Request()
+
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Build the shared outbound HTTP client with pooling, timeouts and connect retries."""
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            retries=settings.http_retries,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+            ),
+        )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+    )
+
+async def get_with_retries(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    """GET a URL, retrying transient failures with jittered exponential backoff."""
+    for attempt in range(settings.http_retries + 1):
+        try:
+            response = await client.get(url, **kwargs)
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == settings.http_retries:
+                return response
+        except httpx.TransportError:
+            if attempt == settings.http_retries:
+                raise
+        await asyncio.sleep(random.uniform(0, settings.http_backoff * 2 ** attempt))
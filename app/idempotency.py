@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, UTC
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Hashable, Optional
+from cachetools import TTLCache
+from fastapi import HTTPException
+from app.cancellation import ClientDisconnected
+from app.config import settings
+
+if TYPE_CHECKING:
+    from google.cloud import firestore
+
+
+class IdempotencyBackend(ABC):
+    """Stores the results of completed requests by idempotency key."""
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[tuple[str, Any]]:
+        """Return the request fingerprint and result stored for the key, or None."""
+
+    @abstractmethod
+    def set(self, key: Hashable, fingerprint: str, result: Any) -> None:
+        """Store a completed request's fingerprint and result."""
+
+
+class MemoryIdempotencyBackend(IdempotencyBackend):
+    """Per-process results whose entries expire after a TTL. A retry that
+    reaches another replica runs again."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[tuple[str, Any]]:
+        with self.lock:
+            return self.entries.get(key)
+
+    def set(self, key: Hashable, fingerprint: str, result: Any) -> None:
+        with self.lock:
+            self.entries[key] = (fingerprint, result)
+
+
+class FirestoreIdempotencyBackend(IdempotencyBackend):
+    """Results shared by all replicas, stored in a Firestore collection.
+
+    Expired entries are ignored on read; a Firestore TTL policy on
+    ``expires_at`` removes them from the collection.
+    """
+
+    def __init__(self, ttl: int, collection: str = "idempotency_keys", db: Optional["firestore.Client"] = None):
+        self.ttl = ttl
+        self.collection_name = collection
+        self.db = db
+
+    def _document(self, key: Hashable):
+        if self.db is None:
+            from app.dependencies import get_firestore
+            self.db = get_firestore()
+        doc_id = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+        return self.db.collection(self.collection_name).document(doc_id)
+
+    def get(self, key: Hashable) -> Optional[tuple[str, Any]]:
+        snapshot = self._document(key).get()
+        if not snapshot.exists:
+            return None
+        entry = snapshot.to_dict()
+        if entry["expires_at"] <= datetime.now(UTC):
+            return None
+        return entry["fingerprint"], entry["result"]
+
+    def set(self, key: Hashable, fingerprint: str, result: Any) -> None:
+        self._document(key).set({
+            "fingerprint": fingerprint,
+            "result": result,
+            "expires_at": datetime.now(UTC) + timedelta(seconds=self.ttl),
+        })
+
+
+class IdempotencyStore:
+    """Runs each idempotency key once and replays its result to retries.
+
+    Completed results are kept in the backend. While the first request for a
+    key is still running, duplicates reaching the same replica wait on it
+    instead of repeating the work; one reaching another replica then runs
+    too. Failed requests are not stored, so the client may retry them. A
+    request whose client disconnected counts as cancelled: a duplicate waiting
+    on it, usually the same client reconnecting, takes over the work.
+    """
+
+    def __init__(self, backend: IdempotencyBackend):
+        self.backend = backend
+        self.in_flight: dict[Hashable, tuple[str, asyncio.Future]] = {}
+
+    @staticmethod
+    def fingerprint(payload: str) -> str:
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def run(self, key: Hashable, payload: str, func: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Return the result for the key and whether it was replayed."""
+        fingerprint = self.fingerprint(payload)
+
+        while True:
+            while key in self.in_flight:
+                stored_fingerprint, future = self.in_flight[key]
+                self._check_fingerprint(stored_fingerprint, fingerprint)
+                try:
+                    return await asyncio.shield(future), True
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                    # The original request was cancelled, so take over the work
+
+            # The Firestore backend blocks, so keep it off the event loop
+            stored = await asyncio.to_thread(self.backend.get, key)
+            if stored is not None:
+                stored_fingerprint, result = stored
+                self._check_fingerprint(stored_fingerprint, fingerprint)
+                return result, True
+            # A duplicate may have started while the backend was read
+            if key not in self.in_flight:
+                break
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = (fingerprint, future)
+        try:
+            result = await func()
+            # Stored before the key leaves in_flight, so no duplicate misses both
+            await asyncio.to_thread(self.backend.set, key, fingerprint, result)
+        except (asyncio.CancelledError, ClientDisconnected):
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody is waiting
+            raise
+        finally:
+            del self.in_flight[key]
+        future.set_result(result)
+        return result, False
+
+    @staticmethod
+    def _check_fingerprint(stored: str, current: str) -> None:
+        if stored != current:
+            raise HTTPException(status_code=422, detail="Idempotency-Key reused with a different request")
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    """Build the idempotency store for the configured backend."""
+    if settings.idempotency_backend == "firestore":
+        backend = FirestoreIdempotencyBackend(ttl=settings.idempotency_ttl)
+    else:
+        backend = MemoryIdempotencyBackend(maxsize=settings.idempotency_max_keys, ttl=settings.idempotency_ttl)
+    return IdempotencyStore(backend)
+
+
+idempotency_store = create_idempotency_store()
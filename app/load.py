@@ -0,0 +1,99 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from fastapi import HTTPException
+from app.config import settings
+from app.metrics import metrics
+
+
+class LoadMonitor:
+    """Tracks event-loop lag and in-flight requests to detect overload.
+
+    A sampler task sleeps for a fixed interval and records how late it wakes
+    up, smoothed with an exponential moving average. The app is overloaded
+    when that lag or the number of in-flight expensive requests passes its
+    limit.
+    """
+
+    def __init__(self, interval: float, lag_threshold: float, max_expensive: int, smoothing: float = 0.3):
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.max_expensive = max_expensive
+        self.smoothing = smoothing
+        self.lag = 0.0
+        self.in_flight = 0
+        self.expensive_in_flight = 0
+        self.overloaded_since: Optional[float] = None
+
+    async def sample_lag(self) -> None:
+        """Run forever, sampling event-loop lag."""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record_lag(max(0.0, loop.time() - start - self.interval))
+
+    def record_lag(self, lag: float) -> None:
+        self.lag = self.smoothing * lag + (1 - self.smoothing) * self.lag
+        metrics.set_gauge("event_loop.lag", self.lag)
+        self._update_overload()
+
+    def overloaded(self) -> bool:
+        return self.lag > self.lag_threshold or self.expensive_in_flight >= self.max_expensive
+
+    def sustained_overload(self, duration: float) -> bool:
+        """Whether the app has been overloaded for at least `duration` seconds."""
+        self._update_overload()
+        return self.overloaded_since is not None and time.monotonic() - self.overloaded_since >= duration
+
+    def _update_overload(self) -> None:
+        if not self.overloaded():
+            self.overloaded_since = None
+        elif self.overloaded_since is None:
+            self.overloaded_since = time.monotonic()
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+        metrics.set_gauge("requests.in_flight", self.in_flight)
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+        metrics.set_gauge("requests.in_flight", self.in_flight)
+
+    def expensive_started(self) -> None:
+        self.expensive_in_flight += 1
+        metrics.set_gauge("requests.expensive_in_flight", self.expensive_in_flight)
+
+    def expensive_finished(self) -> None:
+        self.expensive_in_flight -= 1
+        metrics.set_gauge("requests.expensive_in_flight", self.expensive_in_flight)
+
+    @contextmanager
+    def expensive(self) -> Iterator[None]:
+        """Count the enclosed work as an expensive request in flight."""
+        self.expensive_started()
+        try:
+            yield
+        finally:
+            self.expensive_finished()
+
+
+load_monitor = LoadMonitor(
+    interval=settings.loop_lag_interval,
+    lag_threshold=settings.loop_lag_threshold,
+    max_expensive=settings.max_expensive_in_flight,
+)
+
+
+async def shed_when_overloaded():
+    """Dependency for expensive routes: reject early with 503 under overload."""
+    if load_monitor.overloaded():
+        metrics.increment("requests.shed")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is overloaded, please retry",
+            headers={"Retry-After": str(settings.shed_retry_after)},
+        )
+    with load_monitor.expensive():
+        yield
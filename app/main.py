@@ -1,16 +1,47 @@
-from fastapi import FastAPI, Request, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException, Response
 from app.auth import router as auth_router
 from app.routes.chat import router as chat_router
+from app.routes.chat_ws import router as chat_ws_router
 from app.routes.users import router as users_router
 from app.routes.bots import router as bots_router
+from app.routes.home import router as home_router
+from app.routes.sync import router as sync_router
 import time
 from app.config import settings
+from app.metrics import metrics
+from app.http_client import create_http_client
+from app.warmup import warm_up
+from app.load import load_monitor
+from app.archive import check_shared_store, run_archiver
+from app.dependencies import get_firestore, get_storage
 
-app = FastAPI(title="Pleść API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.archive_after is not None:
+        check_shared_store()
+    app.state.http_client = create_http_client()
+    app.state.ready = False
+    # Warm up in the background so the server starts serving /health right away
+    warm_up_task = asyncio.create_task(warm_up(app))
+    tasks = [asyncio.create_task(load_monitor.sample_lag())]
+    if settings.archive_after is not None:
+        tasks.append(asyncio.create_task(run_archiver(get_storage(get_firestore()))))
+    yield
+    warm_up_task.cancel()
+    for task in tasks:
+        task.cancel()
+    await app.state.http_client.aclose()
+
+app = FastAPI(title="Pleść API", lifespan=lifespan)
 app.include_router(auth_router, prefix="/auth")
 app.include_router(chat_router, prefix="/chat")
+app.include_router(chat_ws_router, prefix="/chat")
 app.include_router(users_router, prefix="/users")
 app.include_router(bots_router, prefix="/bots")
+app.include_router(home_router, prefix="/home")
+app.include_router(sync_router, prefix="/sync")
 
 @app.get("/")
 async def root():
@@ -20,10 +51,32 @@ async def root():
 async def health():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def ready(response: Response):
+    if not getattr(app.state, "ready", True):
+        response.status_code = 503
+        return {"status": "starting"}
+    if load_monitor.sustained_overload(settings.overload_readiness_after):
+        response.status_code = 503
+        return {"status": "overloaded"}
+    return {"status": "ok"}
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.perf_counter()
     response = await call_next(request)
     process_time = time.perf_counter() - start_time
     response.headers["X-Process-Time"] = str(process_time)
-    return response
\ No newline at end of file
+    return response
+
+@app.middleware("http")
+async def track_in_flight(request: Request, call_next):
+    load_monitor.request_started()
+    try:
+        return await call_next(request)
+    finally:
+        load_monitor.request_finished()
\ No newline at end of file
@@ -0,0 +1,37 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Process-local counters and gauges, exposed as JSON on /metrics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[str, float] = defaultdict(float)
+        self.gauges: dict[str, float] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self.lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self.lock:
+            self.gauges[name] = value
+
+    def get(self, name: str) -> float:
+        with self.lock:
+            if name in self.gauges:
+                return self.gauges[name]
+            return self.counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"counters": dict(self.counters), "gauges": dict(self.gauges)}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, UTC
+from typing import Optional
+from cachetools import TTLCache
+from app.archive import object_store
+from app.chat_cache import chat_cache
+from app.config import settings
+from app.metrics import metrics
+from app.storage.base import Storage
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class PurgeJob:
+    """Deletes one user, then their chats, the chats' archives and indexes.
+
+    The user document goes first, so the account's refresh tokens stop
+    working as soon as the deletion starts.
+    """
+
+    def __init__(self, email: str):
+        self.email = email
+        self.status = RUNNING
+        self.chats_deleted = 0
+        self.started_at = datetime.now(UTC)
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _chat_deleted(self, chat_id: str) -> None:
+        # Called from storage threads; the chat cache belongs to the event loop
+        self.chats_deleted += 1
+        self.loop.call_soon_threadsafe(chat_cache.forget, chat_id)
+
+    def _purge(self, storage: Storage) -> None:
+        storage.users.delete(self.email)
+        archive_keys = []
+
+        def chat_ids():
+            for chat in storage.chats.stream_for_user(self.email):
+                if "archive_key" in chat:
+                    archive_keys.append(chat["archive_key"])
+                yield chat["id"]
+
+        storage.delete_chats(chat_ids(), self._chat_deleted, settings.purge_ops_per_second)
+        for key in archive_keys:
+            object_store.delete(key)
+
+    async def run(self, storage: Storage) -> None:
+        self.loop = asyncio.get_running_loop()
+        try:
+            await asyncio.to_thread(self._purge, storage)
+        except Exception as e:
+            print(f"Error purging account {self.email}: {e}")
+            self.status = FAILED
+            self.error = "Account deletion failed, please retry"
+            metrics.increment("purge.failed")
+        else:
+            self.status = DONE
+            metrics.increment("purge.completed")
+        finally:
+            self.finished_at = datetime.now(UTC)
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "chats_deleted": self.chats_deleted,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class PurgeJobs:
+    """Account deletions running in this process, kept for a while after they finish.
+
+    Deleting is idempotent, so a failed job or one lost with its process is
+    finished by requesting the deletion again.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.jobs = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def start(self, email: str, storage: Storage) -> PurgeJob:
+        """Start deleting an account, or return the deletion already running."""
+        job = self.jobs.get(email)
+        if job is not None and job.status == RUNNING:
+            return job
+        job = self.jobs[email] = PurgeJob(email)
+        job.task = asyncio.create_task(job.run(storage))
+        metrics.increment("purge.started")
+        return job
+
+    def get(self, email: str) -> Optional[PurgeJob]:
+        return self.jobs.get(email)
+
+
+purge_jobs = PurgeJobs(maxsize=10000, ttl=settings.purge_job_ttl)
@@ -0,0 +1,148 @@
+import asyncio
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, NamedTuple, Optional
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException, Response
+from app.config import settings
+from app.dependencies import get_current_user
+from app.metrics import metrics
+
+if TYPE_CHECKING:
+    from google.cloud import firestore
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Limit(NamedTuple):
+    capacity: int
+    period: float
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        """Parse limits like "20/minute" or "5/10" (requests per seconds)."""
+        count, period = value.split("/")
+        return cls(int(count), PERIODS[period] if period in PERIODS else float(period))
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+    reset_after: float
+
+
+def take_token(tokens: float, updated: float, now: float, limit: Limit) -> tuple[float, Decision]:
+    """Refill a bucket up to now and try to take one token from it."""
+    tokens = min(limit.capacity, tokens + (now - updated) * limit.refill_rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    retry_after = 0.0 if allowed else (1 - tokens) / limit.refill_rate
+    reset_after = (limit.capacity - tokens) / limit.refill_rate
+    return tokens, Decision(allowed, math.floor(tokens), retry_after, reset_after)
+
+
+class RateLimitBackend(ABC):
+    """Stores token buckets."""
+
+    @abstractmethod
+    def acquire(self, key: str, limit: Limit) -> Decision:
+        """Take one token from the bucket for the key."""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process buckets. Idle buckets are dropped once they would be full."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self.buckets: dict[float, TTLCache] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key: str, limit: Limit) -> Decision:
+        with self.lock:
+            buckets = self.buckets.get(limit.period)
+            if buckets is None:
+                buckets = self.buckets[limit.period] = TTLCache(maxsize=self.maxsize, ttl=limit.period)
+            now = time.monotonic()
+            tokens, updated = buckets.get(key, (limit.capacity, now))
+            tokens, decision = take_token(tokens, updated, now, limit)
+            buckets[key] = (tokens, now)
+            return decision
+
+
+class FirestoreRateLimitBackend(RateLimitBackend):
+    """Buckets shared by all replicas, updated in Firestore transactions."""
+
+    def __init__(self, collection: str = "rate_limits", db: Optional["firestore.Client"] = None):
+        self.collection_name = collection
+        self.db = db
+
+    def acquire(self, key: str, limit: Limit) -> Decision:
+        from google.cloud import firestore
+        if self.db is None:
+            from app.dependencies import get_firestore
+            self.db = get_firestore()
+        ref = self.db.collection(self.collection_name).document(key)
+
+        @firestore.transactional
+        def update(transaction):
+            snapshot = ref.get(transaction=transaction)
+            now = time.time()
+            bucket = snapshot.to_dict() if snapshot.exists else {"tokens": limit.capacity, "updated": now}
+            tokens, decision = take_token(bucket["tokens"], bucket["updated"], now, limit)
+            transaction.set(ref, {"tokens": tokens, "updated": now})
+            return decision
+
+        return update(self.db.transaction())
+
+
+def create_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "firestore":
+        return FirestoreRateLimitBackend()
+    return MemoryRateLimitBackend()
+
+
+rate_limit_backend = create_backend()
+
+
+def check_rate_limit(route: str, email: str) -> Optional[Decision]:
+    """Take a token for the user on a route. Returns None for unlimited routes."""
+    if route not in settings.rate_limits:
+        return None
+    limit = Limit.parse(settings.rate_limits[route])
+    decision = rate_limit_backend.acquire(f"{route}:{email}", limit)
+    if not decision.allowed:
+        metrics.increment(f"rate_limit.rejected.{route}")
+    return decision
+
+
+def rate_limit_headers(route: str, decision: Decision) -> dict:
+    headers = {
+        "RateLimit-Limit": str(Limit.parse(settings.rate_limits[route]).capacity),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(math.ceil(decision.reset_after)),
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(math.ceil(decision.retry_after))
+    return headers
+
+
+def rate_limit(route: str):
+    """Dependency enforcing the per-user limit configured for a route."""
+    async def dependency(response: Response, current_user: dict = Depends(get_current_user)):
+        # The Firestore backend runs a transaction, so keep it off the event loop
+        decision = await asyncio.to_thread(check_rate_limit, route, current_user["email"])
+        if decision is None:
+            return
+        headers = rate_limit_headers(route, decision)
+        if not decision.allowed:
+            raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=headers)
+        response.headers.update(headers)
+    return dependency
@@ -0,0 +1,130 @@
+"""Long-term memory for long chats.
+
+Only the most recent MEMORY_WINDOW messages are sent to the model as they
+are. Older turns (a learner message and the reply to it) are embedded into a
+per-chat index stored beside the chat, and the MEMORY_TOP_K turns closest to
+the new message are sent ahead of the recent window, in chat order.
+"""
+import asyncio
+from typing import Optional
+from app.config import settings
+from app.embeddings import EmbeddingProvider, embedding_provider
+from app.metrics import metrics
+from app.storage.base import Storage
+
+# Texts embedded per provider call
+EMBED_BATCH = 100
+
+
+class ChatIndex:
+    """Embeddings of a chat's past turns, keyed by the position of the turn's
+    first message. Turns before ``indexed_until`` have been considered."""
+
+    def __init__(self, provider: str, dim: int, indexed_until: int = 0, positions: Optional[list[int]] = None, vectors=None):
+        import numpy as np
+
+        self.provider = provider
+        self.dim = dim
+        self.indexed_until = indexed_until
+        self.positions = positions or []
+        self.vectors = vectors if vectors is not None else np.zeros((0, dim), dtype=np.float32)
+
+    @classmethod
+    def from_document(cls, data: dict) -> "ChatIndex":
+        import numpy as np
+
+        vectors = np.frombuffer(data["vectors"], dtype=np.float16).astype(np.float32).reshape(-1, data["dim"])
+        return cls(data["provider"], data["dim"], data["indexed_until"], list(data["positions"]), vectors)
+
+    def to_document(self) -> dict:
+        import numpy as np
+
+        # Half precision is plenty for ranking and halves the document size
+        return {
+            "provider": self.provider,
+            "dim": self.dim,
+            "indexed_until": self.indexed_until,
+            "positions": self.positions,
+            "vectors": self.vectors.astype(np.float16).tobytes(),
+        }
+
+    def add(self, positions: list[int], vectors) -> None:
+        import numpy as np
+
+        self.positions.extend(positions)
+        self.vectors = np.vstack([self.vectors, vectors])
+
+    def search(self, query, k: int) -> list[int]:
+        """Positions of the k turns most similar to a unit query vector."""
+        import numpy as np
+
+        if not self.positions:
+            return []
+        scores = self.vectors @ query
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [self.positions[i] for i in best]
+
+
+def turns(history: list[dict], start: int, end: int) -> list[tuple[int, str]]:
+    """Turns that begin with a learner message in history[start:end]."""
+    found = []
+    for position in range(start, end):
+        if history[position]["role"] != "user":
+            continue
+        text = history[position]["content"]
+        if position + 1 < end and history[position + 1]["role"] != "user":
+            text += "\n" + history[position + 1]["content"]
+        found.append((position, text))
+    return found
+
+
+def window_start(history: list[dict], window: int) -> int:
+    """Where the recent window begins, moved back so it opens on a learner message."""
+    start = max(0, len(history) - window)
+    while start > 0 and history[start]["role"] != "user":
+        start -= 1
+    return start
+
+
+async def update_index(storage: Storage, chat_id: str, history: list[dict], end: int, provider: EmbeddingProvider) -> ChatIndex:
+    """Load the chat's index and add the turns before ``end`` it is missing."""
+    data = await asyncio.to_thread(storage.indexes.get, chat_id)
+    index = ChatIndex.from_document(data) if data is not None else None
+    if index is None or index.provider != provider.name or index.indexed_until > end:
+        index = ChatIndex(provider.name, provider.dim)
+
+    new_turns = turns(history, index.indexed_until, end)
+    if index.indexed_until < end:
+        for i in range(0, len(new_turns), EMBED_BATCH):
+            batch = new_turns[i:i + EMBED_BATCH]
+            index.add([position for position, _ in batch], await provider.embed([text for _, text in batch]))
+        index.indexed_until = end
+        await asyncio.to_thread(storage.indexes.set, chat_id, index.to_document())
+        metrics.increment("recall.turns_indexed", len(new_turns))
+    return index
+
+
+async def build_context(storage: Storage, chat_id: str, history: list[dict], provider: Optional[EmbeddingProvider] = None) -> list[dict]:
+    """The messages to send the model for a chat history ending in the new message."""
+    if not settings.long_term_memory or len(history) <= settings.memory_window:
+        return history
+    start = window_start(history, settings.memory_window)
+    if start == 0:
+        return history
+
+    provider = provider or embedding_provider
+    try:
+        index = await update_index(storage, chat_id, history, start, provider)
+        query = await provider.embed([history[-1]["content"]])
+        positions = sorted(index.search(query[0], settings.memory_top_k))
+    except Exception as e:
+        print(f"Error recalling turns for chat {chat_id}: {e}")
+        positions = []
+
+    recalled = []
+    for position in positions:
+        recalled.append(history[position])
+        if position + 1 < start and history[position + 1]["role"] != "user":
+            recalled.append(history[position + 1])
+    metrics.increment("recall.turns_recalled", len(positions))
+    return recalled + history[start:]
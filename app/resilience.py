@@ -0,0 +1,167 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+import httpx
+from app.metrics import metrics
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open and calls fail fast."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error means the model is degraded rather than the request bad."""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    from google.genai import errors
+    return isinstance(error, errors.APIError) and error.code in RETRYABLE_STATUS_CODES
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after a cool-down."""
+
+    def __init__(self, name: str, failure_threshold: int, recovery_time: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self._publish()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.recovery_time:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self.probing:
+            self.probing = True
+            self._publish()
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.recovery_time - (time.monotonic() - self.opened_at))
+
+    def release_probe(self) -> None:
+        """Let another probe through after one was cancelled."""
+        self.probing = False
+        self._publish()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._publish()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.probing:
+                metrics.increment(f"{self.name}.circuit.opened")
+            self.opened_at = time.monotonic()
+        self.probing = False
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.circuit.state", STATE_GAUGE[self.state])
+
+
+class ResiliencePolicy:
+    """Deadlines, jittered retries, optional hedging and a circuit breaker for one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        hedge_after: Optional[float],
+        breaker: CircuitBreaker,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = breaker
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[T]],
+        hedge: bool = True,
+        max_retries: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> T:
+        """Call func with retries. Raises CircuitOpenError while the circuit is open."""
+        max_retries = self.max_retries if max_retries is None else max_retries
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(max_retries + 1):
+            if not self.breaker.allow():
+                metrics.increment(f"{self.name}.rejected")
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            try:
+                async with asyncio.timeout(timeout):
+                    if hedge and self.hedge_after is not None:
+                        result = await self._hedged(func)
+                    else:
+                        result = await func()
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered; a bad request says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                metrics.increment(f"{self.name}.failures")
+                self.breaker.record_failure()
+                if attempt == max_retries:
+                    raise
+                metrics.increment(f"{self.name}.retries")
+                await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _hedged(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Start a second call if the first is slow and return whichever succeeds first."""
+        tasks = [asyncio.ensure_future(func())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                metrics.increment(f"{self.name}.hedged")
+                tasks.append(asyncio.ensure_future(func()))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
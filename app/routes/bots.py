@@ -1,7 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
-from google.cloud import firestore
-from app.dependencies import get_current_user, get_firestore
-from pydantic import BaseModel
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Body, Query
+from app.dependencies import get_current_user, get_storage
+from app.storage.base import SERVER_TIMESTAMP, Storage
+from app.greetings import refresh_greetings
+from app.rate_limit import rate_limit
+from app.coalescing import get_bot as read_bot
+from app.chat_cache import chat_cache
+from app.bot_versions import is_new_version
+from app.search import bot_search
+from app.routing import check_model
+from pydantic import BaseModel, field_validator
 from uuid import uuid4
 from typing import Optional
 from datetime import datetime
@@ -13,6 +20,13 @@ class Bot(BaseModel):
     description: str
     prompt: str
     image_url: Optional[str] = None
+    cache_responses: bool = False
+    model: Optional[str] = None
+    light_model: Optional[str] = None
+    fallback_model: Optional[str] = None
+
+    # Each model name costs money per turn and gets its own circuit breaker
+    _check_models = field_validator("model", "light_model", "fallback_model")(check_model)
 
 class BotCreate(Bot):
     pass
@@ -22,16 +36,23 @@ class BotUpdate(BaseModel):
     description: Optional[str] = None
     prompt: Optional[str] = None
     image_url: Optional[str] = None
+    cache_responses: Optional[bool] = None
+    model: Optional[str] = None
+    light_model: Optional[str] = None
+    fallback_model: Optional[str] = None
+
+    _check_models = field_validator("model", "light_model", "fallback_model")(check_model)
 
 def format_datetime(dt: datetime) -> str:
     """Format datetime in a consistent way."""
     return dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
 
-@router.post("")
+@router.post("", dependencies=[Depends(rate_limit("create_bot"))])
 async def create_bot(
     bot: BotCreate,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
-    db: firestore.Client = Depends(get_firestore)
+    storage: Storage = Depends(get_storage)
 ):
     """Create a new bot."""
     bot_id = str(uuid4())
@@ -42,15 +63,22 @@ async def create_bot(
         "description": bot.description,
         "prompt": bot.prompt,
         "image_url": bot.image_url,
+        "cache_responses": bot.cache_responses,
+        "model": bot.model,
+        "light_model": bot.light_model,
+        "fallback_model": bot.fallback_model,
+        "version": 1,
         "created_by": current_user["email"],
         "created_at": now
     }
     
     # Store in Firestore with server timestamp
-    db.collection("bots").document(bot_id).set({
+    storage.bots.set(bot_id, {
         **bot_data,
-        "created_at": firestore.SERVER_TIMESTAMP
+        "created_at": SERVER_TIMESTAMP
     })
+    background_tasks.add_task(refresh_greetings, bot_id, storage)
+    bot_search.add(bot_data)
     
     # Return with formatted datetime
     return {
@@ -60,39 +88,48 @@ async def create_bot(
 @router.get("")
 async def get_bots(
     current_user: dict = Depends(get_current_user),
-    db: firestore.Client = Depends(get_firestore)
+    storage: Storage = Depends(get_storage)
 ):
     """Get all bots."""
-    bots_ref = db.collection("bots").get()
-    return [bot.to_dict() for bot in bots_ref]
+    return storage.bots.list()
+
+@router.get("/search")
+async def search_bots(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Search bots by name and description, ignoring case and diacritics."""
+    return await bot_search.search(storage, q, limit)
 
 @router.get("/{bot_id}")
 async def get_bot(
     bot_id: str,
     current_user: dict = Depends(get_current_user),
-    db: firestore.Client = Depends(get_firestore)
+    storage: Storage = Depends(get_storage)
 ):
     """Get a specific bot by ID."""
-    bot_ref = db.collection("bots").document(bot_id).get()
-    if not bot_ref.exists:
+    bot_data = await read_bot(storage, bot_id)
+    if bot_data is None:
         raise HTTPException(status_code=404, detail="Bot not found")
-    return bot_ref.to_dict()
+    return bot_data
 
 @router.put("/{bot_id}")
 async def update_bot(
     bot_id: str,
+    background_tasks: BackgroundTasks,
     bot_update: BotUpdate = Body(None),
     current_user: dict = Depends(get_current_user),
-    db: firestore.Client = Depends(get_firestore)
+    storage: Storage = Depends(get_storage)
 ):
-    """Update a bot."""
-    bot_ref = db.collection("bots").document(bot_id)
-    bot_data = bot_ref.get()
+    """Update a bot. Changing how it replies creates a new version."""
+    bot_data = storage.bots.get(bot_id)
     
-    if not bot_data.exists:
+    if bot_data is None:
         raise HTTPException(status_code=404, detail="Bot not found")
     
-    if bot_data.to_dict()["created_by"] != current_user["email"]:
+    if bot_data["created_by"] != current_user["email"]:
         raise HTTPException(status_code=403, detail="Not authorized to update this bot")
     
     update_data = {}
@@ -104,27 +141,47 @@ async def update_bot(
         update_data["prompt"] = bot_update.prompt
     if bot_update.image_url is not None:
         update_data["image_url"] = bot_update.image_url
+    if bot_update.cache_responses is not None:
+        update_data["cache_responses"] = bot_update.cache_responses
+    if bot_update.model is not None:
+        update_data["model"] = bot_update.model
+    if bot_update.light_model is not None:
+        update_data["light_model"] = bot_update.light_model
+    if bot_update.fallback_model is not None:
+        update_data["fallback_model"] = bot_update.fallback_model
+    
+    # Chats stay on the version they were started with until upgraded
+    if is_new_version(bot_data, update_data):
+        update_data["version"] = bot_data.get("version", 1) + 1
     
     if update_data:
-        bot_ref.update(update_data)
+        storage.bots.update(bot_id, update_data)
+        chat_cache.forget_bot(bot_id)
+    
+    # Opening messages depend on the prompt, so regenerate them
+    if "prompt" in update_data and update_data["prompt"] != bot_data["prompt"]:
+        background_tasks.add_task(refresh_greetings, bot_id, storage)
     
-    return bot_ref.get().to_dict()
+    bot_data = storage.bots.get(bot_id)
+    bot_search.add(bot_data)
+    return bot_data
 
 @router.delete("/{bot_id}")
 async def delete_bot(
     bot_id: str,
     current_user: dict = Depends(get_current_user),
-    db: firestore.Client = Depends(get_firestore)
+    storage: Storage = Depends(get_storage)
 ):
     """Delete a bot."""
-    bot_ref = db.collection("bots").document(bot_id)
-    bot_data = bot_ref.get()
+    bot_data = storage.bots.get(bot_id)
     
-    if not bot_data.exists:
+    if bot_data is None:
         raise HTTPException(status_code=404, detail="Bot not found")
     
-    if bot_data.to_dict()["created_by"] != current_user["email"]:
+    if bot_data["created_by"] != current_user["email"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this bot")
     
-    bot_ref.delete()
+    storage.bots.delete(bot_id)
+    chat_cache.forget_bot(bot_id)
+    bot_search.remove(bot_id)
     return {"message": "Bot deleted successfully"}
@@ -1,158 +1,254 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
-from google import genai
-from google.genai import types
-from app.config import settings
-from google.cloud import firestore
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Body, Header, Request, Response
 from uuid import uuid4
-from app.dependencies import get_current_user, get_firestore
+from app.dependencies import get_current_user, get_storage
+from app.storage.base import SERVER_TIMESTAMP, Storage
+from app.cache import response_cache
+from app.gemini import Reply, generate_reply
+from app.routing import choose_models
+from app.greetings import pick_greeting
+from app.idempotency import idempotency_store
+from app.cancellation import ClientDisconnected, run_cancellable
+from app.config import settings
+from app.load import shed_when_overloaded
+from app.rate_limit import rate_limit
+from app.coalescing import get_bot
+from app.turns import chat_turns
+from app.chat_cache import chat_cache
+from app.bot_versions import bot_snapshot, pinned_bot
+from app.recall import build_context
+from app.archive import object_store, unarchive
 from pydantic import BaseModel
 from datetime import datetime, UTC
+from typing import Optional
 
 class Message(BaseModel):
     message: str
 
 router = APIRouter()
-client = genai.Client(api_key=settings.gemini_api_key)
 
 @router.get("/start")
-async def start_chat(bot_id: str, current_user: dict = Depends(get_current_user), db: firestore.Client = Depends(get_firestore)):
+async def start_chat(bot_id: str, current_user: dict = Depends(get_current_user), storage: Storage = Depends(get_storage)):
     """Creates a new chat session with a specific bot and stores it in Firestore."""
     # Get the bot's prompt
-    bots_collection = db.collection("bots")
-    bot_ref = bots_collection.document(bot_id).get()
-    if not bot_ref.exists:
+    bot_data = await get_bot(storage, bot_id)
+    if bot_data is None:
         raise HTTPException(status_code=404, detail="Bot not found")
     
-    bot_data = bot_ref.to_dict()
     bot_prompt = bot_data["prompt"]
     
+    # Seed the chat with a precomputed opener so the learner does not wait on the model
+    messages = []
+    greeting = pick_greeting(bot_data)
+    if greeting is not None:
+        messages.append({
+            "role": "assistant",
+            "content": greeting,
+            "timestamp": datetime.now(UTC)
+        })
+    
     chat_id = str(uuid4())  # Unique chat ID
     # Store chat metadata in Firestore
-    chats_collection = db.collection("chats")
-    chats_collection.document(chat_id).set({
+    storage.chats.set(chat_id, {
         "user_id": current_user["email"],
         "bot_id": bot_id,
         "bot_prompt": bot_prompt,
-        "messages": [],
+        "bot_snapshot": bot_snapshot(bot_data),
+        "messages": messages,
+        "last_active": SERVER_TIMESTAMP,
     })
-    return {"chat_id": chat_id}
+    return {"chat_id": chat_id, "greeting": greeting}
 
 @router.get("/")
-async def get_chats(current_user: dict = Depends(get_current_user), db: firestore.Client = Depends(get_firestore)):
+async def get_chats(current_user: dict = Depends(get_current_user), storage: Storage = Depends(get_storage)):
     """Fetch all chats for a user from Firestore."""
-    chats_collection = db.collection("chats")
-    chats_ref = chats_collection.where(filter=firestore.FieldFilter("user_id", "==", current_user["email"])).get()
+    chats = storage.chats.list_for_user(current_user["email"])
     
-    chats = []
-    for chat in chats_ref:
-        chat_data = chat.to_dict()
-        chat_data["id"] = chat.id  # Add the chat ID to the response
-        
-        # Get bot information
-        bot_ref = db.collection("bots").document(chat_data["bot_id"]).get()
-        if bot_ref.exists:
-            bot_data = bot_ref.to_dict()
-            chat_data["bot"] = bot_data
-        
-        chats.append(chat_data)
+    # Get bot information for all chats in one batch
+    bots = storage.bots.get_many(chat["bot_id"] for chat in chats)
+    for chat_data in chats:
+        if chat_data["bot_id"] in bots:
+            chat_data["bot"] = bots[chat_data["bot_id"]]
     
     return chats
 
 @router.get("/{chat_id}")
-async def get_chat(chat_id: str, current_user: dict = Depends(get_current_user), db: firestore.Client = Depends(get_firestore)):
+async def get_chat(chat_id: str, current_user: dict = Depends(get_current_user), storage: Storage = Depends(get_storage)):
     """Fetch chat history from Firestore."""
-    chats_collection = db.collection("chats")
-    chat_ref = chats_collection.document(chat_id).get()
-    if not chat_ref.exists:
+    chat_data = storage.chats.get(chat_id)
+    if chat_data is None:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    chat_data = chat_ref.to_dict()
     if chat_data["user_id"] != current_user["email"]:
         raise HTTPException(status_code=403, detail="Not authorized to access this chat")
     
+    chat_data = await unarchive(storage, chat_id, chat_data)
+    if chat_data is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    
     # Add chat ID to response
     chat_data["id"] = chat_id
     
     # Get bot information
-    bot_ref = db.collection("bots").document(chat_data["bot_id"]).get()
-    if bot_ref.exists:
-        bot_data = bot_ref.to_dict()
+    bot_data = await get_bot(storage, chat_data["bot_id"])
+    if bot_data is not None:
         chat_data["bot"] = bot_data
+        pinned = chat_data.get("bot_snapshot", {}).get("version", bot_data.get("version", 1))
+        chat_data["upgrade_available"] = bot_data.get("version", 1) > pinned
     
     return chat_data
 
-@router.post("/{chat_id}/message")
-async def send_message(chat_id: str, message: Message, current_user: dict = Depends(get_current_user), db: firestore.Client = Depends(get_firestore)):
-    """Sends a message to the chat and stores the response."""
-    chats_collection = db.collection("chats")
-    chat_ref = chats_collection.document(chat_id)
-    chat_data = chat_ref.get()
-    
-    if not chat_data.exists:
+@router.post("/{chat_id}/message", dependencies=[Depends(shed_when_overloaded), Depends(rate_limit("send_message"))])
+async def send_message(
+    chat_id: str,
+    message: Message,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Sends a message to the chat and stores the response.
+    
+    Retries carrying the same Idempotency-Key get the stored response back
+    instead of appending and generating again.
+    """
+    try:
+        if idempotency_key is None:
+            return await process_message(chat_id, message, request, current_user, storage)
+        
+        key = (current_user["email"], chat_id, idempotency_key)
+        result, replayed = await idempotency_store.run(
+            key, message.message, lambda: process_message(chat_id, message, request, current_user, storage)
+        )
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+async def process_message(chat_id: str, message: Message, request: Request, current_user: dict, storage: Storage) -> dict:
+    """Runs one turn, waiting for any turn already running on the chat."""
+    async with chat_turns.hold(chat_id):
+        return await take_turn(chat_id, message, request, current_user, storage)
+
+async def take_turn(chat_id: str, message: Message, request: Request, current_user: dict, storage: Storage) -> dict:
+    """Appends the user's message, generates the reply and stores it.
+    
+    Generation is cancelled when the client disconnects or the deadline
+    passes. The user's message is then left without a reply, and sending the
+    same text again retries the turn instead of appending it twice.
+    
+    Recently active chats come from the chat cache and carry the bot version
+    they are pinned to, so a hot conversation reads nothing from storage.
+    """
+    entry = await chat_cache.load(storage, chat_id)
+    
+    if entry is None:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    chat_dict = chat_data.to_dict()
+    chat_dict, version = entry
     if chat_dict["user_id"] != current_user["email"]:
         raise HTTPException(status_code=403, detail="Not authorized to access this chat")
 
-    # Get the bot's current prompt
-    bot_ref = db.collection("bots").document(chat_dict["bot_id"]).get()
-    if not bot_ref.exists:
+    if chat_dict.get("archived"):
+        await unarchive(storage, chat_id, chat_dict)
+        entry = await chat_cache.load(storage, chat_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        chat_dict, version = entry
+
+    # Use the bot version the chat is pinned to
+    bot_data = await pinned_bot(storage, chat_dict)
+    if bot_data is None:
         raise HTTPException(status_code=404, detail="Bot not found")
     
-    bot_data = bot_ref.to_dict()
     bot_prompt = bot_data["prompt"]
 
     # Restore chat context
     chat_history = chat_dict.get("messages", [])
     current_time = datetime.now(UTC)
-    chat_history.append({
-        "role": "user", 
-        "content": message.message,
-        "timestamp": current_time
-    })
-    chat_ref.update({"messages": chat_history})
-    
-    # Format chat history for Gemini API
-    formatted_history = []
-    for msg in chat_history:
-        if msg["role"] == "user":
-            formatted_history.append(types.Content(parts=[types.Part(text=msg["content"])], role="user"))
-        else:
-            formatted_history.append(types.Content(parts=[types.Part(text=msg["content"])], role="model"))
-    
-    response = client.models.generate_content(
-        model="gemini-2.0-flash", 
-        config=types.GenerateContentConfig(response_mime_type="text/plain", system_instruction=bot_prompt),
-        contents=formatted_history
-    )
-    
-    if response.text == "":
-        raise HTTPException(status_code=400, detail="No response from model.")
-    
-    # Append messages to chat history
-    chat_history.append({
+    last_message = chat_history[-1] if chat_history else None
+    unanswered = last_message is not None and last_message["role"] == "user"
+    if not (unanswered and last_message["content"] == message.message):
+        user_message = {
+            "role": "user", 
+            "content": message.message,
+            "timestamp": current_time
+        }
+        chat_history.append(user_message)
+        checked = version is not None
+        version = await chat_cache.append(storage, chat_id, version, user_message)
+        if checked and version is None:
+            # Another replica changed the chat; reply to what is stored, not the stale copy
+            entry = await chat_cache.load(storage, chat_id)
+            if entry is None:
+                raise HTTPException(status_code=404, detail="Chat not found")
+            chat_dict, version = entry
+            chat_history = chat_dict.get("messages", [])
+    
+    # Serve identical early turns from the response cache when the bot opts in
+    models = choose_models(bot_data, chat_history)
+    model = models[0]
+    use_cache = bot_data.get("cache_responses", False) and response_cache.cacheable(chat_history)
+    cached = await asyncio.to_thread(response_cache.get, model, bot_prompt, chat_history) if use_cache else None
+    if cached is not None:
+        reply = Reply(cached, "cache")
+    else:
+        context = await build_context(storage, chat_id, chat_history)
+        reply = await run_cancellable(request, generate_reply(bot_prompt, context, models), settings.generation_timeout)
+        # Replies from a fallback model are not what the cache key promises
+        if use_cache and reply.model == model:
+            await asyncio.to_thread(response_cache.set, model, bot_prompt, chat_history, reply.text)
+    
+    # Append messages to chat history, recording which model served the turn
+    await chat_cache.append(storage, chat_id, version, {
         "role": "assistant", 
-        "content": response.text,
-        "timestamp": current_time
+        "content": reply.text,
+        "timestamp": current_time,
+        "model": reply.model
     })
-    chat_ref.update({"messages": chat_history})
 
-    return {"response": response.text}
+    return {"response": reply.text, "model": reply.model}
+
+@router.post("/{chat_id}/upgrade")
+async def upgrade_chat(chat_id: str, current_user: dict = Depends(get_current_user), storage: Storage = Depends(get_storage)):
+    """Pins the chat to the bot's latest version, prompt included."""
+    async with chat_turns.hold(chat_id):
+        chat_dict = storage.chats.get(chat_id)
+        
+        if chat_dict is None:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        
+        if chat_dict["user_id"] != current_user["email"]:
+            raise HTTPException(status_code=403, detail="Not authorized to access this chat")
+        
+        if await unarchive(storage, chat_id, chat_dict) is None:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        
+        bot_data = await get_bot(storage, chat_dict["bot_id"])
+        if bot_data is None:
+            raise HTTPException(status_code=404, detail="Bot not found")
+        
+        snapshot = bot_snapshot(bot_data)
+        storage.chats.update(chat_id, {"bot_prompt": snapshot["prompt"], "bot_snapshot": snapshot})
+        chat_cache.forget(chat_id)
+    return {"bot_version": snapshot["version"]}
 
 @router.delete("/{chat_id}")
-async def delete_chat(chat_id: str, current_user: dict = Depends(get_current_user), db: firestore.Client = Depends(get_firestore)):
+async def delete_chat(chat_id: str, current_user: dict = Depends(get_current_user), storage: Storage = Depends(get_storage)):
     """Deletes a chat from Firestore."""
-    chats_collection = db.collection("chats")
-    chat_ref = chats_collection.document(chat_id)
-    chat_data = chat_ref.get()
+    chat_dict = storage.chats.get(chat_id)
     
-    if not chat_data.exists:
+    if chat_dict is None:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    chat_dict = chat_data.to_dict()
     if chat_dict["user_id"] != current_user["email"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this chat")
     
-    chat_ref.delete()
+    storage.chats.delete(chat_id)
+    storage.indexes.delete(chat_id)
+    chat_cache.forget(chat_id)
+    if chat_dict.get("archived"):
+        object_store.delete(chat_dict["archive_key"])
     return {"message": "Chat deleted"}
\ No newline at end of file
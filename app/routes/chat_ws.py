@@ -0,0 +1,161 @@
+import asyncio
+from datetime import datetime, UTC
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from app.config import settings
+from app.dependencies import get_storage, verify_token
+from app.gemini import stream_reply
+from app.routing import choose_models
+from app.load import load_monitor
+from app.metrics import metrics
+from app.rate_limit import check_rate_limit
+from app.bot_versions import pinned_bot
+from app.recall import build_context
+from app.turns import chat_turns
+from app.archive import append_restoring, unarchive
+from app.storage.base import Storage
+
+router = APIRouter()
+
+class ChatSession:
+    """Chat state kept for the lifetime of one WebSocket connection.
+
+    The chat transcript and bot prompt are read once on connect. New messages
+    are added to the in-memory history right away and written to storage in
+    order by a background writer, so a turn only waits on the model.
+    """
+
+    def __init__(self, chat_id: str, chat_data: dict, bot_data: dict, storage: Storage):
+        self.chat_id = chat_id
+        self.bot_data = bot_data
+        self.bot_prompt = bot_data["prompt"]
+        self.history = chat_data.get("messages", [])
+        self.storage = storage
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.writer = asyncio.create_task(self._write_messages())
+
+    async def _write_messages(self):
+        while True:
+            messages = await self.pending.get()
+            try:
+                # The chat may have been archived while the socket stayed open
+                await append_restoring(self.storage, self.chat_id, *messages)
+            except Exception as e:
+                print(f"Error persisting messages for chat {self.chat_id}: {e}")
+            finally:
+                self.pending.task_done()
+
+    def add(self, *messages: dict) -> None:
+        self.history.extend(messages)
+        self.pending.put_nowait(messages)
+
+    def is_retry(self, text: str) -> bool:
+        """Whether the text repeats the last, unanswered user message."""
+        return bool(self.history) and self.history[-1]["role"] == "user" and self.history[-1]["content"] == text
+
+    async def flush(self) -> None:
+        """Wait until every added message is written."""
+        await self.pending.join()
+
+    async def close(self) -> None:
+        await self.flush()
+        self.writer.cancel()
+
+@router.websocket("/{chat_id}/ws")
+async def chat_socket(websocket: WebSocket, chat_id: str, token: str, storage: Storage = Depends(get_storage)):
+    """Chat over one authenticated connection, streaming the model's reply.
+
+    The client sends {"message": "..."} and receives {"type": "token"} frames
+    followed by {"type": "done", "response": ...} or {"type": "error"}.
+    """
+    if load_monitor.overloaded():
+        metrics.increment("requests.shed")
+        await websocket.close(code=1013, reason="Server is overloaded, please retry")
+        return
+
+    try:
+        current_user = await verify_token(token)
+    except HTTPException:
+        await websocket.close(code=4401, reason="Invalid authentication credentials")
+        return
+
+    chat_data = storage.chats.get(chat_id)
+    if chat_data is None:
+        await websocket.close(code=4404, reason="Chat not found")
+        return
+    if chat_data["user_id"] != current_user["email"]:
+        await websocket.close(code=4403, reason="Not authorized to access this chat")
+        return
+
+    chat_data = await unarchive(storage, chat_id, chat_data)
+    if chat_data is None:
+        await websocket.close(code=4404, reason="Chat not found")
+        return
+
+    bot_data = await pinned_bot(storage, chat_data)
+    if bot_data is None:
+        await websocket.close(code=4404, reason="Bot not found")
+        return
+
+    await websocket.accept()
+    session = ChatSession(chat_id, chat_data, bot_data, storage)
+    try:
+        while True:
+            data = await websocket.receive_json()
+            text = data.get("message") if isinstance(data, dict) else None
+            if not text:
+                await websocket.send_json({"type": "error", "detail": "Missing message"})
+                continue
+
+            # Turns are as expensive as HTTP ones, so they count toward overload
+            if load_monitor.overloaded():
+                metrics.increment("requests.shed")
+                await websocket.send_json({"type": "error", "detail": "Server is overloaded, please retry", "retry_after": settings.shed_retry_after})
+                continue
+
+            decision = await asyncio.to_thread(check_rate_limit, "send_message", current_user["email"])
+            if decision is not None and not decision.allowed:
+                await websocket.send_json({"type": "error", "detail": "Rate limit exceeded", "retry_after": decision.retry_after})
+                continue
+
+            with load_monitor.expensive():
+                # Hold the chat like an HTTP turn and let it read this turn only once stored
+                async with chat_turns.hold(chat_id):
+                    current_time = datetime.now(UTC)
+                    if not session.is_retry(text):
+                        session.add({
+                            "role": "user",
+                            "content": text,
+                            "timestamp": current_time
+                        })
+
+                    chunks = []
+                    try:
+                        async with asyncio.timeout(settings.generation_timeout):
+                            models = choose_models(session.bot_data, session.history)
+                            context = await build_context(storage, chat_id, session.history)
+                            model, stream = await stream_reply(session.bot_prompt, context, models)
+                            async for chunk in stream:
+                                chunks.append(chunk)
+                                await websocket.send_json({"type": "token", "text": chunk})
+                    except WebSocketDisconnect:
+                        raise
+                    except Exception as e:
+                        print(f"Error streaming reply for chat {chat_id}: {e}")
+                        chunks = []
+
+                    reply = "".join(chunks)
+                    if reply == "":
+                        await websocket.send_json({"type": "error", "detail": "No response from model."})
+                    else:
+                        session.add({
+                            "role": "assistant",
+                            "content": reply,
+                            "timestamp": current_time,
+                            "model": model
+                        })
+                        await websocket.send_json({"type": "done", "response": reply, "model": model})
+                    await session.flush()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
@@ -0,0 +1,34 @@
+import asyncio
+from fastapi import APIRouter, Depends, Query
+from app.dependencies import get_current_user, get_storage
+from app.storage.base import Storage
+from app.coalescing import get_user
+from app.routes.users import convert_timestamps
+
+router = APIRouter()
+
+BOT_FIELDS = ("id", "name", "description", "image_url")
+
+@router.get("")
+async def get_home(
+    chats_limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Everything the home screen needs in one request.
+
+    The user, summaries of their most recent chats and the bot catalog are
+    fetched concurrently. Chats refer to bots by id; the bots are in the catalog.
+    """
+    user_data, chats, bots = await asyncio.gather(
+        get_user(storage, current_user["email"]),
+        # One more than shown tells whether there are more
+        asyncio.to_thread(storage.chats.list_recent_for_user, current_user["email"], chats_limit + 1),
+        asyncio.to_thread(storage.bots.list),
+    )
+    return {
+        "user": convert_timestamps(user_data) if user_data is not None else None,
+        "chats": chats[:chats_limit],
+        "has_more_chats": len(chats) > chats_limit,
+        "bots": [{field: bot_data.get(field) for field in BOT_FIELDS} for bot_data in bots],
+    }
@@ -0,0 +1,25 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.dependencies import get_current_user, get_storage
+from app.storage.base import Storage
+from app.sync import decode_token, sync
+
+router = APIRouter()
+
+@router.get("")
+async def get_sync(
+    since: Optional[str] = Query(None, description="Token from the previous sync; omit for a full sync"),
+    wait: bool = Query(False, description="Hold the request until something changes"),
+    current_user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Chats and messages changed since the last sync, and a token for the next one.
+
+    With ``wait``, a sync that finds nothing holds the connection until a
+    chat changes or SYNC_WAIT seconds pass.
+    """
+    try:
+        since_time = decode_token(since) if since is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return await sync(storage, current_user["email"], since_time, wait)
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
-from google.cloud import firestore
-from app.dependencies import get_current_user, get_firestore
+from fastapi import APIRouter, HTTPException, Depends, Body, Query
+from fastapi.responses import StreamingResponse
+from app.dependencies import get_current_user, get_storage
+from app.storage.base import Storage
+from app.coalescing import get_user
+from app.purge import purge_jobs
+from app.archive import object_store
+from app.export import export_lines
 from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel
@@ -25,28 +30,26 @@ def convert_timestamps(data: dict) -> dict:
 @router.get("/me")
 async def get_current_user_info(
     current_user: dict = Depends(get_current_user),
-    db: firestore.Client = Depends(get_firestore)
+    storage: Storage = Depends(get_storage)
 ):
     """Get the current user's information from Firestore."""
-    user_ref = db.collection("users").document(current_user["email"])
-    user_data = user_ref.get()
+    user_data = await get_user(storage, current_user["email"])
     
-    if not user_data.exists:
+    if user_data is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return convert_timestamps(user_data.to_dict())
+    return convert_timestamps(user_data)
 
 @router.post("/create")
 async def create_user(
     current_user: dict = Depends(get_current_user),
-    db: firestore.Client = Depends(get_firestore)
+    storage: Storage = Depends(get_storage)
 ):
     """Create a new user in Firestore if they don't exist."""
-    user_ref = db.collection("users").document(current_user["email"])
-    user_data = user_ref.get()
+    user_data = await get_user(storage, current_user["email"])
     
-    if user_data.exists:
-        return convert_timestamps(user_data.to_dict())
+    if user_data is not None:
+        return convert_timestamps(user_data)
     
     # Create new user document with basic information
     now = datetime.now()
@@ -57,27 +60,60 @@ async def create_user(
         "created_at": now,
         "last_login": now,
     }
-    user_ref.set(new_user)
+    storage.users.set(current_user["email"], new_user)
     
-    return convert_timestamps(user_ref.get().to_dict())
+    return convert_timestamps(storage.users.get(current_user["email"]))
 
 @router.put("/me")
 async def update_user_info(
     update_data: UserUpdate = Body(None),
     current_user: dict = Depends(get_current_user),
-    db: firestore.Client = Depends(get_firestore)
+    storage: Storage = Depends(get_storage)
 ):
     """Update the current user's information in Firestore."""
-    user_ref = db.collection("users").document(current_user["email"])
-    user_data = user_ref.get()
+    user_data = storage.users.get(current_user["email"])
     
-    if not user_data.exists:
+    if user_data is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    current_data = user_data.to_dict()
-    
     if update_data and update_data.name is not None:
-        current_data["name"] = update_data.name
-        user_ref.set(current_data)  # Use set instead of update to preserve all fields
+        user_data["name"] = update_data.name
+        storage.users.set(current_user["email"], user_data)  # Use set instead of update to preserve all fields
     
-    return convert_timestamps(user_ref.get().to_dict())
+    return convert_timestamps(storage.users.get(current_user["email"]))
+
+@router.delete("/me", status_code=202)
+async def delete_account(
+    current_user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Start deleting the current user's account and chats in the background.
+
+    Returns right away; poll GET /users/me/deletion for progress.
+    """
+    job = purge_jobs.start(current_user["email"], storage)
+    return job.to_dict()
+
+@router.get("/me/deletion")
+async def get_account_deletion(current_user: dict = Depends(get_current_user)):
+    """Progress of the current user's account deletion."""
+    job = purge_jobs.get(current_user["email"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="No account deletion in progress")
+    return job.to_dict()
+
+@router.get("/me/export")
+async def export_history(
+    after: Optional[str] = Query(None, description="Resume after this chat id, the last one received"),
+    current_user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage)
+):
+    """Stream the current user's chats as newline-delimited JSON.
+
+    Chats are read from storage only as fast as the client downloads them.
+    """
+    return StreamingResponse(
+        export_lines(storage, object_store, current_user["email"], after),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="plesc-export.ndjson"'},
+    )
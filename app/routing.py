@@ -0,0 +1,38 @@
+from typing import Optional
+from app.config import settings
+
+def allowed_models() -> set[str]:
+    """Models a bot may be configured with."""
+    return {*settings.bot_models, settings.default_model, *filter(None, [settings.fallback_model])}
+
+def check_model(model: Optional[str]) -> Optional[str]:
+    """Validate a bot's model setting. Raises ValueError for a model not allowed."""
+    if model is not None and model not in allowed_models():
+        raise ValueError(f"Model not allowed: {model}")
+    return model
+
+def primary_model(bot_data: dict) -> str:
+    """The model a bot is configured to use."""
+    return bot_data.get("model") or settings.default_model
+
+def is_simple_turn(chat_history: list[dict]) -> bool:
+    """Short learner messages rarely need the full model."""
+    return bool(chat_history) and len(chat_history[-1]["content"]) <= settings.simple_turn_max_chars
+
+def choose_models(bot_data: dict, chat_history: list[dict]) -> list[str]:
+    """Models to try for a turn, in order.
+
+    Simple turns go to the bot's light model first when it has one. The
+    primary model comes next, then the fallback used when the ones before
+    it are overloaded or slow.
+    """
+    models = []
+    light_model = bot_data.get("light_model")
+    if light_model and is_simple_turn(chat_history):
+        models.append(light_model)
+    models.append(primary_model(bot_data))
+    fallback_model = bot_data.get("fallback_model") or settings.fallback_model
+    if fallback_model:
+        models.append(fallback_model)
+    # Drop duplicates while keeping the order
+    return list(dict.fromkeys(models))
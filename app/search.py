@@ -0,0 +1,140 @@
+import asyncio
+import bisect
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Optional
+from app.config import settings
+from app.metrics import metrics
+from app.storage.base import Storage
+
+WORD = re.compile(r"\w+")
+
+# Letters NFKD leaves whole; the rest lose their accents by decomposition
+FOLDS = str.maketrans({"ł": "l", "Ł": "L"})
+
+# A term found in the name counts more than one found in the description
+FIELD_WEIGHTS = {"name": 2.0, "description": 1.0}
+
+
+def fold(text: str) -> str:
+    """Lowercase text and strip Polish diacritics, so "Żółw" matches "zolw"."""
+    decomposed = unicodedata.normalize("NFKD", text.translate(FOLDS).casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def terms(text: str) -> list[str]:
+    return WORD.findall(fold(text))
+
+
+class BotIndex:
+    """Inverted index over bot names and descriptions.
+
+    Every query word must match the start of a word in the bot, so "nauc"
+    finds "Nauczycielka". Matches in the name rank above matches in the
+    description, and whole words above prefixes.
+    """
+
+    def __init__(self):
+        self.postings: dict[str, dict[str, float]] = defaultdict(dict)
+        self.vocabulary: list[str] = []
+        self.bots: dict[str, dict] = {}
+        self.bot_terms: dict[str, set[str]] = {}
+
+    def add(self, bot_data: dict) -> None:
+        """Index a bot, replacing what was indexed for it before."""
+        bot_id = bot_data["id"]
+        self.remove(bot_id)
+        weights: dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in terms(bot_data.get(field) or ""):
+                weights[term] = max(weights.get(term, 0.0), weight)
+        for term, weight in weights.items():
+            if term not in self.postings:
+                bisect.insort(self.vocabulary, term)
+            self.postings[term][bot_id] = weight
+        self.bots[bot_id] = bot_data
+        self.bot_terms[bot_id] = set(weights)
+
+    def remove(self, bot_id: str) -> None:
+        for term in self.bot_terms.pop(bot_id, ()):
+            posting = self.postings[term]
+            posting.pop(bot_id, None)
+            if not posting:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+        self.bots.pop(bot_id, None)
+
+    def _matches(self, word: str) -> dict[str, float]:
+        """Bots with a term starting with the word, and their best score for it."""
+        scores: dict[str, float] = {}
+        start = bisect.bisect_left(self.vocabulary, word)
+        for term in self.vocabulary[start:]:
+            if not term.startswith(word):
+                break
+            # Whole-word matches rank above prefix matches
+            bonus = 0.5 if term == word else 0.0
+            for bot_id, weight in self.postings[term].items():
+                scores[bot_id] = max(scores.get(bot_id, 0.0), weight + bonus)
+        return scores
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        words = terms(query)
+        if not words:
+            return []
+        scores = self._matches(words[0])
+        for word in words[1:]:
+            matches = self._matches(word)
+            scores = {bot_id: score + matches[bot_id] for bot_id, score in scores.items() if bot_id in matches}
+        ranked = sorted(scores, key=lambda bot_id: (-scores[bot_id], fold(self.bots[bot_id].get("name") or "")))
+        return [self.bots[bot_id] for bot_id in ranked[:limit]]
+
+
+class BotSearch:
+    """The process's bot index, built from storage on first search.
+
+    Bot changes made through this process update the index right away; a
+    rebuild every BOT_SEARCH_REFRESH seconds, in the background, picks up
+    changes made on other replicas. Searches never wait on storage once the
+    index is built.
+    """
+
+    def __init__(self, refresh: float):
+        self.refresh = refresh
+        self.index: Optional[BotIndex] = None
+        self.built_at = 0.0
+        self.rebuilding: Optional[asyncio.Task] = None
+
+    async def _build(self, storage: Storage) -> None:
+        bots = await asyncio.to_thread(storage.bots.list)
+        index = BotIndex()
+        for bot_data in bots:
+            index.add(bot_data)
+        self.index = index
+        self.built_at = time.monotonic()
+        metrics.increment("bot_search.rebuilds")
+
+    async def _rebuild(self, storage: Storage) -> None:
+        try:
+            await self._build(storage)
+        except Exception as e:
+            print(f"Error rebuilding bot search index: {e}")
+
+    async def search(self, storage: Storage, query: str, limit: int) -> list[dict]:
+        if self.index is None:
+            await self._build(storage)
+        elif time.monotonic() - self.built_at > self.refresh and (self.rebuilding is None or self.rebuilding.done()):
+            self.rebuilding = asyncio.create_task(self._rebuild(storage))
+        return self.index.search(query, limit)
+
+    def add(self, bot_data: dict) -> None:
+        if self.index is not None:
+            self.index.add(bot_data)
+
+    def remove(self, bot_id: str) -> None:
+        if self.index is not None:
+            self.index.remove(bot_id)
+
+
+bot_search = BotSearch(refresh=settings.bot_search_refresh)
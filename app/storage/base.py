@@ -0,0 +1,216 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
+
+
+class _ServerTimestamp:
+    def __repr__(self) -> str:
+        return "SERVER_TIMESTAMP"
+
+
+# A field value replaced by the time the write is stored, like Firestore's
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+class ChatArchived(Exception):
+    """The chat is an archived stub; restore it before writing messages."""
+
+
+class Versioned(NamedTuple):
+    """A document with the version it was read at, e.g. its update time."""
+
+    data: dict
+    version: Any
+
+
+class UserRepository(ABC):
+    """Access to user documents, keyed by email."""
+
+    @abstractmethod
+    def get(self, email: str) -> Optional[dict]:
+        """Return the user document or None if it does not exist."""
+
+    @abstractmethod
+    def set(self, email: str, data: dict) -> None:
+        """Create or overwrite the user document."""
+
+    @abstractmethod
+    def update(self, email: str, data: dict) -> None:
+        """Merge fields into an existing user document."""
+
+    @abstractmethod
+    def delete(self, email: str) -> None:
+        """Delete the user document."""
+
+
+class BotRepository(ABC):
+    """Access to bot documents, keyed by bot id."""
+
+    @abstractmethod
+    def get(self, bot_id: str) -> Optional[dict]:
+        """Return the bot document or None if it does not exist."""
+
+    @abstractmethod
+    def get_many(self, bot_ids: Iterable[str]) -> dict[str, dict]:
+        """Fetch several bots in one round trip. Missing bots are omitted."""
+
+    @abstractmethod
+    def list(self) -> list[dict]:
+        """Return all bots."""
+
+    @abstractmethod
+    def set(self, bot_id: str, data: dict) -> None:
+        """Create or overwrite the bot document."""
+
+    @abstractmethod
+    def update(self, bot_id: str, data: dict) -> None:
+        """Merge fields into an existing bot document."""
+
+    @abstractmethod
+    def delete(self, bot_id: str) -> None:
+        """Delete the bot document."""
+
+
+class ChatRepository(ABC):
+    """Access to chat documents, keyed by chat id."""
+
+    @abstractmethod
+    def get(self, chat_id: str) -> Optional[dict]:
+        """Return the chat document or None if it does not exist."""
+
+    @abstractmethod
+    def get_versioned(self, chat_id: str) -> Optional[Versioned]:
+        """Return the chat document with its current version, or None."""
+
+    @abstractmethod
+    def list_for_user(self, user_id: str) -> list[dict]:
+        """Return all chats owned by a user, each with its ``id`` added."""
+
+    @abstractmethod
+    def list_recent_for_user(self, user_id: str, limit: int) -> list[dict]:
+        """Return summaries of up to ``limit`` of a user's chats, most recently
+        active first and archived chats last, without reading their transcripts.
+
+        A summary has the chat's ``id``, ``bot_id``, ``last_message``,
+        ``message_count``, ``archived`` and ``last_active``.
+        """
+
+    @abstractmethod
+    def stream_for_user(self, user_id: str) -> Iterator[dict]:
+        """Yield a user's chats one by one with only ``id`` and, for archived
+        chats, ``archive_key``, without reading their transcripts."""
+
+    @abstractmethod
+    def export_for_user(self, user_id: str, after: Optional[str] = None) -> Iterator[dict]:
+        """Yield a user's chats in full, each with its ``id``, in chat id order.
+
+        Starts after the chat id ``after`` when given. Chats are read a page
+        at a time, so only one page is held in memory.
+        """
+
+    @abstractmethod
+    def list_changed_for_user(self, user_id: str, since: datetime) -> list[dict]:
+        """Return a user's chats with ``last_active`` after a time, each with its ``id``."""
+
+    @abstractmethod
+    def watch_changed_for_user(self, user_id: str, since: datetime, on_change: Callable[[], None]) -> Callable[[], None]:
+        """Call ``on_change``, from any thread, whenever one of a user's chats
+        has ``last_active`` after a time, including right away if one already
+        does. Returns a function that stops watching.
+        """
+
+    @abstractmethod
+    def set(self, chat_id: str, data: dict) -> None:
+        """Create or overwrite the chat document."""
+
+    @abstractmethod
+    def update(self, chat_id: str, data: dict) -> None:
+        """Merge fields into an existing chat document."""
+
+    @abstractmethod
+    def delete(self, chat_id: str) -> None:
+        """Delete the chat document."""
+
+    @abstractmethod
+    def list_idle(self, before: datetime, limit: int) -> list[dict]:
+        """Return up to ``limit`` chats last active before a time, each with its ``id``.
+
+        Archived chats have no ``last_active`` and are never returned.
+        """
+
+    @abstractmethod
+    def replace_unless_active(self, chat_id: str, data: dict, last_active: Optional[datetime]) -> bool:
+        """Overwrite the chat document if its ``last_active`` still has the given value.
+
+        Returns False, without writing, when the chat is gone or saw activity.
+        """
+
+
+class MessageRepository(ABC):
+    """Access to the message transcript of a chat."""
+
+    @abstractmethod
+    def list(self, chat_id: str) -> list[dict]:
+        """Return the messages of a chat in order."""
+
+    @abstractmethod
+    def append(self, chat_id: str, *messages: dict) -> None:
+        """Append messages to the end of a chat transcript.
+
+        The append is atomic: concurrent appends never drop each other's
+        messages, and only the new messages are sent. It also sets the chat's
+        ``last_active`` to the server time. Raises ChatArchived, without
+        writing, if the chat is an archived stub.
+        """
+
+    @abstractmethod
+    def append_if_unchanged(self, chat_id: str, version: Any, *messages: dict) -> Optional[Any]:
+        """Append messages only if the chat is still at ``version``.
+
+        Returns the new version, or None without writing if the chat changed.
+        """
+
+
+class ChatIndexRepository(ABC):
+    """Access to the retrieval index of a chat, kept beside the chat document."""
+
+    @abstractmethod
+    def get(self, chat_id: str) -> Optional[dict]:
+        """Return the index document or None if the chat has none."""
+
+    @abstractmethod
+    def set(self, chat_id: str, data: dict) -> None:
+        """Create or overwrite the index document."""
+
+    @abstractmethod
+    def delete(self, chat_id: str) -> None:
+        """Delete the index document."""
+
+
+class Storage:
+    """Bundle of repositories backed by one storage backend."""
+
+    def __init__(
+        self,
+        users: UserRepository,
+        bots: BotRepository,
+        chats: ChatRepository,
+        messages: MessageRepository,
+        indexes: ChatIndexRepository,
+    ):
+        self.users = users
+        self.bots = bots
+        self.chats = chats
+        self.messages = messages
+        self.indexes = indexes
+
+    def delete_chats(self, chat_ids: Iterable[str], on_deleted: Callable[[str], None], ops_per_second: int) -> None:
+        """Delete chats with everything stored under them and their indexes.
+
+        Calls ``on_deleted`` with each chat id once its document is gone.
+        Backends that write in bulk keep to ``ops_per_second``.
+        """
+        for chat_id in chat_ids:
+            self.chats.delete(chat_id)
+            self.indexes.delete(chat_id)
+            on_deleted(chat_id)
@@ -0,0 +1,361 @@
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+from google.cloud.firestore_v1.field_path import FieldPath
+from app.storage.base import (
+    SERVER_TIMESTAMP,
+    BotRepository,
+    ChatArchived,
+    ChatIndexRepository,
+    ChatRepository,
+    MessageRepository,
+    Storage,
+    UserRepository,
+    Versioned,
+)
+from app.storage.summary import SUMMARY_FIELDS, summarize_chat, summarize_fields, summary_fields
+from app.storage.transcript import (
+    LAST_MESSAGE,
+    MESSAGE_COUNT,
+    TAIL,
+    TRANSCRIPT,
+    decode_block,
+    decode_chat,
+    encode_block,
+    encode_transcript,
+    split_chunks,
+)
+
+# Chats read per query when exporting
+EXPORT_PAGE_SIZE = 50
+
+
+def to_firestore(data: dict) -> dict:
+    """Swap the storage layer's field sentinels for Firestore's."""
+    return {key: firestore.SERVER_TIMESTAMP if value is SERVER_TIMESTAMP else value for key, value in data.items()}
+
+
+class FirestoreUserRepository(UserRepository):
+    def __init__(self, db: firestore.Client):
+        self.collection = db.collection("users")
+
+    def get(self, email: str) -> Optional[dict]:
+        snapshot = self.collection.document(email).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def set(self, email: str, data: dict) -> None:
+        self.collection.document(email).set(to_firestore(data))
+
+    def update(self, email: str, data: dict) -> None:
+        self.collection.document(email).update(to_firestore(data))
+
+    def delete(self, email: str) -> None:
+        self.collection.document(email).delete()
+
+
+class FirestoreBotRepository(BotRepository):
+    def __init__(self, db: firestore.Client):
+        self.db = db
+        self.collection = db.collection("bots")
+
+    def get(self, bot_id: str) -> Optional[dict]:
+        snapshot = self.collection.document(bot_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def get_many(self, bot_ids: Iterable[str]) -> dict[str, dict]:
+        refs = [self.collection.document(bot_id) for bot_id in set(bot_ids)]
+        if not refs:
+            return {}
+        return {
+            snapshot.id: snapshot.to_dict()
+            for snapshot in self.db.get_all(refs)
+            if snapshot.exists
+        }
+
+    def list(self) -> list[dict]:
+        return [snapshot.to_dict() for snapshot in self.collection.get()]
+
+    def set(self, bot_id: str, data: dict) -> None:
+        self.collection.document(bot_id).set(to_firestore(data))
+
+    def update(self, bot_id: str, data: dict) -> None:
+        self.collection.document(bot_id).update(to_firestore(data))
+
+    def delete(self, bot_id: str) -> None:
+        self.collection.document(bot_id).delete()
+
+
+class FirestoreChatRepository(ChatRepository):
+    """Chats stored with plain ``messages`` arrays, or compact transcripts
+    when a chunk size is given. Both formats are read."""
+
+    def __init__(self, db: firestore.Client, chunk_size: Optional[int] = None, codec: str = "zlib"):
+        self.db = db
+        self.collection = db.collection("chats")
+        self.chunk_size = chunk_size
+        self.codec = codec
+
+    def get(self, chat_id: str) -> Optional[dict]:
+        snapshot = self.collection.document(chat_id).get()
+        return decode_chat(snapshot.to_dict()) if snapshot.exists else None
+
+    def get_versioned(self, chat_id: str) -> Optional[Versioned]:
+        snapshot = self.collection.document(chat_id).get()
+        return Versioned(decode_chat(snapshot.to_dict()), snapshot.update_time) if snapshot.exists else None
+
+    def list_for_user(self, user_id: str) -> list[dict]:
+        query = self.collection.where(filter=firestore.FieldFilter("user_id", "==", user_id))
+        chats = []
+        for snapshot in query.get():
+            chat_data = decode_chat(snapshot.to_dict())
+            chat_data["id"] = snapshot.id
+            chats.append(chat_data)
+        return chats
+
+    def list_recent_for_user(self, user_id: str, limit: int) -> list[dict]:
+        mine = self.collection.where(filter=firestore.FieldFilter("user_id", "==", user_id))
+        # Needs a composite index on user_id and last_active
+        recent = mine.order_by("last_active", direction=firestore.Query.DESCENDING).limit(limit)
+        chats = [self._summarize(snapshot) for snapshot in recent.select(SUMMARY_FIELDS).stream()]
+        if len(chats) < limit:
+            # Archived chats have no last_active, so the ordered query skips them
+            archived = mine.where(filter=firestore.FieldFilter("archived", "==", True)).limit(limit - len(chats))
+            chats.extend(self._summarize(snapshot) for snapshot in archived.select(SUMMARY_FIELDS).stream())
+        return chats
+
+    def _summarize(self, snapshot) -> dict:
+        data = snapshot.to_dict() or {}
+        if LAST_MESSAGE not in data and not data.get("archived"):
+            # Written before chats kept summaries
+            return summarize_chat(snapshot.id, self.get(snapshot.id) or data)
+        return summarize_fields(snapshot.id, data)
+
+    def stream_for_user(self, user_id: str) -> Iterator[dict]:
+        query = self.collection.where(filter=firestore.FieldFilter("user_id", "==", user_id)).select(["archive_key"])
+        for snapshot in query.stream():
+            yield {"id": snapshot.id, **(snapshot.to_dict() or {})}
+
+    def export_for_user(self, user_id: str, after: Optional[str] = None) -> Iterator[dict]:
+        # One short query per page rather than one stream for the whole
+        # export, so a slow download never holds a query open for long
+        query = (
+            self.collection.where(filter=firestore.FieldFilter("user_id", "==", user_id))
+            .order_by(FieldPath.document_id())
+            .limit(EXPORT_PAGE_SIZE)
+        )
+        while True:
+            page = query.start_after({FieldPath.document_id(): after}) if after is not None else query
+            count = 0
+            for snapshot in page.stream():
+                count += 1
+                after = snapshot.id
+                chat_data = decode_chat(snapshot.to_dict())
+                chat_data["id"] = snapshot.id
+                yield chat_data
+            if count < EXPORT_PAGE_SIZE:
+                return
+
+    def _changed_query(self, user_id: str, since: datetime):
+        # Needs a composite index on user_id and last_active
+        return self.collection.where(filter=firestore.FieldFilter("user_id", "==", user_id)).where(
+            filter=firestore.FieldFilter("last_active", ">", since)
+        )
+
+    def list_changed_for_user(self, user_id: str, since: datetime) -> list[dict]:
+        chats = []
+        for snapshot in self._changed_query(user_id, since).get():
+            chat_data = decode_chat(snapshot.to_dict())
+            chat_data["id"] = snapshot.id
+            chats.append(chat_data)
+        return chats
+
+    def watch_changed_for_user(self, user_id: str, since: datetime, on_change: Callable[[], None]) -> Callable[[], None]:
+        def on_snapshot(snapshots, changes, read_time):
+            if snapshots:
+                on_change()
+
+        watch = self._changed_query(user_id, since).on_snapshot(on_snapshot)
+        return watch.unsubscribe
+
+    def set(self, chat_id: str, data: dict) -> None:
+        self.collection.document(chat_id).set(self._encode(data))
+
+    def _encode(self, data: dict) -> dict:
+        data = to_firestore(data)
+        if "messages" not in data:
+            return data
+        data = {**data, **summary_fields(data["messages"])}
+        if self.chunk_size is not None:
+            data.update(encode_transcript(data.pop("messages"), self.chunk_size, self.codec))
+        return data
+
+    def update(self, chat_id: str, data: dict) -> None:
+        self.collection.document(chat_id).update(to_firestore(data))
+
+    def delete(self, chat_id: str) -> None:
+        self.collection.document(chat_id).delete()
+
+    def list_idle(self, before: datetime, limit: int) -> list[dict]:
+        query = self.collection.where(filter=firestore.FieldFilter("last_active", "<", before)).limit(limit)
+        chats = []
+        for snapshot in query.get():
+            chat_data = decode_chat(snapshot.to_dict())
+            chat_data["id"] = snapshot.id
+            chats.append(chat_data)
+        return chats
+
+    def replace_unless_active(self, chat_id: str, data: dict, last_active: Optional[datetime]) -> bool:
+        ref = self.collection.document(chat_id)
+
+        @firestore.transactional
+        def replace(transaction):
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.to_dict().get("last_active") != last_active:
+                return False
+            transaction.set(ref, self._encode(data))
+            return True
+
+        return replace(self.db.transaction())
+
+
+class FirestoreMessageRepository(MessageRepository):
+    """Messages are stored in the chat document, as a ``messages`` array or,
+    when a chunk size is given, as compressed transcript blocks."""
+
+    def __init__(self, db: firestore.Client, chunk_size: Optional[int] = None, codec: str = "zlib"):
+        self.db = db
+        self.collection = db.collection("chats")
+        self.chunk_size = chunk_size
+        self.codec = codec
+
+    def list(self, chat_id: str) -> list[dict]:
+        snapshot = self.collection.document(chat_id).get()
+        if not snapshot.exists:
+            return []
+        return decode_chat(snapshot.to_dict()).get("messages", [])
+
+    def append(self, chat_id: str, *messages: dict) -> None:
+        if self.chunk_size is not None:
+            # Another append moved the tail on; read it again
+            while self._append_to_tail(chat_id, None, messages) is None:
+                pass
+            return
+        ref = self.collection.document(chat_id)
+        while True:
+            # Only the archived flag is read, and the write is conditional on it
+            snapshot = ref.get(field_paths=["archived"])
+            if not snapshot.exists:
+                raise NotFound(f"No document to update: {chat_id}")
+            if (snapshot.to_dict() or {}).get("archived"):
+                raise ChatArchived(chat_id)
+            try:
+                ref.update(self._append_update(messages), option=self.db.write_option(last_update_time=snapshot.update_time))
+                return
+            except FailedPrecondition:
+                pass
+
+    def append_if_unchanged(self, chat_id: str, version: Any, *messages: dict) -> Optional[Any]:
+        if self.chunk_size is not None:
+            return self._append_to_tail(chat_id, version, messages)
+        option = self.db.write_option(last_update_time=version)
+        try:
+            result = self.collection.document(chat_id).update(self._append_update(messages), option=option)
+        except (FailedPrecondition, NotFound):
+            return None
+        return result.update_time
+
+    def _append_update(self, messages: tuple[dict, ...]) -> dict:
+        # ArrayUnion is applied server-side, so concurrent appends cannot
+        # overwrite each other. It skips elements equal to one already in the
+        # array, which timestamped messages never are.
+        return {
+            "messages": firestore.ArrayUnion(list(messages)),
+            MESSAGE_COUNT: firestore.Increment(len(messages)),
+            LAST_MESSAGE: messages[-1],
+            "last_active": firestore.SERVER_TIMESTAMP,
+        }
+
+    def _append_to_tail(self, chat_id: str, version: Any, messages: tuple[dict, ...]) -> Optional[Any]:
+        """Add messages to a compact chat's tail, moving full chunks into the transcript.
+
+        Only the tail is read, and the write carries its update time as a
+        precondition. Returns the new version, or None if the chat changed
+        since the tail was read or, when ``version`` is given, since then.
+        """
+        ref = self.collection.document(chat_id)
+        snapshot = ref.get(field_paths=[TAIL, "archived"])
+        if not snapshot.exists:
+            if version is not None:
+                return None
+            raise NotFound(f"No document to update: {chat_id}")
+        if version is not None and snapshot.update_time != version:
+            return None
+        data = snapshot.to_dict() or {}
+        if data.get("archived"):
+            raise ChatArchived(chat_id)
+        tail = data.get(TAIL)
+        blocks, rest = split_chunks((decode_block(tail) if tail else []) + list(messages), self.chunk_size, self.codec)
+        update = {
+            TAIL: encode_block(rest, self.codec) if rest else firestore.DELETE_FIELD,
+            MESSAGE_COUNT: firestore.Increment(len(messages)),
+            LAST_MESSAGE: messages[-1],
+            "last_active": firestore.SERVER_TIMESTAMP,
+        }
+        if blocks:
+            update[TRANSCRIPT] = firestore.ArrayUnion(blocks)
+        try:
+            result = ref.update(update, option=self.db.write_option(last_update_time=snapshot.update_time))
+        except (FailedPrecondition, NotFound):
+            return None
+        return result.update_time
+
+
+class FirestoreChatIndexRepository(ChatIndexRepository):
+    def __init__(self, db: firestore.Client):
+        self.collection = db.collection("chat_indexes")
+
+    def get(self, chat_id: str) -> Optional[dict]:
+        snapshot = self.collection.document(chat_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def set(self, chat_id: str, data: dict) -> None:
+        self.collection.document(chat_id).set(data)
+
+    def delete(self, chat_id: str) -> None:
+        self.collection.document(chat_id).delete()
+
+
+class FirestoreStorage(Storage):
+    def __init__(self, db: firestore.Client, chunk_size: Optional[int] = None, codec: str = "zlib"):
+        super().__init__(
+            users=FirestoreUserRepository(db),
+            bots=FirestoreBotRepository(db),
+            chats=FirestoreChatRepository(db, chunk_size, codec),
+            messages=FirestoreMessageRepository(db, chunk_size, codec),
+            indexes=FirestoreChatIndexRepository(db),
+        )
+        self.db = db
+
+    def delete_chats(self, chat_ids: Iterable[str], on_deleted: Callable[[str], None], ops_per_second: int) -> None:
+        """Delete chats, their subcollections and indexes through a throttled BulkWriter."""
+        writer = self.db.bulk_writer(BulkWriterOptions(initial_ops_per_second=ops_per_second, max_ops_per_second=ops_per_second))
+        chats = self.db.collection("chats")
+        indexes = self.db.collection("chat_indexes")
+
+        def on_result(reference, result, writer):
+            if reference.parent.id == "chats":
+                on_deleted(reference.id)
+
+        writer.on_write_result(on_result)
+        try:
+            for chat_id in chat_ids:
+                chat_ref = chats.document(chat_id)
+                for subcollection in chat_ref.collections():
+                    for snapshot in subcollection.recursive().select([FieldPath.document_id()]).stream():
+                        writer.delete(snapshot.reference)
+                writer.delete(chat_ref)
+                writer.delete(indexes.document(chat_id))
+        finally:
+            writer.close()
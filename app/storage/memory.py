@@ -0,0 +1,279 @@
+import copy
+import itertools
+import threading
+from datetime import datetime, UTC
+from typing import Any, Callable, Iterable, Iterator, Optional
+from app.storage.base import (
+    SERVER_TIMESTAMP,
+    BotRepository,
+    ChatArchived,
+    ChatIndexRepository,
+    ChatRepository,
+    MessageRepository,
+    Storage,
+    UserRepository,
+    Versioned,
+)
+from app.storage.summary import summarize_chat
+
+
+def not_found(doc_id: str) -> Exception:
+    """The error Firestore raises for an update to a missing document.
+
+    Imported on first use, as google-api-core loads grpc.
+    """
+    from google.api_core.exceptions import NotFound
+    return NotFound(f"No document to update: {doc_id}")
+
+
+class MemoryCollection:
+    """A dict of documents with Firestore-like copy and timestamp semantics."""
+
+    # Shared so versions never repeat across collections, like update times
+    version_counter = itertools.count(1)
+
+    def __init__(self):
+        self.documents: dict[str, dict] = {}
+        self.versions: dict[str, int] = {}
+        self.listeners: list[Callable[[str], None]] = []
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def _resolve(data: dict) -> dict:
+        now = datetime.now(UTC)
+        return {
+            key: now if value is SERVER_TIMESTAMP else copy.deepcopy(value)
+            for key, value in data.items()
+        }
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        with self.lock:
+            data = self.documents.get(doc_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def get_versioned(self, doc_id: str) -> Optional[Versioned]:
+        with self.lock:
+            data = self.documents.get(doc_id)
+            return Versioned(copy.deepcopy(data), self.versions[doc_id]) if data is not None else None
+
+    def touch(self, doc_id: str) -> int:
+        """Give a changed document a new version, like Firestore's update time."""
+        with self.lock:
+            self.versions[doc_id] = version = next(MemoryCollection.version_counter)
+            for listener in list(self.listeners):
+                listener(doc_id)
+            return version
+
+    def watch(self, listener: Callable[[str], None]) -> Callable[[], None]:
+        """Call a listener with the id of every document written, until stopped."""
+        with self.lock:
+            self.listeners.append(listener)
+        return lambda: self.listeners.remove(listener)
+
+    def set(self, doc_id: str, data: dict) -> None:
+        with self.lock:
+            self.documents[doc_id] = self._resolve(data)
+            self.touch(doc_id)
+
+    def update(self, doc_id: str, data: dict) -> None:
+        with self.lock:
+            if doc_id not in self.documents:
+                raise not_found(doc_id)
+            self.documents[doc_id].update(self._resolve(data))
+            self.touch(doc_id)
+
+    def delete(self, doc_id: str) -> None:
+        with self.lock:
+            self.documents.pop(doc_id, None)
+            self.versions.pop(doc_id, None)
+
+    def items(self) -> list[tuple[str, dict]]:
+        with self.lock:
+            return [(doc_id, copy.deepcopy(data)) for doc_id, data in self.documents.items()]
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, collection: MemoryCollection):
+        self.collection = collection
+
+    def get(self, email: str) -> Optional[dict]:
+        return self.collection.get(email)
+
+    def set(self, email: str, data: dict) -> None:
+        self.collection.set(email, data)
+
+    def update(self, email: str, data: dict) -> None:
+        self.collection.update(email, data)
+
+    def delete(self, email: str) -> None:
+        self.collection.delete(email)
+
+
+class MemoryBotRepository(BotRepository):
+    def __init__(self, collection: MemoryCollection):
+        self.collection = collection
+
+    def get(self, bot_id: str) -> Optional[dict]:
+        return self.collection.get(bot_id)
+
+    def get_many(self, bot_ids: Iterable[str]) -> dict[str, dict]:
+        bots = {}
+        for bot_id in set(bot_ids):
+            bot_data = self.collection.get(bot_id)
+            if bot_data is not None:
+                bots[bot_id] = bot_data
+        return bots
+
+    def list(self) -> list[dict]:
+        return [data for _, data in self.collection.items()]
+
+    def set(self, bot_id: str, data: dict) -> None:
+        self.collection.set(bot_id, data)
+
+    def update(self, bot_id: str, data: dict) -> None:
+        self.collection.update(bot_id, data)
+
+    def delete(self, bot_id: str) -> None:
+        self.collection.delete(bot_id)
+
+
+class MemoryChatRepository(ChatRepository):
+    def __init__(self, collection: MemoryCollection):
+        self.collection = collection
+
+    def get(self, chat_id: str) -> Optional[dict]:
+        return self.collection.get(chat_id)
+
+    def get_versioned(self, chat_id: str) -> Optional[Versioned]:
+        return self.collection.get_versioned(chat_id)
+
+    def list_for_user(self, user_id: str) -> list[dict]:
+        return [
+            {**data, "id": chat_id}
+            for chat_id, data in self.collection.items()
+            if data.get("user_id") == user_id
+        ]
+
+    def list_recent_for_user(self, user_id: str, limit: int) -> list[dict]:
+        chats = [(chat_id, data) for chat_id, data in self.collection.items() if data.get("user_id") == user_id]
+        active = sorted(
+            ((chat_id, data) for chat_id, data in chats if data.get("last_active") is not None),
+            key=lambda item: item[1]["last_active"],
+            reverse=True,
+        )
+        archived = [(chat_id, data) for chat_id, data in chats if data.get("archived")]
+        return [summarize_chat(chat_id, data) for chat_id, data in (active + archived)[:limit]]
+
+    def stream_for_user(self, user_id: str) -> Iterator[dict]:
+        for chat_id, data in self.collection.items():
+            if data.get("user_id") == user_id:
+                yield {"id": chat_id, **({"archive_key": data["archive_key"]} if "archive_key" in data else {})}
+
+    def export_for_user(self, user_id: str, after: Optional[str] = None) -> Iterator[dict]:
+        for chat_id, data in sorted(self.collection.items(), key=lambda item: item[0]):
+            if data.get("user_id") == user_id and (after is None or chat_id > after):
+                yield {**data, "id": chat_id}
+
+    def list_changed_for_user(self, user_id: str, since: datetime) -> list[dict]:
+        return [
+            {**data, "id": chat_id}
+            for chat_id, data in self.collection.items()
+            if self._changed(data, user_id, since)
+        ]
+
+    def watch_changed_for_user(self, user_id: str, since: datetime, on_change: Callable[[], None]) -> Callable[[], None]:
+        def listener(chat_id: str) -> None:
+            data = self.collection.documents.get(chat_id)
+            if data is not None and self._changed(data, user_id, since):
+                on_change()
+
+        with self.collection.lock:
+            stop = self.collection.watch(listener)
+            # Like a snapshot listener's first snapshot
+            if self.list_changed_for_user(user_id, since):
+                on_change()
+        return stop
+
+    @staticmethod
+    def _changed(data: dict, user_id: str, since: datetime) -> bool:
+        return data.get("user_id") == user_id and data.get("last_active") is not None and data["last_active"] > since
+
+    def set(self, chat_id: str, data: dict) -> None:
+        self.collection.set(chat_id, data)
+
+    def update(self, chat_id: str, data: dict) -> None:
+        self.collection.update(chat_id, data)
+
+    def delete(self, chat_id: str) -> None:
+        self.collection.delete(chat_id)
+
+    def list_idle(self, before: datetime, limit: int) -> list[dict]:
+        idle = [
+            {**data, "id": chat_id}
+            for chat_id, data in self.collection.items()
+            if data.get("last_active") is not None and data["last_active"] < before
+        ]
+        return idle[:limit]
+
+    def replace_unless_active(self, chat_id: str, data: dict, last_active: Optional[datetime]) -> bool:
+        with self.collection.lock:
+            current = self.collection.documents.get(chat_id)
+            if current is None or current.get("last_active") != last_active:
+                return False
+            self.collection.set(chat_id, data)
+            return True
+
+
+class MemoryMessageRepository(MessageRepository):
+    def __init__(self, collection: MemoryCollection):
+        self.collection = collection
+
+    def list(self, chat_id: str) -> list[dict]:
+        chat_data = self.collection.get(chat_id)
+        return chat_data.get("messages", []) if chat_data is not None else []
+
+    def append(self, chat_id: str, *messages: dict) -> None:
+        with self.collection.lock:
+            chat_data = self.collection.documents.get(chat_id)
+            if chat_data is None:
+                raise not_found(chat_id)
+            if chat_data.get("archived"):
+                raise ChatArchived(chat_id)
+            chat_data.setdefault("messages", []).extend(copy.deepcopy(list(messages)))
+            chat_data["last_active"] = datetime.now(UTC)
+            self.collection.touch(chat_id)
+
+    def append_if_unchanged(self, chat_id: str, version: Any, *messages: dict) -> Optional[Any]:
+        with self.collection.lock:
+            if self.collection.versions.get(chat_id) != version:
+                return None
+            self.append(chat_id, *messages)
+            return self.collection.versions[chat_id]
+
+
+class MemoryChatIndexRepository(ChatIndexRepository):
+    def __init__(self, collection: MemoryCollection):
+        self.collection = collection
+
+    def get(self, chat_id: str) -> Optional[dict]:
+        return self.collection.get(chat_id)
+
+    def set(self, chat_id: str, data: dict) -> None:
+        self.collection.set(chat_id, data)
+
+    def delete(self, chat_id: str) -> None:
+        self.collection.delete(chat_id)
+
+
+class MemoryStorage(Storage):
+    """Process-local storage for tests, benchmarks and local development."""
+
+    def __init__(self):
+        chats = MemoryCollection()
+        super().__init__(
+            users=MemoryUserRepository(MemoryCollection()),
+            bots=MemoryBotRepository(MemoryCollection()),
+            chats=MemoryChatRepository(chats),
+            messages=MemoryMessageRepository(chats),
+            indexes=MemoryChatIndexRepository(MemoryCollection()),
+        )
@@ -0,0 +1,71 @@
+"""Chat summaries: what the chat list shows of each chat.
+
+Chat documents keep ``last_message`` and ``message_count`` beside their
+messages, written by every set and append, so recent chats are listed with
+a projection that never reads a transcript. Chats written before the fields
+existed are read whole when listed, and plain chats appended to since then
+count only the new messages until their summaries are rewritten with:
+
+    python -m app.storage.summary
+"""
+from typing import Iterable
+from app.storage.transcript import LAST_MESSAGE, MESSAGE_COUNT, decode_transcript
+
+# Chat document fields a summary is made of
+SUMMARY_FIELDS = ("bot_id", "archived", "last_active", MESSAGE_COUNT, LAST_MESSAGE)
+
+
+def summary_fields(messages: list[dict]) -> dict:
+    """Stored summary fields of a chat with these messages."""
+    return {LAST_MESSAGE: messages[-1] if messages else None, MESSAGE_COUNT: len(messages)}
+
+
+def summarize_chat(chat_id: str, chat_data: dict) -> dict:
+    """The summary of a chat read in full."""
+    return summarize_fields(chat_id, {**chat_data, **summary_fields(chat_data.get("messages", []))})
+
+
+def summarize_fields(chat_id: str, data: dict) -> dict:
+    """The summary of a chat from its stored summary fields."""
+    return {
+        "id": chat_id,
+        "bot_id": data.get("bot_id"),
+        "last_message": data.get(LAST_MESSAGE),
+        "message_count": data.get(MESSAGE_COUNT, 0),
+        "archived": data.get("archived", False),
+        "last_active": data.get("last_active"),
+    }
+
+
+def summarize_chats(snapshots: Iterable) -> int:
+    """Rewrite the summary fields of chat documents where they are missing or
+    wrong. Returns how many were rewritten.
+
+    Each chat is rewritten only if it was not changed since it was read, so
+    this can run while the app serves traffic.
+    """
+    from google.api_core.exceptions import FailedPrecondition
+    from google.cloud import firestore
+
+    rewritten = 0
+    for snapshot in snapshots:
+        data = snapshot.to_dict()
+        if data.get("archived"):
+            continue
+        fields = summary_fields(decode_transcript(data))
+        if all(key in data and data[key] == value for key, value in fields.items()):
+            continue
+        try:
+            snapshot.reference.update(fields, option=firestore.Client.write_option(last_update_time=snapshot.update_time))
+        except FailedPrecondition:
+            print(f"Chat {snapshot.id} changed while summarizing, skipped")
+            continue
+        rewritten += 1
+    return rewritten
+
+
+if __name__ == "__main__":
+    from app.dependencies import get_firestore
+
+    count = summarize_chats(get_firestore().collection("chats").stream())
+    print(f"Summarized {count} chats")
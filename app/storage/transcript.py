@@ -0,0 +1,145 @@
+"""Compact transcript encoding for chat documents.
+
+A compact chat document keeps its messages in ``transcript``: an array of
+compressed blocks, each holding a run of messages as JSON. The first byte of
+a block names its codec, and ``message_count`` counts all the messages.
+Blocks hold ``transcript_chunk_size`` messages; the messages after the last
+full block are kept in one ``transcript_tail`` block. Appends rewrite the
+tail, and move it into ``transcript`` once it fills a chunk. Documents
+written before the format existed keep a plain ``messages`` array, which is
+read first, and may have smaller blocks, which compaction merges.
+"""
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable
+
+TRANSCRIPT = "transcript"
+TAIL = "transcript_tail"
+MESSAGE_COUNT = "message_count"
+LAST_MESSAGE = "last_message"
+
+ZLIB = b"z"
+ZSTD = b"s"
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot encode {type(value).__name__} in a transcript")
+
+
+def _object_hook(value: dict):
+    if value.keys() == {"$date"}:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def compress(value, codec: str = "zlib") -> bytes:
+    """Serialize a JSON value with datetimes and compress it."""
+    data = json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+    if codec == "zstd":
+        import zstandard
+        return ZSTD + zstandard.ZstdCompressor().compress(data)
+    return ZLIB + zlib.compress(data, 9)
+
+
+def decompress(blob: bytes):
+    header, payload = blob[:1], blob[1:]
+    if header == ZSTD:
+        import zstandard
+        data = zstandard.ZstdDecompressor().decompress(payload)
+    elif header == ZLIB:
+        data = zlib.decompress(payload)
+    else:
+        raise ValueError(f"Unknown codec {header!r}")
+    return json.loads(data, object_hook=_object_hook)
+
+
+def encode_block(messages: list[dict], codec: str = "zlib") -> bytes:
+    """Compress a run of messages into one block."""
+    return compress(messages, codec)
+
+
+def decode_block(block: bytes) -> list[dict]:
+    return decompress(block)
+
+
+def split_chunks(messages: list[dict], chunk_size: int, codec: str = "zlib") -> tuple[list[bytes], list[dict]]:
+    """Blocks of full chunks, and the messages left over for the tail."""
+    full = len(messages) - len(messages) % chunk_size
+    blocks = [encode_block(messages[i:i + chunk_size], codec) for i in range(0, full, chunk_size)]
+    return blocks, messages[full:]
+
+
+def encode_transcript(messages: list[dict], chunk_size: int, codec: str = "zlib") -> dict:
+    """Fields storing messages as compact chunks and a tail."""
+    blocks, tail = split_chunks(messages, chunk_size, codec)
+    fields = {TRANSCRIPT: blocks, MESSAGE_COUNT: len(messages)}
+    if tail:
+        fields[TAIL] = encode_block(tail, codec)
+    return fields
+
+
+def decode_transcript(data: dict) -> list[dict]:
+    """Messages of a chat document in either format, in order."""
+    messages = list(data.get("messages", []))
+    for block in data.get(TRANSCRIPT, []):
+        messages.extend(decode_block(block))
+    if data.get(TAIL):
+        messages.extend(decode_block(data[TAIL]))
+    return messages
+
+
+def decode_chat(data: dict) -> dict:
+    """Replace the stored transcript and summary fields of a chat with a ``messages`` list."""
+    data.pop(LAST_MESSAGE, None)
+    data.pop(MESSAGE_COUNT, None)
+    if TRANSCRIPT not in data and TAIL not in data:
+        return data
+    data["messages"] = decode_transcript(data)
+    data.pop(TRANSCRIPT, None)
+    data.pop(TAIL, None)
+    return data
+
+
+def is_compact(data: dict, chunk_size: int) -> bool:
+    """Whether a chat document is stored as full chunks and a tail."""
+    if "messages" in data:
+        return False
+    return len(data.get(TRANSCRIPT, [])) == data.get(MESSAGE_COUNT, 0) // chunk_size
+
+
+def compact_chats(snapshots: Iterable, chunk_size: int, codec: str = "zlib") -> int:
+    """Rewrite chat documents as compact chunks. Returns how many were rewritten.
+
+    Each chat is rewritten only if it was not changed since it was read, so a
+    migration can run while the app serves traffic.
+    """
+    from google.api_core.exceptions import FailedPrecondition
+    from google.cloud import firestore
+
+    rewritten = 0
+    for snapshot in snapshots:
+        data = snapshot.to_dict()
+        if is_compact(data, chunk_size):
+            continue
+        fields = encode_transcript(decode_transcript(data), chunk_size, codec)
+        fields["messages"] = firestore.DELETE_FIELD
+        fields.setdefault(TAIL, firestore.DELETE_FIELD)
+        try:
+            snapshot.reference.update(fields, option=firestore.Client.write_option(last_update_time=snapshot.update_time))
+        except FailedPrecondition:
+            print(f"Chat {snapshot.id} changed while compacting, skipped")
+            continue
+        rewritten += 1
+    return rewritten
+
+
+if __name__ == "__main__":
+    from app.config import settings
+    from app.dependencies import get_firestore
+
+    chats = get_firestore().collection("chats").stream()
+    count = compact_chats(chats, settings.transcript_chunk_size, settings.transcript_codec)
+    print(f"Compacted {count} chats")
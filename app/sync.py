@@ -0,0 +1,105 @@
+"""Delta sync for clients that keep chats offline.
+
+A sync token is the ``last_active`` of the newest change a client has seen.
+Given one, a sync returns the chats active since, and for each only the
+messages from ``messages_from`` on; the client replaces its copy of the
+chat's messages from that position. A turn's messages carry the time the
+turn started but are stored when it ends, so messages are returned from
+SYNC_OVERLAP seconds before the token, which may repeat some the client
+already has but never misses one.
+
+Deleted chats leave nothing for a delta to find, so only a full sync, which
+lists every chat in ``chat_ids``, tells a client which ones are gone.
+"""
+import asyncio
+import base64
+import binascii
+from datetime import datetime, timedelta
+from typing import Optional
+from app.config import settings
+from app.metrics import metrics
+from app.storage.base import Storage
+
+# Chat fields a sync returns besides the messages
+SYNC_FIELDS = ("id", "bot_id", "last_active")
+
+
+def encode_token(since: datetime) -> str:
+    return base64.urlsafe_b64encode(since.isoformat().encode()).decode()
+
+
+def decode_token(token: str) -> datetime:
+    """The time in a sync token. Raises ValueError if the token is malformed."""
+    try:
+        since = datetime.fromisoformat(base64.urlsafe_b64decode(token.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError("Malformed sync token") from e
+    if since.tzinfo is None:
+        raise ValueError("Malformed sync token")
+    return since
+
+
+def messages_from(messages: list[dict], since: Optional[datetime]) -> int:
+    """Position of the first message a client synced at ``since`` may lack."""
+    if since is None:
+        return 0
+    cutoff = since - timedelta(seconds=settings.sync_overlap)
+    position = len(messages)
+    while position > 0 and (messages[position - 1].get("timestamp") or cutoff) > cutoff:
+        position -= 1
+    return position
+
+
+def chat_delta(chat_data: dict, since: Optional[datetime]) -> dict:
+    messages = chat_data.get("messages", [])
+    start = messages_from(messages, since)
+    delta = {field: chat_data.get(field) for field in SYNC_FIELDS}
+    delta.update({
+        "archived": chat_data.get("archived", False),
+        "message_count": len(messages),
+        "messages_from": start,
+        "messages": messages[start:],
+    })
+    return delta
+
+
+async def get_changes(storage: Storage, user_id: str, since: Optional[datetime]) -> tuple[list[dict], Optional[datetime]]:
+    """Chats changed since a time, or all chats, and the newest change among them."""
+    if since is None:
+        chats = await asyncio.to_thread(storage.chats.list_for_user, user_id)
+    else:
+        chats = await asyncio.to_thread(storage.chats.list_changed_for_user, user_id, since)
+    newest = max((chat_data["last_active"] for chat_data in chats if chat_data.get("last_active") is not None), default=since)
+    return chats, newest
+
+
+async def wait_for_change(storage: Storage, user_id: str, since: datetime, timeout: float) -> bool:
+    """Wait until one of a user's chats is active after ``since``. Returns
+    False if nothing changed within the timeout."""
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    stop = await asyncio.to_thread(
+        storage.chats.watch_changed_for_user, user_id, since, lambda: loop.call_soon_threadsafe(changed.set)
+    )
+    metrics.increment("sync.waits")
+    try:
+        await asyncio.wait_for(changed.wait(), timeout)
+        return True
+    except TimeoutError:
+        return False
+    finally:
+        await asyncio.to_thread(stop)
+
+
+async def sync(storage: Storage, user_id: str, since: Optional[datetime], wait: bool) -> dict:
+    """The changes since a time, waiting up to SYNC_WAIT seconds for one if asked."""
+    chats, newest = await get_changes(storage, user_id, since)
+    if not chats and wait and since is not None and await wait_for_change(storage, user_id, since, settings.sync_wait):
+        chats, newest = await get_changes(storage, user_id, since)
+    metrics.increment("sync.chats", len(chats))
+    return {
+        "token": encode_token(newest) if newest is not None else None,
+        "chats": [chat_delta(chat_data, since) for chat_data in chats],
+        # Listing every chat on a delta would cost as much as a full sync
+        "chat_ids": [chat_data["id"] for chat_data in chats] if since is None else None,
+    }
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, UTC
+import jwt
+from app.config import settings
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+def create_token(email: str, token_type: str, ttl: int) -> str:
+    """Sign a session token for the user."""
+    now = datetime.now(UTC)
+    payload = {
+        "sub": email,
+        "type": token_type,
+        "iat": now,
+        "exp": now + timedelta(seconds=ttl),
+    }
+    return jwt.encode(payload, settings.secret_key, algorithm=settings.algorithm)
+
+def create_session(email: str) -> dict:
+    """Issue a short-lived access token and a refresh token."""
+    access_token = create_token(email, ACCESS, settings.access_token_ttl)
+    return {
+        "token": access_token,
+        "access_token": access_token,
+        "refresh_token": create_token(email, REFRESH, settings.refresh_token_ttl),
+        "token_type": "bearer",
+        "expires_in": settings.access_token_ttl,
+    }
+
+def is_session_token(token: str) -> bool:
+    """Tell our HMAC-signed tokens apart from Google's RSA-signed ID tokens."""
+    try:
+        return jwt.get_unverified_header(token).get("alg") == settings.algorithm
+    except jwt.InvalidTokenError:
+        return False
+
+def decode_token(token: str, token_type: str) -> dict:
+    """Verify a session token locally. Raises jwt.InvalidTokenError."""
+    payload = jwt.decode(
+        token,
+        settings.secret_key,
+        algorithms=[settings.algorithm],
+        options={"require": ["sub", "type", "exp"]},
+    )
+    if payload["type"] != token_type:
+        raise jwt.InvalidTokenError(f"Expected a {token_type} token")
+    return payload
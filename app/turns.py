@@ -0,0 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from app.metrics import metrics
+
+
+class TurnLocks:
+    """One lock per chat so turns on the same chat run one after another.
+
+    A second message sent while a reply is being generated waits for that
+    turn to finish and then sees its messages. Locks are dropped once nobody
+    holds or waits for them. This only orders turns within one process;
+    appends stay atomic across replicas on their own.
+    """
+
+    def __init__(self):
+        self.locks: dict[str, asyncio.Lock] = {}
+        self.users: dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, chat_id: str) -> AsyncIterator[None]:
+        lock = self.locks.get(chat_id)
+        if lock is None:
+            lock = self.locks[chat_id] = asyncio.Lock()
+            self.users[chat_id] = 0
+        self.users[chat_id] += 1
+        try:
+            if lock.locked():
+                metrics.increment("chat.turns.waited")
+            async with lock:
+                yield
+        finally:
+            self.users[chat_id] -= 1
+            if self.users[chat_id] == 0:
+                del self.locks[chat_id]
+                del self.users[chat_id]
+
+
+chat_turns = TurnLocks()
@@ -0,0 +1,26 @@
+import asyncio
+from fastapi import FastAPI
+from app.config import settings
+from app.dependencies import get_firestore
+from app.gemini import get_client
+
+def prime_gemini() -> None:
+    """Import google-genai and build the client."""
+    from google.genai import types  # noqa: F401
+    get_client()
+
+def prime_firestore() -> None:
+    """Open the Firestore channel and fetch credentials with one small read."""
+    get_firestore().collection("bots").limit(1).get(timeout=settings.warm_up_timeout)
+
+async def warm_up(app: FastAPI) -> None:
+    """Prime clients in the background, then mark the app ready for traffic."""
+    try:
+        if settings.warm_up:
+            for prime in (prime_gemini, prime_firestore):
+                try:
+                    await asyncio.to_thread(prime)
+                except Exception as e:
+                    print(f"Error in warm_up {prime.__name__}: {e}")
+    finally:
+        app.state.ready = True
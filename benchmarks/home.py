@@ -0,0 +1,100 @@
+"""Measure cold-start home screen latency: three calls versus /home.
+
+Each sample runs in a fresh interpreter and loads the home screen once, either
+with /users/me, /chat/ and /bots one after another or with the aggregate
+/home endpoint. Requests carry a real session token. Storage is in memory,
+with every read delayed by --latency milliseconds to stand in for a
+Firestore round trip.
+
+    python benchmarks/home.py --runs 5 --latency 30
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+SAMPLE = """
+import json
+import sys
+import time
+from datetime import datetime, UTC
+
+from app.main import app
+from fastapi.testclient import TestClient
+from app.dependencies import get_storage
+from app.storage.memory import MemoryStorage
+from app.tokens import ACCESS, create_token
+
+mode, latency = sys.argv[1], float(sys.argv[2]) / 1000
+
+storage = MemoryStorage()
+storage.users.set("bench@example.com", {"email": "bench@example.com", "name": "Bench", "created_at": datetime.now(UTC)})
+for i in range(20):
+    storage.bots.set(f"bot-{i}", {"id": f"bot-{i}", "name": f"Bot {i}", "description": "", "prompt": "You are a test bot"})
+for i in range(10):
+    storage.chats.set(f"chat-{i}", {
+        "user_id": "bench@example.com",
+        "bot_id": f"bot-{i}",
+        "messages": [{"role": "assistant", "content": "Cześć!", "timestamp": datetime.now(UTC)}],
+        "last_active": datetime.now(UTC),
+    })
+
+def slow(func):
+    def wrapper(*args, **kwargs):
+        time.sleep(latency)
+        return func(*args, **kwargs)
+    return wrapper
+
+for repository, names in ((storage.users, ["get"]), (storage.chats, ["list_for_user", "list_recent_for_user"]), (storage.bots, ["get_many", "list"])):
+    for name in names:
+        setattr(repository, name, slow(getattr(repository, name)))
+
+app.dependency_overrides[get_storage] = lambda: storage
+client = TestClient(app)
+headers = {"Authorization": f"Bearer {create_token('bench@example.com', ACCESS, 900)}"}
+
+start = time.perf_counter()
+if mode == "home":
+    client.get("/home", headers=headers).raise_for_status()
+else:
+    for path in ("/users/me", "/chat/", "/bots"):
+        client.get(path, headers=headers).raise_for_status()
+print(json.dumps({mode: time.perf_counter() - start}))
+"""
+
+ENV = {
+    "GOOGLE_CLIENT_ID": "bench-client-id",
+    "GOOGLE_CLIENT_SECRET": "bench-client-secret",
+    "GEMINI_API_KEY": "bench-gemini-key",
+    "SECRET_KEY": "bench-secret-key",
+    "WARM_UP": "false",
+}
+
+def run_sample(mode: str, latency: float) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", SAMPLE, mode, str(latency)],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, **ENV},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])[mode]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=30.0)
+    args = parser.parse_args()
+
+    for mode in ("sequential", "home"):
+        values = [run_sample(mode, args.latency) * 1000 for _ in range(args.runs)]
+        print(f"{mode:>10}: median {statistics.median(values):8.1f} ms  min {min(values):8.1f} ms  max {max(values):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
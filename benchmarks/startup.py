@@ -0,0 +1,87 @@
+"""Measure cold start: app import time and first-request latency.
+
+Each sample runs in a fresh interpreter so nothing is already imported.
+Storage uses the in-memory backend and the model call is mocked, so the
+numbers cover our own startup cost rather than network round trips.
+
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+SAMPLE = """
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+from app.dependencies import get_current_user, get_storage
+from app.storage.memory import MemoryStorage
+
+storage = MemoryStorage()
+storage.bots.set("bot", {"id": "bot", "prompt": "You are a test bot"})
+storage.chats.set("chat", {"user_id": "bench@example.com", "bot_id": "bot", "messages": []})
+
+async def current_user():
+    return {"email": "bench@example.com"}
+
+app.dependency_overrides[get_current_user] = current_user
+app.dependency_overrides[get_storage] = lambda: storage
+client = TestClient(app)
+
+request_start = time.perf_counter()
+client.get("/health")
+health = time.perf_counter() - request_start
+
+reply = MagicMock()
+reply.text = "Cześć!"
+with patch("app.gemini.client.aio.models.generate_content", return_value=reply):
+    request_start = time.perf_counter()
+    client.post("/chat/chat/message", json={"message": "Cześć!"}, headers={"Authorization": "Bearer bench"})
+    message = time.perf_counter() - request_start
+
+print(json.dumps({"import": imported - start, "first_health": health, "first_message": message}))
+"""
+
+ENV = {
+    "GOOGLE_CLIENT_ID": "bench-client-id",
+    "GOOGLE_CLIENT_SECRET": "bench-client-secret",
+    "GEMINI_API_KEY": "bench-gemini-key",
+    "SECRET_KEY": "bench-secret-key",
+    "WARM_UP": "false",
+}
+
+def run_sample() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", SAMPLE],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, **ENV},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run_sample() for _ in range(args.runs)]
+    for name in samples[0]:
+        values = [sample[name] * 1000 for sample in samples]
+        print(f"{name:>14}: median {statistics.median(values):8.1f} ms  min {min(values):8.1f} ms  max {max(values):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
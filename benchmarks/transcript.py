@@ -0,0 +1,139 @@
+"""Compare the stored size of a chat transcript in each format.
+
+The chat is written the way the app writes it: a greeting, then a learner
+message and a reply appended one at a time through the message repository,
+against an in-process stand-in for the Firestore document that applies
+ArrayUnion, Increment and DELETE_FIELD like the server. The migration's
+rewrite of the same chat is shown for comparison.
+
+Sizes follow Firestore's document size rules (field names and strings count
+their UTF-8 bytes plus one, timestamps 8 bytes, maps and arrays the sum of
+their entries), which is what a read of the chat document transfers and bills.
+Messages are random Polish sentences that never repeat, so they compress no
+better than a real conversation.
+
+    python benchmarks/transcript.py --messages 200
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from google.cloud import firestore
+from app.storage.firestore import FirestoreStorage
+from app.storage.transcript import encode_transcript
+
+WORDS = (
+    "ja ty on ona my wy oni być mieć chcieć móc musieć iść jechać jeść pić mówić rozumieć "
+    "pisać czytać kupić zamówić zapytać odpowiedzieć pamiętać lubić kochać wiedzieć "
+    "dom szkoła praca sklep restauracja kawiarnia dworzec pociąg autobus tramwaj miasto "
+    "wieś rzeka góry morze las park ulica mieszkanie pokój kuchnia łazienka okno drzwi "
+    "stół krzesło książka zeszyt długopis telefon komputer pies kot ptak ryba chleb masło "
+    "ser mleko kawa herbata woda sok zupa pierogi kotlet sałatka ciasto jabłko gruszka "
+    "śliwka dzień noc rano wieczór wczoraj dzisiaj jutro zawsze nigdy często czasem "
+    "bardzo trochę dużo mało dobrze źle szybko wolno ładnie pięknie ciekawie trudno łatwo "
+    "duży mały nowy stary młody ciepły zimny gorący smaczny drogi tani zielony czerwony "
+    "niebieski żółty biały czarny przyjaciel przyjaciółka brat siostra matka ojciec babcia "
+    "dziadek nauczyciel lekarz kelner sprzedawca student uczennica Kraków Warszawa Gdańsk "
+    "Wrocław Poznań Łódź w na do z od przy po przez dla bez o że bo ale i lub czy jak gdzie"
+).split()
+
+def value_size(value) -> int:
+    if isinstance(value, str):
+        return len(value.encode()) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, datetime):
+        return 8
+    if isinstance(value, dict):
+        return sum(len(key.encode()) + 1 + value_size(item) for key, item in value.items())
+    if isinstance(value, list):
+        return sum(value_size(item) for item in value)
+    return 8
+
+def sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 30))
+    return " ".join(words).capitalize() + rng.choice(".?!")
+
+def transcript(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime.now(UTC)
+    messages = []
+    for i in range(count):
+        role = "assistant" if i % 2 == 0 else "user"
+        content = " ".join(sentence(rng) for _ in range(rng.randint(1, 4) if role == "assistant" else 1))
+        message = {"role": role, "content": content, "timestamp": start + timedelta(seconds=i)}
+        if role == "assistant":
+            message["model"] = "gemini-2.0-flash"
+        messages.append(message)
+    return messages
+
+class FakeDocument:
+    """One Firestore document, applying field transforms like the server."""
+
+    def __init__(self):
+        self.data = None
+        self.version = 0
+
+    def _write(self) -> SimpleNamespace:
+        self.version += 1
+        return SimpleNamespace(update_time=self.version)
+
+    def set(self, data):
+        self.data = {}
+        return self.update(data)
+
+    def update(self, data, option=None):
+        for key, value in data.items():
+            if value is firestore.DELETE_FIELD:
+                self.data.pop(key, None)
+            elif value is firestore.SERVER_TIMESTAMP:
+                self.data[key] = datetime.now(UTC)
+            elif isinstance(value, firestore.ArrayUnion):
+                self.data[key] = self.data.get(key, []) + list(value.values)
+            elif isinstance(value, firestore.Increment):
+                self.data[key] = self.data.get(key, 0) + value.value
+            else:
+                self.data[key] = value
+        return self._write()
+
+    def get(self, field_paths=None):
+        data = self.data if field_paths is None else {key: self.data[key] for key in field_paths if key in self.data}
+        return SimpleNamespace(exists=True, update_time=self.version, to_dict=lambda: dict(data))
+
+def stored_by_appends(messages: list[dict], chunk_size, codec: str) -> dict:
+    document = FakeDocument()
+    db = SimpleNamespace(
+        collection=lambda name: SimpleNamespace(document=lambda doc_id: document),
+        write_option=lambda **kwargs: None,
+    )
+    storage = FirestoreStorage(db, chunk_size, codec)
+    storage.chats.set("chat", {"user_id": "bench@example.com", "bot_id": "bot", "messages": messages[:1]})
+    for message in messages[1:]:
+        storage.messages.append("chat", message)
+    return {key: value for key, value in document.data.items() if key not in ("user_id", "bot_id", "last_active")}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--codec", default="zlib")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    messages = transcript(args.messages, args.seed)
+    plain = value_size(stored_by_appends(messages, None, args.codec))
+    sizes = {
+        "messages": plain,
+        "compact": value_size(stored_by_appends(messages, args.chunk_size, args.codec)),
+        "migrated": value_size(encode_transcript(messages, args.chunk_size, args.codec)),
+    }
+    for name, size in sizes.items():
+        print(f"{name:>8}: {size:8d} bytes  ({size / plain:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -17,12 +17,33 @@ os.environ['GOOGLE_PROJECT_ID'] = 'test-project-id'
 os.environ['FIRESTORE_EMULATOR_HOST'] = 'localhost:8080'
 os.environ['SECRET_KEY'] = 'test-secret-key'
 os.environ['ALGORITHM'] = 'HS256'
+os.environ['WARM_UP'] = 'false'
 
 # Load test environment variables from .env.test file
 test_env_path = Path(__file__).parent / '.env.test'
 load_dotenv(test_env_path)
 
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies import get_current_user, get_storage
+from app.chat_cache import chat_cache
+from app.purge import purge_jobs
+from app.rate_limit import rate_limit_backend
+from app.search import bot_search
+from app.storage.memory import MemoryStorage
+
 @pytest.fixture(autouse=True)
+def clear_process_caches():
+    # Every test starts with full rate limit buckets, whatever ran before it
+    rate_limit_backend.buckets.clear()
+    # Chats and bots cached by one test must not leak into the next one's storage
+    yield
+    chat_cache.chats.clear()
+    chat_cache.bots.clear()
+    bot_search.index = None
+    purge_jobs.jobs.clear()
+
+@pytest.fixture
 def test_firestore():
     # Initialize Firestore client with emulator
     client = firestore.Client(project='test-project-id')
@@ -30,4 +51,23 @@ def test_firestore():
     # Clean up after tests
     for collection in client.collections():
         for doc in collection.stream():
-            doc.reference.delete() 
\ No newline at end of file
+            doc.reference.delete()
+
+@pytest.fixture
+def memory_storage():
+    # In-memory repositories for tests that do not need the emulator
+    return MemoryStorage()
+
+@pytest.fixture
+def test_client(memory_storage):
+    # The app as test@example.com, on in-memory storage
+    async def get_current_user_mock():
+        return {"email": "test@example.com"}
+
+    app.dependency_overrides[get_current_user] = get_current_user_mock
+    app.dependency_overrides[get_storage] = lambda: memory_storage
+
+    client = TestClient(app)
+    yield client
+
+    app.dependency_overrides = {}
@@ -0,0 +1,31 @@
+import asyncio
+from unittest.mock import MagicMock
+from google.genai import errors
+
+def api_error(code: int) -> errors.APIError:
+    """Build the error google-genai raises for an HTTP status code."""
+    return errors.APIError(code, {"error": {"code": code, "message": "Fake Gemini error", "status": "UNAVAILABLE"}}, None)
+
+class FakeGemini:
+    """Local stand-in for client.aio.models.generate_content.
+
+    Each call consumes the next scripted outcome: a reply string, an
+    exception to raise, or a (delay, outcome) pair to wait before answering.
+    The last outcome repeats once the script runs out.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def generate_content(self, **kwargs):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, tuple):
+            delay, outcome = outcome
+            await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        response = MagicMock()
+        response.text = outcome
+        return response
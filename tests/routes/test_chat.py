@@ -218,7 +218,7 @@ async def test_send_message_success(test_firestore, test_client, mock_current_us
     })
 
     # Mock the Gemini API client
-    with patch('app.routes.chat.client.models.generate_content', return_value=mock_gemini_response):
+    with patch('app.gemini.client.aio.models.generate_content', return_value=mock_gemini_response):
         # Test the endpoint
         response = test_client.post(
             f"/chat/{chat_id}/message",
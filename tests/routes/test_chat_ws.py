@@ -0,0 +1,116 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from starlette.websockets import WebSocketDisconnect
+from app.config import settings
+from app.load import load_monitor
+from app.tokens import ACCESS, create_token
+
+MOCK_BOT = {
+    "id": "test-bot-id",
+    "name": "Test Bot",
+    "description": "A test bot for testing",
+    "prompt": "You are a test bot",
+    "created_by": "test@example.com",
+}
+
+MOCK_CHAT = {
+    "user_id": "test@example.com",
+    "bot_id": "test-bot-id",
+    "bot_prompt": "You are a test bot",
+    "messages": []
+}
+
+@pytest.fixture
+def test_client(test_client, memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+    memory_storage.chats.set("test-chat-id", MOCK_CHAT)
+    return test_client
+
+@pytest.fixture
+def token():
+    return create_token("test@example.com", ACCESS, 60)
+
+def mock_stream(*texts):
+    async def stream(*args, **kwargs):
+        async def chunks():
+            for text in texts:
+                chunk = MagicMock()
+                chunk.text = text
+                yield chunk
+        return chunks()
+    return stream
+
+def test_stream_turns(test_client, memory_storage, token):
+    with patch('app.gemini.client.aio.models.generate_content_stream', side_effect=mock_stream("Cześć", "! Jak się masz?")) as generate:
+        with test_client.websocket_connect(f"/chat/test-chat-id/ws?token={token}") as websocket:
+            for text in ("Cześć!", "Dobrze, dziękuję."):
+                websocket.send_json({"message": text})
+                assert websocket.receive_json() == {"type": "token", "text": "Cześć"}
+                assert websocket.receive_json() == {"type": "token", "text": "! Jak się masz?"}
+                assert websocket.receive_json() == {"type": "done", "response": "Cześć! Jak się masz?", "model": settings.default_model}
+
+    assert generate.call_count == 2
+    second_turn = generate.call_args.kwargs["contents"]
+    assert [content.role for content in second_turn] == ["user", "model", "user"]
+    messages = memory_storage.messages.list("test-chat-id")
+    assert [msg["role"] for msg in messages] == ["user", "assistant", "user", "assistant"]
+
+def test_session_reads_chat_once(test_client, memory_storage, token):
+    with patch('app.gemini.client.aio.models.generate_content_stream', side_effect=mock_stream("Hej")):
+        with patch.object(memory_storage.chats, "get", wraps=memory_storage.chats.get) as get_chat:
+            with test_client.websocket_connect(f"/chat/test-chat-id/ws?token={token}") as websocket:
+                for _ in range(3):
+                    websocket.send_json({"message": "Hej"})
+                    while websocket.receive_json()["type"] != "done":
+                        pass
+    assert get_chat.call_count == 1
+
+def test_turns_count_toward_overload(test_client, memory_storage, token):
+    seen_in_flight = []
+
+    async def stream(*args, **kwargs):
+        seen_in_flight.append(load_monitor.expensive_in_flight)
+        return await mock_stream("Hej")(*args, **kwargs)
+
+    with patch('app.gemini.client.aio.models.generate_content_stream', side_effect=stream) as generate:
+        with test_client.websocket_connect(f"/chat/test-chat-id/ws?token={token}") as websocket:
+            websocket.send_json({"message": "Hej"})
+            while websocket.receive_json()["type"] != "done":
+                pass
+            with patch.object(load_monitor, "lag", 1.0):
+                websocket.send_json({"message": "Jak leci?"})
+                assert websocket.receive_json() == {
+                    "type": "error",
+                    "detail": "Server is overloaded, please retry",
+                    "retry_after": settings.shed_retry_after,
+                }
+
+    assert seen_in_flight == [1]
+    assert generate.call_count == 1
+    assert load_monitor.expensive_in_flight == 0
+
+def test_invalid_token_is_rejected(test_client):
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with test_client.websocket_connect("/chat/test-chat-id/ws?token=invalid") as websocket:
+            websocket.receive_json()
+    assert excinfo.value.code == 4401
+
+def test_google_token_is_verified_off_the_event_loop(test_client):
+    threads = []
+
+    def verify(*args):
+        threads.append(threading.current_thread().name)
+        return {"email": "test@example.com"}
+
+    with patch('app.dependencies.id_token.verify_oauth2_token', side_effect=verify):
+        with test_client.websocket_connect("/chat/test-chat-id/ws?token=google-id-token"):
+            pass
+    assert len(threads) == 1 and threads[0].startswith("asyncio_")
+
+def test_other_users_chat_is_rejected(test_client, memory_storage):
+    other_token = create_token("other@example.com", ACCESS, 60)
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with test_client.websocket_connect(f"/chat/test-chat-id/ws?token={other_token}") as websocket:
+            websocket.receive_json()
+    assert excinfo.value.code == 4403
@@ -0,0 +1,100 @@
+import threading
+from datetime import datetime, timedelta, UTC
+from unittest.mock import MagicMock, patch
+from app.storage.firestore import FirestoreChatRepository
+
+MOCK_BOT = {
+    "id": "test-bot-id",
+    "name": "Test Bot",
+    "description": "A test bot for testing",
+    "prompt": "You are a test bot",
+    "image_url": "https://example.com/image.jpg",
+    "created_by": "test@example.com",
+}
+
+HEADERS = {"Authorization": "Bearer test-token"}
+
+def test_home_returns_compact_payload(test_client, memory_storage):
+    now = datetime.now(UTC)
+    memory_storage.users.set("test@example.com", {"email": "test@example.com", "name": "Test User", "created_at": now})
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+    for i in range(3):
+        memory_storage.chats.set(f"chat-{i}", {
+            "user_id": "test@example.com",
+            "bot_id": MOCK_BOT["id"],
+            "messages": [{"role": "assistant", "content": f"Cześć {i}", "timestamp": now}],
+            "last_active": now - timedelta(hours=i),
+        })
+    memory_storage.chats.set("other-chat", {"user_id": "other@example.com", "bot_id": MOCK_BOT["id"], "messages": []})
+
+    response = test_client.get("/home?chats_limit=2", headers=HEADERS)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["user"]["name"] == "Test User"
+    assert [chat["id"] for chat in data["chats"]] == ["chat-0", "chat-1"]
+    assert data["chats"][0]["last_message"]["content"] == "Cześć 0"
+    assert data["chats"][0]["message_count"] == 1
+    assert data["has_more_chats"] is True
+    assert data["bots"] == [{field: MOCK_BOT[field] for field in ("id", "name", "description", "image_url")}]
+
+def test_home_without_user_document(test_client):
+    data = test_client.get("/home", headers=HEADERS).json()
+
+    assert data == {"user": None, "chats": [], "has_more_chats": False, "bots": []}
+
+def test_home_fetches_concurrently(test_client, memory_storage):
+    # Each read waits for the other two, so sequential reads would break the barrier
+    barrier = threading.Barrier(3, timeout=2)
+
+    def together(func):
+        def wrapper(*args):
+            barrier.wait()
+            return func(*args)
+        return wrapper
+
+    with patch.object(memory_storage.users, "get", together(memory_storage.users.get)), \
+         patch.object(memory_storage.chats, "list_recent_for_user", together(memory_storage.chats.list_recent_for_user)), \
+         patch.object(memory_storage.bots, "list", together(memory_storage.bots.list)):
+        response = test_client.get("/home", headers=HEADERS)
+
+    assert response.status_code == 200
+
+def test_home_lists_archived_chats_last(test_client, memory_storage):
+    memory_storage.chats.set("archived-chat", {"user_id": "test@example.com", "bot_id": MOCK_BOT["id"], "archived": True})
+    memory_storage.chats.set("active-chat", {
+        "user_id": "test@example.com",
+        "bot_id": MOCK_BOT["id"],
+        "messages": [],
+        "last_active": datetime.now(UTC),
+    })
+
+    data = test_client.get("/home", headers=HEADERS).json()
+
+    assert [chat["id"] for chat in data["chats"]] == ["active-chat", "archived-chat"]
+    assert data["chats"][1]["archived"] is True
+
+def test_firestore_recent_chats_read_only_summaries():
+    db = MagicMock()
+    mine = db.collection.return_value.where.return_value
+    recent = mine.order_by.return_value.limit.return_value.select.return_value
+    recent.stream.return_value = iter([MagicMock(id="chat-1", to_dict=MagicMock(return_value={
+        "bot_id": "bot",
+        "last_active": datetime(2025, 1, 1, tzinfo=UTC),
+        "message_count": 7,
+        "last_message": {"role": "assistant", "content": "Cześć!"},
+    }))])
+    mine.where.return_value.limit.return_value.select.return_value.stream.return_value = iter([])
+
+    chats = FirestoreChatRepository(db).list_recent_for_user("test@example.com", 2)
+
+    assert chats == [{
+        "id": "chat-1",
+        "bot_id": "bot",
+        "last_message": {"role": "assistant", "content": "Cześć!"},
+        "message_count": 7,
+        "archived": False,
+        "last_active": datetime(2025, 1, 1, tzinfo=UTC),
+    }]
+    assert "messages" not in mine.order_by.return_value.limit.return_value.select.call_args.args[0]
+    db.collection.return_value.document.return_value.get.assert_not_called()
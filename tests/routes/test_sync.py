@@ -0,0 +1,100 @@
+import threading
+from datetime import datetime, timedelta, UTC
+from unittest.mock import MagicMock, patch
+from app.config import settings
+from app.storage.firestore import FirestoreChatRepository
+from app.sync import decode_token, encode_token, messages_from
+
+HEADERS = {"Authorization": "Bearer test-token"}
+LONG_AGO = datetime(2025, 1, 1, tzinfo=UTC)
+
+def add_chat(storage, chat_id: str, user_id: str = "test@example.com") -> None:
+    storage.chats.set(chat_id, {
+        "user_id": user_id,
+        "bot_id": "bot",
+        "messages": [{"role": "assistant", "content": "Cześć!", "timestamp": LONG_AGO}],
+        "last_active": datetime.now(UTC),
+    })
+
+def test_full_sync_then_delta(test_client, memory_storage):
+    add_chat(memory_storage, "chat-1")
+    add_chat(memory_storage, "chat-2")
+    add_chat(memory_storage, "other-chat", user_id="other@example.com")
+
+    first = test_client.get("/sync", headers=HEADERS).json()
+    assert sorted(chat["id"] for chat in first["chats"]) == ["chat-1", "chat-2"]
+    assert first["chats"][0]["messages_from"] == 0
+    assert sorted(first["chat_ids"]) == ["chat-1", "chat-2"]
+
+    unchanged = test_client.get(f"/sync?since={first['token']}", headers=HEADERS).json()
+    assert unchanged["chats"] == []
+    assert unchanged["token"] == first["token"]
+
+    memory_storage.messages.append("chat-2", {"role": "user", "content": "Dzień dobry", "timestamp": datetime.now(UTC)})
+    memory_storage.chats.delete("chat-1")
+    delta = test_client.get(f"/sync?since={first['token']}", headers=HEADERS).json()
+    assert [chat["id"] for chat in delta["chats"]] == ["chat-2"]
+    assert delta["chats"][0]["messages_from"] == 1
+    assert delta["chats"][0]["message_count"] == 2
+    assert [message["content"] for message in delta["chats"][0]["messages"]] == ["Dzień dobry"]
+    assert delta["chat_ids"] is None
+    assert delta["token"] != first["token"]
+
+    full = test_client.get("/sync", headers=HEADERS).json()
+    assert full["chat_ids"] == ["chat-2"]
+
+def test_invalid_token(test_client):
+    response = test_client.get("/sync?since=not-a-token", headers=HEADERS)
+    assert response.status_code == 400
+
+def test_long_poll_returns_on_change(test_client, memory_storage):
+    add_chat(memory_storage, "chat-1")
+    token = test_client.get("/sync", headers=HEADERS).json()["token"]
+
+    timer = threading.Timer(0.2, memory_storage.messages.append, ("chat-1", {"role": "user", "content": "Hej", "timestamp": datetime.now(UTC)}))
+    timer.start()
+    with patch.object(settings, "sync_wait", 5.0):
+        response = test_client.get(f"/sync?since={token}&wait=true", headers=HEADERS)
+    timer.join()
+
+    assert [chat["id"] for chat in response.json()["chats"]] == ["chat-1"]
+    assert memory_storage.chats.collection.listeners == []
+
+def test_long_poll_times_out(test_client, memory_storage):
+    add_chat(memory_storage, "chat-1")
+    token = test_client.get("/sync", headers=HEADERS).json()["token"]
+
+    with patch.object(settings, "sync_wait", 0.1):
+        data = test_client.get(f"/sync?since={token}&wait=true", headers=HEADERS).json()
+
+    assert data["chats"] == []
+    assert data["token"] == token
+    assert memory_storage.chats.collection.listeners == []
+
+def test_messages_of_a_turn_in_flight_are_not_missed():
+    since = datetime.now(UTC)
+    # The reply was stored after the sync but carries the time its turn started
+    messages = [
+        {"role": "assistant", "content": "Cześć!", "timestamp": since - timedelta(hours=1)},
+        {"role": "user", "content": "Hej", "timestamp": since - timedelta(seconds=5)},
+        {"role": "assistant", "content": "Co słychać?", "timestamp": since - timedelta(seconds=5)},
+    ]
+    assert messages_from(messages, since) == 1
+    assert messages_from(messages, None) == 0
+
+def test_token_round_trip():
+    now = datetime.now(UTC)
+    assert decode_token(encode_token(now)) == now
+
+def test_firestore_watch_ignores_empty_snapshots():
+    db = MagicMock()
+    query = db.collection.return_value.where.return_value.where.return_value
+    on_change = MagicMock()
+
+    stop = FirestoreChatRepository(db).watch_changed_for_user("test@example.com", LONG_AGO, on_change)
+    on_snapshot = query.on_snapshot.call_args.args[0]
+    on_snapshot([], [], LONG_AGO)
+    on_change.assert_not_called()
+    on_snapshot([MagicMock()], [MagicMock()], LONG_AGO)
+    on_change.assert_called_once()
+    assert stop is query.on_snapshot.return_value.unsubscribe
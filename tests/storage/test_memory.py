@@ -0,0 +1,69 @@
+import pytest
+from datetime import datetime
+from google.api_core.exceptions import NotFound
+from app.storage.base import SERVER_TIMESTAMP
+
+MOCK_BOT = {
+    "id": "test-bot-id",
+    "name": "Test Bot",
+    "description": "A test bot for testing",
+    "prompt": "You are a test bot",
+    "image_url": "https://example.com/image.jpg",
+    "created_by": "test@example.com",
+}
+
+def test_get_returns_copy(memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+
+    bot_data = memory_storage.bots.get(MOCK_BOT["id"])
+    bot_data["name"] = "Changed"
+
+    assert memory_storage.bots.get(MOCK_BOT["id"])["name"] == MOCK_BOT["name"]
+
+def test_server_timestamp_is_resolved(memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], {**MOCK_BOT, "created_at": SERVER_TIMESTAMP})
+
+    assert isinstance(memory_storage.bots.get(MOCK_BOT["id"])["created_at"], datetime)
+
+def test_update_missing_document(memory_storage):
+    with pytest.raises(NotFound):
+        memory_storage.users.update("missing@example.com", {"name": "Nobody"})
+
+def test_get_many_skips_missing(memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+
+    bots = memory_storage.bots.get_many([MOCK_BOT["id"], "missing-bot"])
+
+    assert list(bots) == [MOCK_BOT["id"]]
+
+def test_messages_append(memory_storage):
+    memory_storage.chats.set("chat-id", {"user_id": "test@example.com", "bot_id": MOCK_BOT["id"], "messages": []})
+
+    memory_storage.messages.append("chat-id", {"role": "user", "content": "Cześć!"})
+    memory_storage.messages.append("chat-id", {"role": "assistant", "content": "Cześć! Jak się masz?"})
+
+    messages = memory_storage.messages.list("chat-id")
+    assert [message["role"] for message in messages] == ["user", "assistant"]
+    assert memory_storage.chats.get("chat-id")["messages"] == messages
+
+def test_list_for_user(memory_storage):
+    memory_storage.chats.set("mine", {"user_id": "test@example.com", "bot_id": MOCK_BOT["id"]})
+    memory_storage.chats.set("theirs", {"user_id": "other@example.com", "bot_id": MOCK_BOT["id"]})
+
+    chats = memory_storage.chats.list_for_user("test@example.com")
+
+    assert [chat["id"] for chat in chats] == ["mine"]
+
+def test_routes_with_memory_storage(test_client, memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+
+    response = test_client.get(f"/chat/start?bot_id={MOCK_BOT['id']}", headers={"Authorization": "Bearer test-token"})
+    assert response.status_code == 200
+    chat_id = response.json()["chat_id"]
+
+    response = test_client.get("/chat", headers={"Authorization": "Bearer test-token"})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["id"] == chat_id
+    assert data[0]["bot"]["name"] == MOCK_BOT["name"]
@@ -0,0 +1,171 @@
+from datetime import datetime, UTC
+from unittest.mock import MagicMock
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud import firestore
+from app.storage.base import SERVER_TIMESTAMP
+from app.storage.firestore import FirestoreStorage
+from app.storage.summary import summarize_chats
+from app.storage.transcript import (
+    compact_chats,
+    decode_block,
+    decode_chat,
+    decode_transcript,
+    encode_block,
+    encode_transcript,
+)
+
+MESSAGES = [
+    {"role": "user", "content": f"Wiadomość {i} — zażółć gęślą jaźń", "timestamp": datetime(2025, 1, 1, 12, i, tzinfo=UTC)}
+    for i in range(5)
+]
+
+def snapshot(doc_id, data):
+    snapshot = MagicMock()
+    snapshot.id = doc_id
+    snapshot.exists = True
+    snapshot.to_dict.return_value = data
+    return snapshot
+
+def test_block_round_trip():
+    block = encode_block(MESSAGES)
+
+    assert decode_block(block) == MESSAGES
+    assert isinstance(decode_block(block)[0]["timestamp"], datetime)
+
+def test_transcript_is_chunked():
+    fields = encode_transcript(MESSAGES, chunk_size=2)
+
+    assert len(fields["transcript"]) == 2
+    assert decode_block(fields["transcript_tail"]) == MESSAGES[4:]
+    assert fields["message_count"] == 5
+    assert decode_transcript(fields) == MESSAGES
+
+def test_legacy_messages_come_first():
+    data = {"messages": MESSAGES[:2], **encode_transcript(MESSAGES[2:], chunk_size=2)}
+
+    assert decode_transcript(data) == MESSAGES
+
+def test_decode_chat_leaves_plain_chats_alone():
+    data = {"user_id": "test@example.com", "messages": MESSAGES}
+
+    assert decode_chat(dict(data)) == data
+    assert decode_chat({"user_id": "test@example.com", **encode_transcript(MESSAGES, 2)}) == data
+
+def test_compact_storage_reads_and_writes_blocks():
+    db = MagicMock()
+    storage = FirestoreStorage(db, chunk_size=2)
+    chat_ref = db.collection.return_value.document.return_value
+
+    storage.chats.set("chat", {"user_id": "test@example.com", "messages": MESSAGES})
+    stored = chat_ref.set.call_args.args[0]
+    assert "messages" not in stored
+    assert stored["message_count"] == 5
+
+    chat_ref.get.return_value = snapshot("chat", stored)
+    assert storage.chats.get("chat")["messages"] == MESSAGES
+    assert storage.messages.list("chat") == MESSAGES
+
+def test_compact_chats_rewrites_only_loose_chats():
+    legacy = snapshot("legacy", {"messages": MESSAGES})
+    fragmented = snapshot("fragmented", {"transcript": [encode_block([m]) for m in MESSAGES], "message_count": 5})
+    compact = snapshot("compact", encode_transcript(MESSAGES, 50))
+    changed = snapshot("changed", {"messages": MESSAGES})
+    changed.reference.update.side_effect = FailedPrecondition("changed")
+
+    assert compact_chats([legacy, fragmented, compact, changed], chunk_size=50) == 2
+
+    fields = legacy.reference.update.call_args.args[0]
+    assert fields["messages"] is firestore.DELETE_FIELD
+    assert fields["transcript"] == []
+    assert decode_block(fields["transcript_tail"]) == MESSAGES
+    fields = fragmented.reference.update.call_args.args[0]
+    assert fields["transcript"] == []
+    assert decode_block(fields["transcript_tail"]) == MESSAGES
+    compact.reference.update.assert_not_called()
+
+def tail_snapshot(tail, update_time="v1"):
+    return MagicMock(exists=True, update_time=update_time, to_dict=MagicMock(return_value={"transcript_tail": encode_block(tail)} if tail else {}))
+
+def test_appends_fill_the_tail_before_adding_a_block():
+    db = MagicMock()
+    storage = FirestoreStorage(db, chunk_size=3)
+    chat_ref = db.collection.return_value.document.return_value
+
+    chat_ref.get.return_value = tail_snapshot(MESSAGES[:1])
+    storage.messages.append("chat", MESSAGES[1])
+    update = chat_ref.update.call_args.args[0]
+    assert "transcript" not in update
+    assert decode_block(update["transcript_tail"]) == MESSAGES[:2]
+    assert isinstance(update["message_count"], firestore.Increment)
+    assert chat_ref.get.call_args.kwargs["field_paths"] == ["transcript_tail", "archived"]
+
+    chat_ref.get.return_value = tail_snapshot(MESSAGES[:2])
+    storage.messages.append("chat", MESSAGES[2], MESSAGES[3])
+    update = chat_ref.update.call_args.args[0]
+    assert [decode_block(block) for block in update["transcript"].values] == [MESSAGES[:3]]
+    assert decode_block(update["transcript_tail"]) == MESSAGES[3:4]
+
+    chat_ref.get.return_value = tail_snapshot(MESSAGES[:2])
+    storage.messages.append("chat", MESSAGES[2])
+    assert chat_ref.update.call_args.args[0]["transcript_tail"] is firestore.DELETE_FIELD
+
+def test_tail_append_is_conditional():
+    db = MagicMock()
+    storage = FirestoreStorage(db, chunk_size=3)
+    chat_ref = db.collection.return_value.document.return_value
+    chat_ref.get.return_value = tail_snapshot(MESSAGES[:1], update_time="v2")
+
+    assert storage.messages.append_if_unchanged("chat", "v1", MESSAGES[1]) is None
+    chat_ref.update.assert_not_called()
+
+    chat_ref.update.return_value = MagicMock(update_time="v3")
+    assert storage.messages.append_if_unchanged("chat", "v2", MESSAGES[1]) == "v3"
+    assert db.write_option.call_args.kwargs == {"last_update_time": "v2"}
+
+    # A plain append that loses a race reads the tail again
+    chat_ref.update.side_effect = [FailedPrecondition("changed"), MagicMock(update_time="v4")]
+    storage.messages.append("chat", MESSAGES[1])
+    assert chat_ref.update.call_count == 3
+
+def test_chats_keep_their_summary():
+    db = MagicMock()
+    storage = FirestoreStorage(db)
+    chat_ref = db.collection.return_value.document.return_value
+
+    storage.chats.set("chat", {"user_id": "test@example.com", "messages": MESSAGES[:2]})
+    stored = chat_ref.set.call_args.args[0]
+    assert stored["last_message"] == MESSAGES[1]
+    assert stored["message_count"] == 2
+
+    chat_ref.get.return_value = snapshot("chat", {})
+    storage.messages.append("chat", *MESSAGES[2:4])
+    update = chat_ref.update.call_args.args[0]
+    assert update["last_message"] == MESSAGES[3]
+    assert update["message_count"].value == 2
+
+    chat_ref.get.return_value = snapshot("chat", {**stored, "messages": MESSAGES[:4], "message_count": 4})
+    assert storage.chats.get("chat") == {"user_id": "test@example.com", "messages": MESSAGES[:4]}
+
+def test_summarize_chats_fixes_missing_and_stale_summaries():
+    legacy = snapshot("legacy", {"messages": MESSAGES})
+    undercounted = snapshot("undercounted", {"messages": MESSAGES, "message_count": 2, "last_message": MESSAGES[-1]})
+    current = snapshot("current", {**encode_transcript(MESSAGES, 2), "last_message": MESSAGES[-1]})
+    archived = snapshot("archived", {"archived": True})
+
+    assert summarize_chats([legacy, undercounted, current, archived]) == 2
+
+    assert legacy.reference.update.call_args.args[0] == {"last_message": MESSAGES[-1], "message_count": 5}
+    assert undercounted.reference.update.call_args.args[0]["message_count"] == 5
+    current.reference.update.assert_not_called()
+    archived.reference.update.assert_not_called()
+
+def test_server_timestamps_become_firestore_sentinels():
+    db = MagicMock()
+    storage = FirestoreStorage(db)
+    doc_ref = db.collection.return_value.document.return_value
+
+    storage.users.update("test@example.com", {"last_login": SERVER_TIMESTAMP})
+    storage.chats.set("chat", {"user_id": "test@example.com", "last_active": SERVER_TIMESTAMP})
+
+    assert doc_ref.update.call_args.args[0]["last_login"] is firestore.SERVER_TIMESTAMP
+    assert doc_ref.set.call_args.args[0]["last_active"] is firestore.SERVER_TIMESTAMP
@@ -0,0 +1,144 @@
+import pytest
+from datetime import datetime, timedelta, UTC
+from unittest.mock import MagicMock, patch
+from google.api_core.exceptions import NotFound
+from app.archive import (
+    GCSObjectStore,
+    LocalObjectStore,
+    archive_idle_chats,
+    check_shared_store,
+    create_object_store,
+    restore_chat,
+    unarchive,
+)
+from app.chat_cache import chat_cache
+from app.config import settings
+from app.storage.base import ChatArchived
+
+MOCK_BOT = {
+    "id": "test-bot-id",
+    "name": "Test Bot",
+    "prompt": "You are a test bot",
+}
+
+MESSAGES = [
+    {"role": "assistant", "content": "Cześć!", "timestamp": datetime(2025, 1, 1, tzinfo=UTC)},
+    {"role": "user", "content": "Dzień dobry", "timestamp": datetime(2025, 1, 1, tzinfo=UTC)},
+]
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    with patch("app.archive.object_store", store), patch("app.routes.chat.object_store", store):
+        yield store
+
+@pytest.fixture
+def idle_chat(memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+    memory_storage.chats.set("idle-chat", {
+        "user_id": "test@example.com",
+        "bot_id": MOCK_BOT["id"],
+        "bot_prompt": MOCK_BOT["prompt"],
+        "messages": MESSAGES,
+        "last_active": datetime.now(UTC) - timedelta(days=60),
+    })
+    return "idle-chat"
+
+def test_idle_chats_leave_a_stub(memory_storage, store, idle_chat):
+    memory_storage.chats.set("active-chat", {"user_id": "test@example.com", "bot_id": MOCK_BOT["id"], "last_active": datetime.now(UTC)})
+
+    assert archive_idle_chats(memory_storage, store, idle_for=30 * 86400, limit=10) == 1
+
+    stub = memory_storage.chats.get(idle_chat)
+    assert stub["archived"] is True
+    assert "messages" not in stub
+    assert stub["user_id"] == "test@example.com"
+    assert store.get(stub["archive_key"]) is not None
+    assert "archived" not in memory_storage.chats.get("active-chat")
+    # Stubs have no activity time, so they are not picked up again
+    assert archive_idle_chats(memory_storage, store, idle_for=30 * 86400, limit=10) == 0
+
+def test_active_chat_is_not_archived(memory_storage, store, idle_chat):
+    idle = memory_storage.chats.list_idle(datetime.now(UTC) - timedelta(days=30), 10)
+    memory_storage.messages.append(idle_chat, {"role": "assistant", "content": "Witaj", "timestamp": datetime.now(UTC)})
+
+    with patch.object(memory_storage.chats, "list_idle", return_value=idle):
+        assert archive_idle_chats(memory_storage, store, idle_for=30 * 86400, limit=10) == 0
+
+    assert len(memory_storage.messages.list(idle_chat)) == 3
+    assert list(store.root.rglob("*")) == [store.root / "chats"]
+
+def test_restore_brings_messages_back(memory_storage, store, idle_chat):
+    archive_idle_chats(memory_storage, store, idle_for=30 * 86400, limit=10)
+    stub = memory_storage.chats.get(idle_chat)
+
+    chat_data = restore_chat(memory_storage, store, idle_chat, stub)
+
+    assert chat_data["messages"] == MESSAGES
+    assert memory_storage.chats.get(idle_chat)["messages"] == MESSAGES
+    assert store.get(stub["archive_key"]) is None
+    # A second restore of the same stub loses the race and asks for a re-read
+    assert restore_chat(memory_storage, store, idle_chat, stub) is None
+
+@pytest.mark.asyncio
+async def test_stub_with_stray_activity_is_restored(memory_storage, store, idle_chat):
+    archive_idle_chats(memory_storage, store, idle_for=30 * 86400, limit=10)
+    stray = {"role": "user", "content": "Jestem", "timestamp": datetime.now(UTC)}
+    memory_storage.chats.update(idle_chat, {"messages": [stray], "last_active": datetime.now(UTC)})
+
+    chat_data = await unarchive(memory_storage, idle_chat, memory_storage.chats.get(idle_chat))
+
+    assert chat_data["messages"] == MESSAGES + [stray]
+    assert "archived" not in memory_storage.chats.get(idle_chat)
+
+@pytest.mark.asyncio
+async def test_appends_restore_an_archived_chat_first(memory_storage, store, idle_chat):
+    archive_idle_chats(memory_storage, store, idle_for=30 * 86400, limit=10)
+    message = {"role": "user", "content": "Wróciłem", "timestamp": datetime.now(UTC)}
+
+    with pytest.raises(ChatArchived):
+        memory_storage.messages.append(idle_chat, message)
+    # A stale cached copy falls back to an unconditional append
+    assert await chat_cache.append(memory_storage, idle_chat, None, message) is None
+
+    assert memory_storage.messages.list(idle_chat) == MESSAGES + [message]
+    assert "archived" not in memory_storage.chats.get(idle_chat)
+
+def test_get_chat_restores_archived_chat(test_client, memory_storage, store, idle_chat):
+    archive_idle_chats(memory_storage, store, idle_for=30 * 86400, limit=10)
+
+    response = test_client.get(f"/chat/{idle_chat}", headers={"Authorization": "Bearer test-token"})
+
+    assert response.status_code == 200
+    assert [m["content"] for m in response.json()["messages"]] == ["Cześć!", "Dzień dobry"]
+    assert "archived" not in memory_storage.chats.get(idle_chat)
+
+def test_object_keys_stay_inside_the_store(store):
+    with pytest.raises(ValueError):
+        store.put("../outside", b"data")
+
+def test_archiver_refuses_pod_local_storage():
+    with patch.object(settings, "archive_backend", "local"), patch.object(settings, "archive_path_shared", False):
+        with pytest.raises(RuntimeError):
+            check_shared_store()
+    with patch.object(settings, "archive_backend", "local"), patch.object(settings, "archive_path_shared", True):
+        check_shared_store()
+    with patch.object(settings, "archive_backend", "gcs"):
+        check_shared_store()
+
+def test_gcs_backend():
+    with patch.object(settings, "archive_backend", "gcs"), patch.object(settings, "archive_bucket", None):
+        with pytest.raises(ValueError):
+            create_object_store()
+    with patch.object(settings, "archive_backend", "gcs"), patch.object(settings, "archive_bucket", "plesc-archive"):
+        store = create_object_store()
+    assert isinstance(store, GCSObjectStore)
+
+    store.bucket = MagicMock()
+    blob = store.bucket.blob.return_value
+    blob.download_as_bytes.side_effect = NotFound("missing")
+    assert store.get("chats/missing") is None
+    blob.delete.side_effect = NotFound("missing")
+    store.delete("chats/missing")
+    store.put("chats/chat", b"data")
+    blob.upload_from_string.assert_called_once()
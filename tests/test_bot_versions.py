@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import patch
+from tests.fake_gemini import FakeGemini
+
+MOCK_BOT = {
+    "name": "Test Bot",
+    "description": "A test bot for testing",
+    "prompt": "You are a test bot",
+}
+
+HEADERS = {"Authorization": "Bearer test-token"}
+
+@pytest.fixture
+def bot_id(test_client):
+    with patch("app.routes.bots.refresh_greetings"):
+        return test_client.post("/bots", headers=HEADERS, json=MOCK_BOT).json()["id"]
+
+def test_prompt_change_creates_version(test_client, memory_storage, bot_id):
+    assert memory_storage.bots.get(bot_id)["version"] == 1
+
+    test_client.put(f"/bots/{bot_id}", headers=HEADERS, json={"name": "Renamed"})
+    assert memory_storage.bots.get(bot_id)["version"] == 1
+
+    with patch("app.routes.bots.refresh_greetings"):
+        test_client.put(f"/bots/{bot_id}", headers=HEADERS, json={"prompt": "You are a strict teacher"})
+    assert memory_storage.bots.get(bot_id)["version"] == 2
+
+def test_chat_stays_on_pinned_version_until_upgraded(test_client, memory_storage, bot_id):
+    chat_id = test_client.get(f"/chat/start?bot_id={bot_id}", headers=HEADERS).json()["chat_id"]
+    with patch("app.routes.bots.refresh_greetings"):
+        test_client.put(f"/bots/{bot_id}", headers=HEADERS, json={"prompt": "You are a strict teacher"})
+    gemini = FakeGemini("Cześć!")
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=gemini.generate_content) as generate, \
+         patch.object(memory_storage.bots, "get", wraps=memory_storage.bots.get) as bot_reads:
+        test_client.post(f"/chat/{chat_id}/message", headers=HEADERS, json={"message": "Dzień dobry"})
+        assert generate.call_args.kwargs["config"].system_instruction == MOCK_BOT["prompt"]
+        assert bot_reads.call_count == 0
+
+        assert test_client.get(f"/chat/{chat_id}", headers=HEADERS).json()["upgrade_available"] is True
+        response = test_client.post(f"/chat/{chat_id}/upgrade", headers=HEADERS)
+        assert response.json() == {"bot_version": 2}
+
+        test_client.post(f"/chat/{chat_id}/message", headers=HEADERS, json={"message": "Jak się masz?"})
+        assert generate.call_args.kwargs["config"].system_instruction == "You are a strict teacher"
+
+    assert test_client.get(f"/chat/{chat_id}", headers=HEADERS).json()["upgrade_available"] is False
+
+def test_upgrade_requires_owner(test_client, memory_storage, bot_id):
+    memory_storage.chats.set("other-chat", {"user_id": "other@example.com", "bot_id": bot_id, "messages": []})
+
+    response = test_client.post("/chat/other-chat/upgrade", headers=HEADERS)
+
+    assert response.status_code == 403
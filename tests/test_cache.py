@@ -0,0 +1,95 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app.cache import MemoryCacheBackend, ResponseCache, response_cache
+from app.gemini import _policies
+from app.metrics import metrics
+from tests.fake_gemini import FakeGemini, api_error
+
+MOCK_BOT = {
+    "id": "test-bot-id",
+    "name": "Test Bot",
+    "description": "A test bot for testing",
+    "prompt": "You are a test bot",
+    "image_url": "https://example.com/image.jpg",
+    "created_by": "test@example.com",
+    "cache_responses": True,
+}
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    metrics.reset()
+    response_cache.backend.entries.clear()
+
+@pytest.fixture
+def mock_gemini_response():
+    mock_response = MagicMock()
+    mock_response.text = "Cześć! Jak się masz?"
+    return mock_response
+
+def test_key_normalizes_history():
+    first = ResponseCache.key("model", "prompt", [{"role": "user", "content": "Cześć!"}])
+    second = ResponseCache.key("model", "prompt", [{"role": "user", "content": "  cześć! "}])
+    other_prompt = ResponseCache.key("model", "other prompt", [{"role": "user", "content": "Cześć!"}])
+    other_model = ResponseCache.key("other-model", "prompt", [{"role": "user", "content": "Cześć!"}])
+
+    assert first == second
+    assert first != other_prompt
+    assert first != other_model
+
+def test_hit_and_miss_metrics():
+    cache = ResponseCache(MemoryCacheBackend(maxsize=8, ttl=60), max_messages=2)
+    history = [{"role": "user", "content": "Hello"}]
+
+    assert cache.get("model", "prompt", history) is None
+    cache.set("model", "prompt", history, "Hi!")
+    assert cache.get("model", "prompt", history) == "Hi!"
+
+    assert metrics.get("response_cache.misses") == 1
+    assert metrics.get("response_cache.hits") == 1
+
+def test_only_short_histories_are_cacheable():
+    cache = ResponseCache(MemoryCacheBackend(maxsize=8, ttl=60), max_messages=2)
+
+    assert not cache.cacheable([])
+    assert cache.cacheable([{"role": "user", "content": "Hello"}])
+    assert not cache.cacheable([{"role": "user", "content": "Hello"}] * 3)
+
+def test_send_message_uses_cache(test_client, memory_storage, mock_gemini_response):
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+    for chat_id in ("first-chat", "second-chat"):
+        memory_storage.chats.set(chat_id, {
+            "user_id": "test@example.com",
+            "bot_id": MOCK_BOT["id"],
+            "bot_prompt": MOCK_BOT["prompt"],
+            "messages": [],
+        })
+
+    with patch('app.gemini.client.aio.models.generate_content', return_value=mock_gemini_response) as generate:
+        for chat_id in ("first-chat", "second-chat"):
+            response = test_client.post(
+                f"/chat/{chat_id}/message",
+                headers={"Authorization": "Bearer test-token"},
+                json={"message": "Cześć!"}
+            )
+            assert response.status_code == 200
+            assert response.json()["response"] == mock_gemini_response.text
+
+    assert generate.call_count == 1
+    assert len(memory_storage.messages.list("second-chat")) == 2
+    assert test_client.get("/metrics").json()["counters"]["response_cache.hits"] == 1
+
+def test_fallback_replies_are_not_cached(test_client, memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], {**MOCK_BOT, "model": "primary-model", "fallback_model": "fallback-model"})
+    memory_storage.chats.set("test-chat-id", {"user_id": "test@example.com", "bot_id": MOCK_BOT["id"], "messages": []})
+    primary = FakeGemini(api_error(503))
+    fallback = FakeGemini("Cześć!")
+
+    async def generate_content(model, **kwargs):
+        return await (primary if model == "primary-model" else fallback).generate_content()
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=generate_content):
+        response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Cześć!"})
+    _policies.clear()
+
+    assert response.json()["model"] == "fallback-model"
+    assert len(response_cache.backend.entries) == 0
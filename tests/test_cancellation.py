@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
+from app.cancellation import ClientDisconnected, run_cancellable
+from app.config import settings
+
+MOCK_CHAT = {
+    "user_id": "test@example.com",
+    "bot_id": "test-bot-id",
+    "bot_prompt": "You are a test bot",
+    "messages": []
+}
+
+class FakeRequest:
+    def __init__(self, disconnect_after: float = None):
+        self.disconnect_at = None if disconnect_after is None else asyncio.get_running_loop().time() + disconnect_after
+
+    async def is_disconnected(self):
+        return self.disconnect_at is not None and asyncio.get_running_loop().time() >= self.disconnect_at
+
+async def slow_work(cancelled: list):
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        cancelled.append(True)
+        raise
+
+@pytest.mark.asyncio
+async def test_returns_result():
+    async def work():
+        return "done"
+
+    assert await run_cancellable(FakeRequest(), work(), timeout=1) == "done"
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_work():
+    cancelled = []
+    with pytest.raises(ClientDisconnected):
+        await run_cancellable(FakeRequest(disconnect_after=0.02), slow_work(cancelled), timeout=5, poll_interval=0.01)
+    await asyncio.sleep(0)
+    assert cancelled == [True]
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_work():
+    cancelled = []
+    with pytest.raises(HTTPException) as excinfo:
+        await run_cancellable(FakeRequest(), slow_work(cancelled), timeout=0.02)
+    await asyncio.sleep(0)
+    assert excinfo.value.status_code == 504
+    assert cancelled == [True]
+
+def test_timed_out_turn_can_be_retried(test_client, memory_storage):
+    memory_storage.bots.set("test-bot-id", {"id": "test-bot-id", "prompt": "You are a test bot"})
+    memory_storage.chats.set("test-chat-id", MOCK_CHAT)
+
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    with patch.object(settings, "generation_timeout", 0.05), patch('app.gemini.client.aio.models.generate_content', side_effect=hang):
+        response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Hello, bot!"})
+    assert response.status_code == 504
+    assert [msg["role"] for msg in memory_storage.messages.list("test-chat-id")] == ["user"]
+
+    mock_response = MagicMock()
+    mock_response.text = "This is a test response from the bot."
+    with patch('app.gemini.client.aio.models.generate_content', return_value=mock_response):
+        response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Hello, bot!"})
+    assert response.status_code == 200
+    assert [msg["role"] for msg in memory_storage.messages.list("test-chat-id")] == ["user", "assistant"]
@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from google.api_core.exceptions import FailedPrecondition
+from app.chat_cache import chat_cache
+from app.metrics import metrics
+from app.storage.firestore import FirestoreMessageRepository
+from tests.fake_gemini import FakeGemini
+
+MOCK_BOT = {
+    "id": "test-bot-id",
+    "name": "Test Bot",
+    "prompt": "You are a test bot",
+}
+
+@pytest.fixture
+def test_client(test_client, memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+    memory_storage.chats.set("test-chat-id", {"user_id": "test@example.com", "bot_id": MOCK_BOT["id"], "messages": []})
+    return test_client
+
+def send(client, text):
+    return client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": text})
+
+def test_hot_chat_is_not_read_again(test_client, memory_storage):
+    gemini = FakeGemini("Cześć!")
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=gemini.generate_content), \
+         patch.object(memory_storage.chats, "get_versioned", wraps=memory_storage.chats.get_versioned) as chat_reads, \
+         patch.object(memory_storage.bots, "get", wraps=memory_storage.bots.get) as bot_reads:
+        for text in ("Dzień dobry", "Jak się masz?", "Do widzenia"):
+            assert send(test_client, text).status_code == 200
+
+    assert chat_reads.call_count == 1
+    assert bot_reads.call_count == 1
+    assert [m["content"] for m in memory_storage.messages.list("test-chat-id")] == [
+        "Dzień dobry", "Cześć!", "Jak się masz?", "Cześć!", "Do widzenia", "Cześć!"
+    ]
+
+def test_chat_changed_elsewhere_is_read_again(test_client, memory_storage):
+    gemini = FakeGemini("Cześć!")
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=gemini.generate_content) as generate:
+        send(test_client, "Dzień dobry")
+        # Another replica adds a turn the cached copy does not have
+        memory_storage.messages.append("test-chat-id", {"role": "user", "content": "Z innego serwera"})
+        stale = metrics.get("chat_cache.stale")
+        send(test_client, "Jak się masz?")
+        assert metrics.get("chat_cache.stale") == stale + 1
+        send(test_client, "Do widzenia")
+
+    # The turn that hit the conflict was generated from the stored chat
+    contents = generate.call_args_list[1].kwargs["contents"]
+    assert [content.parts[0].text for content in contents] == ["Dzień dobry", "Cześć!", "Z innego serwera", "Jak się masz?"]
+
+    contents = [m["content"] for m in memory_storage.messages.list("test-chat-id")]
+    assert contents[:3] == ["Dzień dobry", "Cześć!", "Z innego serwera"]
+    assert len(contents) == 7
+    # The turn after the conflict read the chat again and saw every message
+    history = chat_cache.chats["test-chat-id"].data["messages"]
+    assert [m["content"] for m in history] == contents
+
+def test_bot_update_drops_cached_bot(test_client, memory_storage):
+    gemini = FakeGemini("Cześć!")
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=gemini.generate_content):
+        send(test_client, "Dzień dobry")
+    assert MOCK_BOT["id"] in chat_cache.bots
+
+    memory_storage.bots.set(MOCK_BOT["id"], {**MOCK_BOT, "created_by": "test@example.com"})
+    response = test_client.put(f"/bots/{MOCK_BOT['id']}", headers={"Authorization": "Bearer test-token"}, json={"name": "Nowy"})
+
+    assert response.status_code == 200
+    assert MOCK_BOT["id"] not in chat_cache.bots
+
+def test_firestore_append_checks_update_time():
+    db = MagicMock()
+    chat_ref = db.collection.return_value.document.return_value
+    chat_ref.update.return_value.update_time = "new"
+    messages = FirestoreMessageRepository(db)
+
+    assert messages.append_if_unchanged("test-chat-id", "old", {"role": "user", "content": "Cześć"}) == "new"
+    db.write_option.assert_called_with(last_update_time="old")
+
+    chat_ref.update.side_effect = FailedPrecondition("changed")
+    assert messages.append_if_unchanged("test-chat-id", "old", {"role": "user", "content": "Cześć"}) is None
@@ -0,0 +1,84 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.security import HTTPAuthorizationCredentials
+from app.coalescing import SingleFlight, get_bot
+from app.dependencies import get_current_user
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_result():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"name": "Test Bot"}
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    assert calls == 1
+    assert results == [{"name": "Test Bot"}] * 5
+    # Every caller gets its own copy
+    assert len({id(result) for result in results}) == 5
+    assert flight.calls == {}
+
+@pytest.mark.asyncio
+async def test_errors_reach_all_waiters():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("Firestore unavailable")
+
+    results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+@pytest.mark.asyncio
+async def test_later_calls_run_again():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("key", fetch) == 1
+    assert await flight.do("key", fetch) == 2
+
+@pytest.mark.asyncio
+async def test_get_bot_coalesces_storage_reads(memory_storage):
+    memory_storage.bots.set("test-bot-id", {"id": "test-bot-id", "prompt": "You are a test bot"})
+
+    with patch.object(memory_storage.bots, "get", wraps=memory_storage.bots.get) as get:
+        bots = await asyncio.gather(*(get_bot(memory_storage, "test-bot-id") for _ in range(10)))
+
+    assert get.call_count == 1
+    assert all(bot["id"] == "test-bot-id" for bot in bots)
+
+@pytest.mark.asyncio
+async def test_google_token_verification_is_coalesced():
+    def verify(*args):
+        time.sleep(0.05)
+        return {"email": "test@example.com"}
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="google-id-token")
+    with patch('app.dependencies.id_token.verify_oauth2_token', side_effect=verify) as verify_token:
+        users = await asyncio.gather(*(get_current_user(credentials) for _ in range(5)))
+
+    assert verify_token.call_count == 1
+    assert users == [{"email": "test@example.com"}] * 5
+
+def test_get_bot_route(test_client, memory_storage):
+    memory_storage.bots.set("test-bot-id", {"id": "test-bot-id", "name": "Test Bot", "prompt": "You are a test bot"})
+
+    response = test_client.get("/bots/test-bot-id", headers={"Authorization": "Bearer test-token"})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Test Bot"
+
+    response = test_client.get("/bots/missing-bot", headers={"Authorization": "Bearer test-token"})
+    assert response.status_code == 404
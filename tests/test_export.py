@@ -0,0 +1,80 @@
+import json
+from datetime import datetime, UTC
+from unittest.mock import MagicMock, patch
+from app.archive import LocalObjectStore, archive_idle_chats
+from app.storage.firestore import EXPORT_PAGE_SIZE, FirestoreChatRepository
+
+HEADERS = {"Authorization": "Bearer test-token"}
+
+def add_chats(storage, count: int) -> None:
+    for i in range(count):
+        storage.chats.set(f"chat-{i}", {
+            "user_id": "test@example.com",
+            "bot_id": "bot",
+            "bot_prompt": "You are a test bot",
+            "messages": [{"role": "user", "content": f"Wiadomość {i}", "timestamp": datetime(2025, 1, 1, tzinfo=UTC)}],
+            "last_active": datetime.now(UTC),
+        })
+
+def read_lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_export_streams_ndjson(test_client, memory_storage, tmp_path):
+    add_chats(memory_storage, 3)
+    memory_storage.chats.set("other-chat", {"user_id": "other@example.com", "bot_id": "bot", "messages": []})
+
+    with patch("app.routes.users.object_store", LocalObjectStore(str(tmp_path))):
+        response = test_client.get("/users/me/export", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = read_lines(response)
+    assert [line.get("id") for line in lines[:-1]] == ["chat-0", "chat-1", "chat-2"]
+    assert lines[0]["messages"][0]["content"] == "Wiadomość 0"
+    assert lines[0]["messages"][0]["timestamp"] == "2025-01-01T00:00:00+00:00"
+    assert "bot_prompt" not in lines[0]
+    assert lines[-1] == {"complete": True, "chats": 3}
+
+def test_export_resumes_after_cursor(test_client, memory_storage, tmp_path):
+    add_chats(memory_storage, 3)
+
+    with patch("app.routes.users.object_store", LocalObjectStore(str(tmp_path))):
+        response = test_client.get("/users/me/export?after=chat-0", headers=HEADERS)
+
+    lines = read_lines(response)
+    assert [line.get("id") for line in lines[:-1]] == ["chat-1", "chat-2"]
+    assert lines[-1] == {"complete": True, "chats": 2}
+
+def test_export_reads_archived_chats_without_restoring(test_client, memory_storage, tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    memory_storage.chats.set("old-chat", {
+        "user_id": "test@example.com",
+        "bot_id": "bot",
+        "messages": [{"role": "user", "content": "Dawno temu"}],
+        "last_active": datetime(2020, 1, 1, tzinfo=UTC),
+    })
+    archive_idle_chats(memory_storage, store, idle_for=86400, limit=10)
+
+    with patch("app.routes.users.object_store", store):
+        response = test_client.get("/users/me/export", headers=HEADERS)
+
+    lines = read_lines(response)
+    assert lines[0]["id"] == "old-chat"
+    assert lines[0]["messages"] == [{"role": "user", "content": "Dawno temu"}]
+    assert memory_storage.chats.get("old-chat")["archived"] is True
+
+def test_firestore_export_pages_by_chat_id():
+    db = MagicMock()
+    query = db.collection.return_value.where.return_value.order_by.return_value.limit.return_value
+
+    def snapshot(i):
+        return MagicMock(id=f"chat-{i:03d}", to_dict=MagicMock(return_value={"user_id": "test@example.com", "messages": []}))
+
+    first_page = [snapshot(i) for i in range(EXPORT_PAGE_SIZE)]
+    query.stream.return_value = iter(first_page)
+    query.start_after.return_value.stream.return_value = iter([snapshot(EXPORT_PAGE_SIZE)])
+
+    chats = list(FirestoreChatRepository(db).export_for_user("test@example.com"))
+
+    assert len(chats) == EXPORT_PAGE_SIZE + 1
+    query.start_after.assert_called_once_with({"__name__": first_page[-1].id})
@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app.greetings import pick_greeting, prompt_hash
+
+MOCK_BOT = {
+    "name": "Test Bot",
+    "description": "A test bot for testing",
+    "prompt": "You are a test bot",
+    "image_url": "https://example.com/image.jpg",
+}
+
+@pytest.fixture
+def mock_gemini_response():
+    mock_response = MagicMock()
+    mock_response.text = "Cześć! O czym dziś porozmawiamy?"
+    return mock_response
+
+def test_pick_greeting_ignores_stale_pool():
+    bot_data = {**MOCK_BOT, "greetings": ["Cześć!"], "greetings_prompt_hash": prompt_hash("old prompt")}
+    assert pick_greeting(bot_data) is None
+
+    bot_data["greetings_prompt_hash"] = prompt_hash(MOCK_BOT["prompt"])
+    assert pick_greeting(bot_data) == "Cześć!"
+
+def test_create_bot_generates_greetings(test_client, memory_storage, mock_gemini_response):
+    with patch('app.gemini.client.aio.models.generate_content', return_value=mock_gemini_response):
+        response = test_client.post("/bots", headers={"Authorization": "Bearer test-token"}, json=MOCK_BOT)
+        assert response.status_code == 200
+        bot_id = response.json()["id"]
+
+    bot_data = memory_storage.bots.get(bot_id)
+    assert bot_data["greetings"] == [mock_gemini_response.text] * 3
+    assert bot_data["greetings_prompt_hash"] == prompt_hash(MOCK_BOT["prompt"])
+
+def test_start_chat_seeds_greeting(test_client, memory_storage, mock_gemini_response):
+    with patch('app.gemini.client.aio.models.generate_content', return_value=mock_gemini_response):
+        bot_id = test_client.post("/bots", headers={"Authorization": "Bearer test-token"}, json=MOCK_BOT).json()["id"]
+
+    with patch('app.gemini.client.aio.models.generate_content') as generate:
+        response = test_client.get(f"/chat/start?bot_id={bot_id}", headers={"Authorization": "Bearer test-token"})
+        generate.assert_not_called()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["greeting"] == mock_gemini_response.text
+    messages = memory_storage.messages.list(data["chat_id"])
+    assert [(msg["role"], msg["content"]) for msg in messages] == [("assistant", mock_gemini_response.text)]
+
+def test_update_prompt_regenerates_greetings(test_client, memory_storage, mock_gemini_response):
+    with patch('app.gemini.client.aio.models.generate_content', return_value=mock_gemini_response):
+        bot_id = test_client.post("/bots", headers={"Authorization": "Bearer test-token"}, json=MOCK_BOT).json()["id"]
+
+    updated_response = MagicMock()
+    updated_response.text = "Dzień dobry!"
+    with patch('app.gemini.client.aio.models.generate_content', return_value=updated_response):
+        response = test_client.put(f"/bots/{bot_id}", headers={"Authorization": "Bearer test-token"}, json={"prompt": "You are a formal tutor"})
+        assert response.status_code == 200
+
+    bot_data = memory_storage.bots.get(bot_id)
+    assert bot_data["greetings"] == ["Dzień dobry!"] * 3
+    assert pick_greeting(bot_data) == "Dzień dobry!"
@@ -0,0 +1,70 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies import get_http_client
+from app.http_client import create_http_client, get_with_retries
+
+def google_transport(userinfo_failures: int = 0):
+    calls = {"userinfo": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/token":
+            assert b"code=test-code" in request.content
+            return httpx.Response(200, json={"access_token": "google-access-token"})
+        if request.url.path == "/oauth2/v2/userinfo":
+            calls["userinfo"] += 1
+            if calls["userinfo"] <= userinfo_failures:
+                return httpx.Response(503)
+            assert request.headers["Authorization"] == "Bearer google-access-token"
+            return httpx.Response(200, json={"email": "test@example.com", "name": "Test User"})
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler), calls
+
+@pytest.fixture
+def test_client():
+    client = TestClient(app)
+    yield client
+    app.dependency_overrides = {}
+
+def test_oauth_callback_uses_shared_client(test_client):
+    transport, calls = google_transport(userinfo_failures=1)
+    app.dependency_overrides[get_http_client] = lambda: create_http_client(transport)
+
+    response = test_client.get("/auth/login/callback?code=test-code&provider=google")
+
+    assert response.status_code == 200
+    assert response.json() == {"email": "test@example.com", "name": "Test User", "token": "google-access-token"}
+    assert calls["userinfo"] == 2
+
+def test_oauth_callback_provider_unreachable(test_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("Connection refused", request=request)
+
+    app.dependency_overrides[get_http_client] = lambda: create_http_client(httpx.MockTransport(handler))
+
+    response = test_client.get("/auth/login/callback?code=test-code&provider=google")
+
+    assert response.status_code == 502
+
+@pytest.mark.asyncio
+async def test_get_with_retries_gives_up():
+    attempts = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal attempts
+        attempts += 1
+        return httpx.Response(503)
+
+    async with create_http_client(httpx.MockTransport(handler)) as client:
+        response = await get_with_retries(client, "https://example.com")
+
+    assert response.status_code == 503
+    assert attempts == 3
+
+def test_lifespan_owns_client():
+    with TestClient(app) as client:
+        http_client = client.app.state.http_client
+        assert not http_client.is_closed
+    assert http_client.is_closed
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, UTC
+from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
+from app.cancellation import ClientDisconnected
+from app.config import settings
+from app.idempotency import FirestoreIdempotencyBackend, IdempotencyStore, MemoryIdempotencyBackend
+
+MOCK_CHAT = {
+    "user_id": "test@example.com",
+    "bot_id": "test-bot-id",
+    "bot_prompt": "You are a test bot",
+    "messages": []
+}
+
+@pytest.fixture
+def mock_gemini_response():
+    mock_response = MagicMock()
+    mock_response.text = "This is a test response from the bot."
+    return mock_response
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_run():
+    store = IdempotencyStore(MemoryIdempotencyBackend(maxsize=8, ttl=60))
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"response": "ok"}
+
+    results = await asyncio.gather(*(store.run("key", "payload", work) for _ in range(5)))
+
+    assert calls == 1
+    assert [result for result, _ in results] == [{"response": "ok"}] * 5
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 4
+
+@pytest.mark.asyncio
+async def test_failures_are_not_stored():
+    store = IdempotencyStore(MemoryIdempotencyBackend(maxsize=8, ttl=60))
+
+    async def fail():
+        raise HTTPException(status_code=503, detail="Unavailable")
+
+    async def work():
+        return {"response": "ok"}
+
+    with pytest.raises(HTTPException):
+        await store.run("key", "payload", fail)
+    assert await store.run("key", "payload", work) == ({"response": "ok"}, False)
+
+@pytest.mark.asyncio
+async def test_retry_takes_over_from_a_disconnected_request():
+    store = IdempotencyStore(MemoryIdempotencyBackend(maxsize=8, ttl=60))
+    retry_waiting = asyncio.Event()
+
+    async def disconnected():
+        await retry_waiting.wait()
+        raise ClientDisconnected()
+
+    async def work():
+        return {"response": "ok"}
+
+    first = asyncio.create_task(store.run("key", "payload", disconnected))
+    await asyncio.sleep(0)
+    retry = asyncio.create_task(store.run("key", "payload", work))
+    await asyncio.sleep(0)
+    retry_waiting.set()
+
+    with pytest.raises(ClientDisconnected):
+        await first
+    assert await retry == ({"response": "ok"}, False)
+
+@pytest.mark.asyncio
+async def test_replicas_sharing_a_backend_replay_each_other():
+    backend = MemoryIdempotencyBackend(maxsize=8, ttl=60)
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return {"response": "ok"}
+
+    assert await IdempotencyStore(backend).run("key", "payload", work) == ({"response": "ok"}, False)
+    assert await IdempotencyStore(backend).run("key", "payload", work) == ({"response": "ok"}, True)
+    assert calls == 1
+
+def test_firestore_backend_ignores_expired_entries():
+    db = MagicMock()
+    backend = FirestoreIdempotencyBackend(ttl=60, db=db)
+    doc_ref = db.collection.return_value.document.return_value
+
+    backend.set(("test@example.com", "chat", "key"), "fingerprint", {"response": "ok"})
+    entry = doc_ref.set.call_args.args[0]
+    doc_ref.get.return_value = MagicMock(exists=True, to_dict=MagicMock(return_value=entry))
+    assert backend.get(("test@example.com", "chat", "key")) == ("fingerprint", {"response": "ok"})
+
+    doc_ref.get.return_value.to_dict.return_value = {**entry, "expires_at": datetime.now(UTC) - timedelta(seconds=1)}
+    assert backend.get(("test@example.com", "chat", "key")) is None
+
+@pytest.mark.asyncio
+async def test_key_reuse_with_different_payload():
+    store = IdempotencyStore(MemoryIdempotencyBackend(maxsize=8, ttl=60))
+
+    async def work():
+        return {"response": "ok"}
+
+    await store.run("key", "payload", work)
+    with pytest.raises(HTTPException) as excinfo:
+        await store.run("key", "other payload", work)
+    assert excinfo.value.status_code == 422
+
+def test_send_message_retry_is_replayed(test_client, memory_storage, mock_gemini_response):
+    memory_storage.bots.set("test-bot-id", {"id": "test-bot-id", "prompt": "You are a test bot"})
+    memory_storage.chats.set("test-chat-id", MOCK_CHAT)
+
+    with patch('app.gemini.client.aio.models.generate_content', return_value=mock_gemini_response) as generate:
+        responses = [
+            test_client.post(
+                "/chat/test-chat-id/message",
+                headers={"Authorization": "Bearer test-token", "Idempotency-Key": "retry-key"},
+                json={"message": "Hello, bot!"}
+            )
+            for _ in range(2)
+        ]
+
+    assert generate.call_count == 1
+    assert [response.json() for response in responses] == [{"response": mock_gemini_response.text, "model": settings.default_model}] * 2
+    assert "Idempotent-Replayed" not in responses[0].headers
+    assert responses[1].headers["Idempotent-Replayed"] == "true"
+    assert len(memory_storage.messages.list("test-chat-id")) == 2
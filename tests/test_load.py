@@ -0,0 +1,60 @@
+import pytest
+from unittest.mock import patch
+from app.main import app
+from app.load import LoadMonitor, load_monitor
+
+@pytest.fixture
+def test_client(test_client):
+    yield test_client
+    load_monitor.lag = 0.0
+    load_monitor.overloaded_since = None
+
+def test_lag_is_smoothed():
+    monitor = LoadMonitor(interval=0.5, lag_threshold=0.2, max_expensive=4, smoothing=0.5)
+
+    monitor.record_lag(0.3)
+    assert not monitor.overloaded()
+    monitor.record_lag(0.3)
+    assert monitor.overloaded()
+
+    for _ in range(5):
+        monitor.record_lag(0.0)
+    assert not monitor.overloaded()
+    assert monitor.overloaded_since is None
+
+def test_expensive_limit():
+    monitor = LoadMonitor(interval=0.5, lag_threshold=0.2, max_expensive=2)
+
+    monitor.expensive_started()
+    assert not monitor.overloaded()
+    monitor.expensive_started()
+    assert monitor.overloaded()
+
+def test_sustained_overload():
+    monitor = LoadMonitor(interval=0.5, lag_threshold=0.2, max_expensive=4, smoothing=1.0)
+
+    with patch('app.load.time.monotonic', return_value=100.0):
+        monitor.record_lag(1.0)
+        assert not monitor.sustained_overload(10)
+    with patch('app.load.time.monotonic', return_value=111.0):
+        assert monitor.sustained_overload(10)
+
+def test_send_message_is_shed_under_overload(test_client, memory_storage):
+    memory_storage.users.set("test@example.com", {"email": "test@example.com"})
+    load_monitor.lag = 1.0
+
+    response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Hello"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+    # Cheap reads keep being served
+    assert test_client.get("/users/me", headers={"Authorization": "Bearer test-token"}).status_code == 200
+
+def test_readiness_fails_under_sustained_overload(test_client):
+    app.state.ready = True
+    load_monitor.lag = 1.0
+    load_monitor.overloaded_since = 0.0
+
+    response = test_client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "overloaded"}
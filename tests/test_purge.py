@@ -0,0 +1,70 @@
+import time
+import pytest
+from datetime import datetime, UTC
+from unittest.mock import MagicMock, patch
+from app.archive import LocalObjectStore, archive_idle_chats
+from app.storage.firestore import FirestoreStorage
+
+HEADERS = {"Authorization": "Bearer test-token"}
+
+@pytest.fixture
+def test_client(test_client):
+    # One event loop across requests, so the deletion job outlives the request that starts it
+    with test_client:
+        yield test_client
+
+def wait_for_deletion(client) -> dict:
+    for _ in range(100):
+        status = client.get("/users/me/deletion", headers=HEADERS).json()
+        if status["status"] != "running":
+            return status
+        time.sleep(0.01)
+    raise AssertionError("Account deletion did not finish")
+
+def test_delete_account_runs_in_background(test_client, memory_storage, tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    memory_storage.users.set("test@example.com", {"email": "test@example.com"})
+    for i in range(3):
+        memory_storage.chats.set(f"chat-{i}", {"user_id": "test@example.com", "bot_id": "bot", "messages": [], "last_active": None})
+        memory_storage.indexes.set(f"chat-{i}", {"dim": 8})
+    memory_storage.chats.set("old-chat", {"user_id": "test@example.com", "bot_id": "bot", "messages": [], "last_active": datetime(2020, 1, 1, tzinfo=UTC)})
+    memory_storage.chats.set("other-chat", {"user_id": "other@example.com", "bot_id": "bot", "messages": []})
+    archive_idle_chats(memory_storage, store, idle_for=86400, limit=10)
+
+    with patch("app.purge.object_store", store):
+        response = test_client.delete("/users/me", headers=HEADERS)
+        assert response.status_code == 202
+        assert response.json()["status"] in ("running", "done")
+        status = wait_for_deletion(test_client)
+
+    assert status["status"] == "done"
+    assert status["chats_deleted"] == 4
+    assert memory_storage.users.get("test@example.com") is None
+    assert memory_storage.chats.list_for_user("test@example.com") == []
+    assert memory_storage.indexes.get("chat-0") is None
+    assert memory_storage.chats.get("other-chat") is not None
+    assert store.get("chats/old-chat") is None
+
+def test_failed_deletion_is_reported(test_client, memory_storage):
+    with patch.object(memory_storage.users, "delete", side_effect=RuntimeError("down")):
+        test_client.delete("/users/me", headers=HEADERS)
+        status = wait_for_deletion(test_client)
+
+    assert status["status"] == "failed"
+    assert status["error"]
+
+def test_status_without_deletion(test_client):
+    assert test_client.get("/users/me/deletion", headers=HEADERS).status_code == 404
+
+def test_firestore_deletes_through_throttled_bulk_writer():
+    db = MagicMock()
+    writer = db.bulk_writer.return_value
+    db.collection.return_value.document.return_value.collections.return_value = []
+    deleted = []
+
+    FirestoreStorage(db).delete_chats(["a", "b"], deleted.append, ops_per_second=50)
+
+    options = db.bulk_writer.call_args.args[0]
+    assert options.initial_ops_per_second == options.max_ops_per_second == 50
+    assert writer.delete.call_count == 4
+    writer.close.assert_called_once()
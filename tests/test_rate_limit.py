@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app.config import settings
+from app.rate_limit import Limit, MemoryRateLimitBackend, take_token
+
+def test_parse_limit():
+    assert Limit.parse("20/minute") == Limit(20, 60)
+    assert Limit.parse("5/10") == Limit(5, 10.0)
+
+def test_bucket_refills():
+    limit = Limit(2, 10)
+
+    tokens, decision = take_token(2, 0, 0, limit)
+    assert decision.allowed and decision.remaining == 1
+    tokens, decision = take_token(tokens, 0, 0, limit)
+    assert decision.allowed and decision.remaining == 0
+    tokens, decision = take_token(tokens, 0, 0, limit)
+    assert not decision.allowed
+    assert decision.retry_after == pytest.approx(5)
+
+    tokens, decision = take_token(tokens, 0, 5, limit)
+    assert decision.allowed
+
+def test_buckets_are_per_key():
+    backend = MemoryRateLimitBackend()
+    limit = Limit(1, 60)
+
+    assert backend.acquire("send_message:a@example.com", limit).allowed
+    assert not backend.acquire("send_message:a@example.com", limit).allowed
+    assert backend.acquire("send_message:b@example.com", limit).allowed
+
+def test_send_message_is_rate_limited(test_client, memory_storage):
+    memory_storage.bots.set("test-bot-id", {"id": "test-bot-id", "prompt": "You are a test bot"})
+    memory_storage.chats.set("test-chat-id", {"user_id": "test@example.com", "bot_id": "test-bot-id", "messages": []})
+    mock_response = MagicMock()
+    mock_response.text = "This is a test response from the bot."
+
+    with patch.dict(settings.rate_limits, {"send_message": "2/minute"}), \
+         patch('app.gemini.client.aio.models.generate_content', return_value=mock_response):
+        responses = [
+            test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": f"Hello {i}"})
+            for i in range(3)
+        ]
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[0].headers["RateLimit-Limit"] == "2"
+    assert responses[0].headers["RateLimit-Remaining"] == "1"
+    assert int(responses[2].headers["Retry-After"]) > 0
@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+from unittest.mock import patch
+from app.config import settings
+from app.embeddings import HashingEmbeddingProvider
+from app.recall import ChatIndex, build_context, window_start
+from tests.fake_gemini import FakeGemini
+
+TOPICS = [
+    ("Jak zamówić kawę z mlekiem?", "Powiedz: poproszę kawę z mlekiem."),
+    ("Jak zapytać o drogę na dworzec?", "Zapytaj: przepraszam, jak dojść na dworzec?"),
+    ("Jak się mówi o pogodzie?", "Na przykład: dzisiaj jest słonecznie i ciepło."),
+]
+
+def chat_history(turns: int) -> list[dict]:
+    history = []
+    for i in range(turns):
+        question, answer = TOPICS[i % len(TOPICS)] if i < len(TOPICS) else (f"Pytanie {i}", f"Odpowiedź {i}")
+        history.append({"role": "user", "content": question})
+        history.append({"role": "assistant", "content": answer})
+    return history
+
+class CountingProvider(HashingEmbeddingProvider):
+    def __init__(self, dim):
+        super().__init__(dim)
+        self.texts = 0
+
+    async def embed(self, texts):
+        self.texts += len(texts)
+        return await super().embed(texts)
+
+@pytest.fixture
+def long_term_memory():
+    with patch.object(settings, "long_term_memory", True), \
+         patch.object(settings, "memory_window", 6), \
+         patch.object(settings, "memory_top_k", 1):
+        yield
+
+@pytest.mark.asyncio
+async def test_hashing_embeddings_are_deterministic_unit_vectors():
+    provider = HashingEmbeddingProvider(64)
+
+    first = await provider.embed(["Poproszę kawę", ""])
+    second = await HashingEmbeddingProvider(64).embed(["Poproszę kawę", ""])
+
+    assert np.array_equal(first, second)
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+    assert not first[1].any()
+
+@pytest.mark.asyncio
+async def test_inflected_forms_are_close():
+    provider = HashingEmbeddingProvider(256)
+
+    kawa, kawy, dworzec = await provider.embed(["kawa z mlekiem", "dwie kawy z mlekiem", "na dworcu"])
+
+    assert kawa @ kawy > kawa @ dworzec
+
+@pytest.mark.asyncio
+async def test_index_document_round_trip():
+    provider = HashingEmbeddingProvider(32)
+    index = ChatIndex(provider.name, provider.dim)
+    index.add([0, 2], await provider.embed(["kawa", "dworzec"]))
+    index.indexed_until = 4
+
+    restored = ChatIndex.from_document(index.to_document())
+
+    assert restored.positions == [0, 2]
+    assert restored.indexed_until == 4
+    assert restored.search((await provider.embed(["dworzec"]))[0], 1) == [2]
+
+def test_window_opens_on_learner_message():
+    history = chat_history(5)
+
+    assert window_start(history, 5) == 4
+    assert history[window_start(history, 5)]["role"] == "user"
+
+@pytest.mark.asyncio
+async def test_short_chats_are_sent_whole(memory_storage, long_term_memory):
+    history = chat_history(3)
+
+    assert await build_context(memory_storage, "chat", history) == history
+
+@pytest.mark.asyncio
+async def test_relevant_old_turn_is_recalled(memory_storage, long_term_memory):
+    provider = CountingProvider(256)
+    history = chat_history(10) + [{"role": "user", "content": "Chcę jeszcze raz zamówić kawę z mlekiem"}]
+
+    context = await build_context(memory_storage, "chat", history, provider)
+
+    assert context[:2] == history[0:2]
+    assert context[2:] == history[-7:]
+    assert memory_storage.indexes.get("chat")["indexed_until"] == len(history) - 7
+
+    # The next turn only embeds turns that left the window since
+    provider.texts = 0
+    history += [{"role": "assistant", "content": "Poproszę kawę z mlekiem."}, {"role": "user", "content": "A herbatę?"}]
+    await build_context(memory_storage, "chat", history, provider)
+    assert provider.texts == 2
+
+@pytest.mark.asyncio
+async def test_embedding_failure_falls_back_to_window(memory_storage, long_term_memory):
+    provider = HashingEmbeddingProvider(32)
+    history = chat_history(10) + [{"role": "user", "content": "Kawa?"}]
+
+    with patch.object(provider, "embed", side_effect=RuntimeError("down")):
+        context = await build_context(memory_storage, "chat", history, provider)
+
+    assert context == history[-7:]
+
+def test_send_message_uses_recalled_context(test_client, memory_storage, long_term_memory):
+    memory_storage.bots.set("test-bot-id", {"id": "test-bot-id", "prompt": "You are a test bot"})
+    memory_storage.chats.set("test-chat-id", {"user_id": "test@example.com", "bot_id": "test-bot-id", "messages": chat_history(10)})
+    gemini = FakeGemini("Proszę bardzo!")
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=gemini.generate_content) as generate:
+        response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Jak zamówić kawę?"})
+
+    assert response.status_code == 200
+    contents = generate.call_args.kwargs["contents"]
+    assert len(contents) == 9
+    assert contents[0].parts[0].text == TOPICS[0][0]
+    assert len(memory_storage.messages.list("test-chat-id")) == 22
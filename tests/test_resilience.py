@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.config import settings
+from app.gemini import get_policy, _policies
+from app.metrics import metrics
+from app.resilience import CircuitBreaker, CircuitOpenError, ResiliencePolicy, CLOSED, HALF_OPEN, OPEN
+from tests.fake_gemini import FakeGemini, api_error
+
+def make_policy(**overrides) -> ResiliencePolicy:
+    options = {
+        "timeout": 1.0,
+        "max_retries": 2,
+        "backoff_base": 0.001,
+        "backoff_max": 0.01,
+        "hedge_after": None,
+        "breaker": CircuitBreaker("test", failure_threshold=3, recovery_time=60),
+    }
+    options.update(overrides)
+    return ResiliencePolicy("test", **options)
+
+@pytest.fixture
+def test_client(test_client, memory_storage):
+    memory_storage.bots.set("test-bot-id", {"id": "test-bot-id", "prompt": "You are a test bot"})
+    memory_storage.chats.set("test-chat-id", {"user_id": "test@example.com", "bot_id": "test-bot-id", "messages": []})
+    yield test_client
+    _policies.clear()
+
+@pytest.mark.asyncio
+async def test_retries_retryable_errors():
+    gemini = FakeGemini(api_error(503), api_error(429), "Cześć!")
+
+    response = await make_policy().call(lambda: gemini.generate_content())
+
+    assert response.text == "Cześć!"
+    assert gemini.calls == 3
+
+@pytest.mark.asyncio
+async def test_does_not_retry_bad_requests():
+    gemini = FakeGemini(api_error(400), "Cześć!")
+
+    with pytest.raises(Exception):
+        await make_policy().call(lambda: gemini.generate_content())
+    assert gemini.calls == 1
+
+@pytest.mark.asyncio
+async def test_deadline_is_retried():
+    gemini = FakeGemini((1.0, "too late"), "Cześć!")
+
+    response = await make_policy(timeout=0.02).call(lambda: gemini.generate_content())
+
+    assert response.text == "Cześć!"
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_recovers():
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_time=60)
+    policy = make_policy(max_retries=0, breaker=breaker)
+    gemini = FakeGemini(api_error(503), api_error(503), api_error(503), "Cześć!")
+
+    for _ in range(3):
+        with pytest.raises(Exception):
+            await policy.call(lambda: gemini.generate_content())
+    assert breaker.state == OPEN
+    assert metrics.get("test.circuit.state") == 2
+
+    with pytest.raises(CircuitOpenError):
+        await policy.call(lambda: gemini.generate_content())
+    assert gemini.calls == 3
+
+    breaker.opened_at -= 60
+    assert breaker.state == HALF_OPEN
+    assert (await policy.call(lambda: gemini.generate_content())).text == "Cześć!"
+    assert breaker.state == CLOSED
+
+@pytest.mark.asyncio
+async def test_hedging_returns_faster_call():
+    gemini = FakeGemini((1.0, "slow"), "fast")
+
+    response = await make_policy(hedge_after=0.01).call(lambda: gemini.generate_content())
+
+    assert response.text == "fast"
+    assert gemini.calls == 2
+
+def test_send_message_fails_fast_when_circuit_is_open(test_client):
+    gemini = FakeGemini(api_error(503))
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=gemini.generate_content), \
+         patch.object(settings, "fallback_model", None), \
+         patch.object(get_policy(settings.default_model), "backoff_base", 0.001):
+        for _ in range(2):
+            response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Hello"})
+            assert response.status_code == 503
+        calls = gemini.calls
+
+        response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Hello"})
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+    assert gemini.calls == calls
+    assert test_client.get("/metrics").json()["gauges"][f"gemini.{settings.default_model}.circuit.state"] == 2
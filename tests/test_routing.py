@@ -0,0 +1,76 @@
+import pytest
+from unittest.mock import patch
+from app.config import settings
+from app.gemini import _policies
+from app.routing import choose_models
+from tests.fake_gemini import FakeGemini, api_error
+
+SHORT = [{"role": "user", "content": "Cześć!"}]
+LONG = [{"role": "user", "content": "Czy możesz mi wyjaśnić, kiedy używamy aspektu dokonanego, a kiedy niedokonanego?"}]
+
+@pytest.fixture
+def test_client(test_client, memory_storage):
+    memory_storage.bots.set("test-bot-id", {
+        "id": "test-bot-id",
+        "prompt": "You are a test bot",
+        "model": "primary-model",
+        "fallback_model": "fallback-model",
+    })
+    memory_storage.chats.set("test-chat-id", {"user_id": "test@example.com", "bot_id": "test-bot-id", "messages": []})
+    yield test_client
+    _policies.clear()
+
+def test_defaults():
+    assert choose_models({}, SHORT) == [settings.default_model, settings.fallback_model]
+
+def test_simple_turns_use_light_model():
+    bot_data = {"model": "primary-model", "light_model": "light-model", "fallback_model": "fallback-model"}
+
+    assert choose_models(bot_data, SHORT) == ["light-model", "primary-model", "fallback-model"]
+    assert choose_models(bot_data, LONG) == ["primary-model", "fallback-model"]
+
+def test_duplicates_are_dropped():
+    bot_data = {"model": "primary-model", "fallback_model": "primary-model"}
+
+    assert choose_models(bot_data, LONG) == ["primary-model"]
+
+def test_falls_back_when_primary_is_overloaded(test_client, memory_storage):
+    primary = FakeGemini(api_error(503))
+    fallback = FakeGemini("Cześć!")
+
+    async def generate_content(model, **kwargs):
+        return await (primary if model == "primary-model" else fallback).generate_content()
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=generate_content):
+        response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Hello"})
+
+    assert response.status_code == 200
+    assert response.json() == {"response": "Cześć!", "model": "fallback-model"}
+    assert primary.calls == 1
+    assert memory_storage.messages.list("test-chat-id")[-1]["model"] == "fallback-model"
+    assert test_client.get("/metrics").json()["counters"]["gemini.fallbacks"] >= 1
+
+def test_falls_back_when_primary_is_slow(test_client):
+    primary = FakeGemini((1.0, "too late"))
+    fallback = FakeGemini("Cześć!")
+
+    async def generate_content(model, **kwargs):
+        return await (primary if model == "primary-model" else fallback).generate_content()
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=generate_content), \
+         patch.object(settings, "gemini_fallback_timeout", 0.02):
+        response = test_client.post("/chat/test-chat-id/message", headers={"Authorization": "Bearer test-token"}, json={"message": "Hello"})
+
+    assert response.json()["model"] == "fallback-model"
+
+def test_bot_models_must_be_allowed(test_client):
+    bot = {"name": "Bot", "description": "", "prompt": "You are a test bot"}
+    headers = {"Authorization": "Bearer test-token"}
+
+    with patch("app.routes.bots.refresh_greetings"):
+        response = test_client.post("/bots", headers=headers, json={**bot, "model": "very-expensive-model"})
+        assert response.status_code == 422
+        response = test_client.post("/bots", headers=headers, json={**bot, "model": settings.bot_models[0], "fallback_model": settings.fallback_model})
+        assert response.status_code == 200
+        response = test_client.put(f"/bots/{response.json()['id']}", headers=headers, json={"light_model": "very-expensive-model"})
+        assert response.status_code == 422
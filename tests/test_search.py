@@ -0,0 +1,70 @@
+import pytest
+from unittest.mock import patch
+from app.search import BotIndex, fold
+
+HEADERS = {"Authorization": "Bearer test-token"}
+
+BOTS = [
+    {"id": "teacher", "name": "Nauczycielka Łucja", "description": "Ćwiczy gramatykę i wymowę"},
+    {"id": "barista", "name": "Barista", "description": "Zamów kawę w kawiarni na Żoliborzu"},
+    {"id": "guide", "name": "Przewodnik po Krakowie", "description": "Opowiada o zabytkach i kawiarniach"},
+]
+
+@pytest.fixture
+def index():
+    index = BotIndex()
+    for bot_data in BOTS:
+        index.add(bot_data)
+    return index
+
+def ids(results):
+    return [bot_data["id"] for bot_data in results]
+
+def test_fold_strips_polish_diacritics():
+    assert fold("Zażółć gęślą jaźń ŁÓDŹ") == "zazolc gesla jazn lodz"
+
+def test_diacritics_are_optional_in_queries(index):
+    assert ids(index.search("lucja", 10)) == ["teacher"]
+    assert ids(index.search("ŻOLIBORZ", 10)) == ["barista"]
+    assert ids(index.search("cwiczy", 10)) == ["teacher"]
+
+def test_prefixes_match(index):
+    assert ids(index.search("nauc", 10)) == ["teacher"]
+    assert ids(index.search("krak", 10)) == ["guide"]
+
+def test_every_word_must_match(index):
+    assert ids(index.search("kaw zab", 10)) == ["guide"]
+    assert index.search("kawa herbata", 10) == []
+
+def test_name_and_whole_word_matches_rank_first(index):
+    index.add({"id": "kawa", "name": "Kawa", "description": "Rozmowy przy kawie"})
+
+    assert ids(index.search("kaw", 10))[0] == "kawa"
+    assert ids(index.search("kawiarni", 10)) == ["barista", "guide"]
+
+def test_removed_bots_and_terms_disappear(index):
+    index.remove("barista")
+
+    assert index.search("barista", 10) == []
+    assert "barista" not in index.vocabulary
+
+def test_search_endpoint_follows_bot_changes(test_client, memory_storage):
+    for bot_data in BOTS:
+        memory_storage.bots.set(bot_data["id"], {**bot_data, "prompt": "You are a test bot", "created_by": "test@example.com"})
+
+    assert ids(test_client.get("/bots/search?q=barista", headers=HEADERS).json()) == ["barista"]
+
+    with patch.object(memory_storage.bots, "list", side_effect=AssertionError("search read storage")), \
+         patch("app.routes.bots.refresh_greetings"):
+        created = test_client.post("/bots", headers=HEADERS, json={"name": "Sprzedawca", "description": "Targ", "prompt": "p"}).json()
+        assert ids(test_client.get("/bots/search?q=sprzed", headers=HEADERS).json()) == [created["id"]]
+
+        test_client.put("/bots/barista", headers=HEADERS, json={"name": "Kelner"})
+        assert ids(test_client.get("/bots/search?q=kelner", headers=HEADERS).json()) == ["barista"]
+        assert test_client.get("/bots/search?q=barista", headers=HEADERS).json() == []
+
+        test_client.delete("/bots/guide", headers=HEADERS)
+        assert test_client.get("/bots/search?q=krakow", headers=HEADERS).json() == []
+
+def test_search_requires_query(test_client):
+    assert test_client.get("/bots/search", headers=HEADERS).status_code == 422
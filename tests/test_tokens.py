@@ -0,0 +1,73 @@
+import jwt
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.dependencies import get_storage
+from app.tokens import ACCESS, REFRESH, create_token, decode_token
+
+@pytest.fixture
+def test_client(memory_storage):
+    app.dependency_overrides[get_storage] = lambda: memory_storage
+
+    client = TestClient(app)
+    yield client
+
+    app.dependency_overrides = {}
+
+def test_decode_rejects_wrong_type():
+    refresh_token = create_token("test@example.com", REFRESH, 60)
+
+    with pytest.raises(jwt.InvalidTokenError):
+        decode_token(refresh_token, ACCESS)
+    assert decode_token(refresh_token, REFRESH)["sub"] == "test@example.com"
+
+def test_decode_rejects_expired_token():
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(create_token("test@example.com", ACCESS, -1), ACCESS)
+
+def test_login_issues_session_tokens(test_client, memory_storage):
+    google_payload = {"email": "test@example.com", "name": "Test User", "sub": "123456789"}
+    with patch('app.auth.id_token.verify_oauth2_token', return_value=google_payload):
+        response = test_client.post("/auth/login/google", json={"access_token": "google-id-token"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["token_type"] == "bearer"
+    assert decode_token(data["access_token"], ACCESS)["sub"] == "test@example.com"
+    assert memory_storage.users.get("test@example.com")["google_sub"] == "123456789"
+
+    with patch('app.dependencies.id_token.verify_oauth2_token') as verify:
+        memory_storage.users.set("test@example.com", {"email": "test@example.com", "name": "Test User"})
+        response = test_client.get("/users/me", headers={"Authorization": f"Bearer {data['access_token']}"})
+        verify.assert_not_called()
+    assert response.status_code == 200
+
+def test_refresh_issues_new_access_token(test_client, memory_storage):
+    memory_storage.users.set("test@example.com", {"email": "test@example.com"})
+    refresh_token = create_token("test@example.com", REFRESH, 60)
+
+    response = test_client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    assert decode_token(response.json()["access_token"], ACCESS)["sub"] == "test@example.com"
+
+    access_token = create_token("test@example.com", ACCESS, 60)
+    response = test_client.post("/auth/refresh", json={"refresh_token": access_token})
+    assert response.status_code == 401
+
+def test_refresh_is_refused_after_account_deletion(test_client, memory_storage):
+    memory_storage.users.set("test@example.com", {"email": "test@example.com"})
+    refresh_token = create_token("test@example.com", REFRESH, 60)
+    memory_storage.users.delete("test@example.com")
+
+    response = test_client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+def test_expired_session_token_skips_google_verification(test_client):
+    expired = create_token("test@example.com", ACCESS, -1)
+
+    with patch('app.dependencies.id_token.verify_oauth2_token') as verify:
+        response = test_client.get("/users/me", headers={"Authorization": f"Bearer {expired}"})
+        verify.assert_not_called()
+    assert response.status_code == 401
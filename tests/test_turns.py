@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from google.cloud import firestore
+from app.routes.chat import Message, process_message
+from app.storage.firestore import FirestoreMessageRepository
+from app.turns import TurnLocks
+from tests.fake_gemini import FakeGemini
+
+MOCK_BOT = {
+    "id": "test-bot-id",
+    "name": "Test Bot",
+    "prompt": "You are a test bot",
+}
+
+@pytest.mark.asyncio
+async def test_turns_on_one_chat_run_in_order():
+    turns = TurnLocks()
+    events = []
+
+    async def turn(name):
+        async with turns.hold("chat"):
+            events.append(f"{name} started")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} finished")
+
+    await asyncio.gather(turn("first"), turn("second"))
+
+    assert events == ["first started", "first finished", "second started", "second finished"]
+    assert turns.locks == {}
+
+@pytest.mark.asyncio
+async def test_turns_on_different_chats_overlap():
+    turns = TurnLocks()
+    events = []
+
+    async def turn(chat_id):
+        async with turns.hold(chat_id):
+            events.append(f"{chat_id} started")
+            await asyncio.sleep(0.01)
+            events.append(f"{chat_id} finished")
+
+    await asyncio.gather(turn("a"), turn("b"))
+
+    assert events[:2] == ["a started", "b started"]
+
+@pytest.mark.asyncio
+async def test_concurrent_sends_keep_every_message(memory_storage):
+    memory_storage.bots.set(MOCK_BOT["id"], MOCK_BOT)
+    memory_storage.chats.set("test-chat-id", {"user_id": "test@example.com", "bot_id": MOCK_BOT["id"], "messages": []})
+    gemini = FakeGemini((0.02, "Pierwsza"), (0.0, "Druga"))
+    request = MagicMock()
+    request.is_disconnected = AsyncMock(return_value=False)
+    user = {"email": "test@example.com"}
+
+    with patch('app.gemini.client.aio.models.generate_content', side_effect=gemini.generate_content):
+        await asyncio.gather(
+            process_message("test-chat-id", Message(message="Cześć"), request, user, memory_storage),
+            process_message("test-chat-id", Message(message="Jak się masz?"), request, user, memory_storage),
+        )
+
+    messages = memory_storage.messages.list("test-chat-id")
+    assert [(m["role"], m["content"]) for m in messages] == [
+        ("user", "Cześć"),
+        ("assistant", "Pierwsza"),
+        ("user", "Jak się masz?"),
+        ("assistant", "Druga"),
+    ]
+
+def test_firestore_append_sends_only_new_messages():
+    db = MagicMock()
+    message = {"role": "user", "content": "Cześć"}
+
+    chat_ref = db.collection.return_value.document.return_value
+    chat_ref.get.return_value = MagicMock(exists=True, to_dict=MagicMock(return_value={}))
+
+    FirestoreMessageRepository(db).append("test-chat-id", message)
+
+    # Only the archived flag is read, never the transcript
+    assert chat_ref.get.call_args.kwargs["field_paths"] == ["archived"]
+    update = chat_ref.update.call_args.args[0]["messages"]
+    assert isinstance(update, firestore.ArrayUnion)
+    assert update.values == [message]
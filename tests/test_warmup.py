@@ -0,0 +1,40 @@
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.warmup import warm_up
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+@pytest.mark.asyncio
+async def test_warm_up_marks_ready_after_priming():
+    app.state.ready = False
+    with patch.object(settings, "warm_up", True), \
+         patch('app.warmup.prime_gemini') as prime_gemini, \
+         patch('app.warmup.prime_firestore', side_effect=RuntimeError("emulator down")) as prime_firestore:
+        prime_gemini.__name__ = "prime_gemini"
+        prime_firestore.__name__ = "prime_firestore"
+        await warm_up(app)
+
+    prime_gemini.assert_called_once()
+    prime_firestore.assert_called_once()
+    assert app.state.ready
+
+def test_ready_reports_starting():
+    client = TestClient(app)
+    app.state.ready = False
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+
+    app.state.ready = True
+    assert client.get("/ready").json() == {"status": "ok"}
+
+def test_app_import_skips_google_genai_and_grpc():
+    # Run in a fresh interpreter, since other tests already imported them here
+    code = "import sys, app.main; print([name for name in ('google.genai', 'google.cloud.firestore', 'grpc') if name in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"